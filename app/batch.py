@@ -0,0 +1,154 @@
+"""
+Runs many lox programs on a pool of worker processes, for `evaluate` given
+more than one file, a glob or `--jobs`.
+
+    python3 -m app.main evaluate [options] --jobs=<n> <file or glob>...
+
+Each worker imports the interpreter and the engine once and then runs file
+after file, each from fresh globals, with its output captured. The output of
+every file is printed in one piece under a `==> file <==` header, in the order
+the files were given however the runs finish, then a summary with the files
+that failed and their exit codes, 65 for scanner and parser errors like a
+single run. Exits with 1 when a file failed.
+"""
+
+import contextlib
+import glob
+import io
+import os
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from interpreter import inline_cache, memoize
+
+from app.main import ENGINES, load_program, run_artifact, run_program
+
+# exit code of files whose worker died, like a program the warm server lost
+LOST = 70
+
+# set in every worker by `start_worker`
+options = None
+cache = None
+
+
+def expand(patterns):
+    """Returns the files the patterns match in order, each once, and the patterns matching none."""
+    files = {}
+    unmatched = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            unmatched.append(pattern)
+        for file_name in matches:
+            files[file_name] = None
+
+    return list(files), unmatched
+
+
+def start_worker(batch_options):
+    global options, cache
+
+    # ctrl-c stops the batch from the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    options = batch_options
+    if options["cache"]:
+        from interpreter.compile_cache import CompileCache
+
+        cache = CompileCache()
+
+    # imports the engine, which is done lazily on the first run otherwise
+    ENGINES[options["engine"]]([])
+
+
+def run_file(file_name):
+    """Runs one program in the worker, returns `(exit code, stdout, stderr)`."""
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+
+    # the stats of the last file would add up with these, and keep its heap alive
+    inline_cache.STATS.reset()
+    memoize.STATS.reset()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            if file_name.endswith(".loxc"):
+                run_artifact(file_name)
+            else:
+                stats = None
+                if options["stats"]:
+                    from interpreter.stats import Stats
+
+                    stats = Stats()
+
+                statements = load_program(
+                    file_name,
+                    cache,
+                    options["stream"],
+                    options["optimize"],
+                    options["memo"],
+                    stats,
+                )
+                run_program(statements, options, stats)
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def print_result(file_name, stdout, stderr):
+    sys.stdout.write(f"==> {file_name} <==\n{stdout}")
+    # the file's errors come after its output, not somewhere in the next file's
+    sys.stdout.flush()
+    sys.stderr.write(stderr)
+    sys.stderr.flush()
+
+
+def run_batch(patterns, batch_options):
+    """Runs the files `patterns` match on `--jobs` workers, returns the exit code."""
+    files, unmatched = expand(patterns)
+    for pattern in unmatched:
+        print(f"No files match {pattern}", file=sys.stderr)
+    if not files:
+        return 1
+
+    jobs = batch_options["jobs"] or os.cpu_count() or 1
+    jobs = min(jobs, len(files))
+    failures = [(pattern, 1) for pattern in unmatched]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        jobs, initializer=start_worker, initargs=(batch_options,)
+    ) as pool:
+        futures = [pool.submit(run_file, file_name) for file_name in files]
+
+        # in the order given, a file's output waits for the ones before it
+        for file_name, future in zip(files, futures):
+            try:
+                code, stdout, stderr = future.result()
+            except BrokenProcessPool:
+                code, stdout, stderr = LOST, "", f"{file_name}: worker died\n"
+
+            print_result(file_name, stdout, stderr)
+            if code != 0:
+                failures.append((file_name, code))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(files)} files in {elapsed:.2f}s, {len(files) / elapsed:.1f} files/s "
+        f"on {jobs} workers, {len(failures)} failed",
+        file=sys.stderr,
+    )
+    for file_name, code in failures:
+        print(f"  {file_name}: exit {code}", file=sys.stderr)
+
+    return 1 if failures else 0
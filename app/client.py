@@ -0,0 +1,126 @@
+"""
+Thin client for `python3 -m app.main serve`, runs a lox program on the warm
+server and prints its output as it comes.
+
+    python3 -m app.client [options] <file.lox>
+    echo 'print 1;' | python3 -m app.client [options] -
+
+The options are the ones `evaluate` takes, `--socket=<path>` picks the server.
+This module only imports what it needs to talk to the socket, so it starts
+faster than the interpreter would.
+
+Both ends send frames: a kind byte, the payload length and the payload. The
+client sends one REQUEST frame with a JSON object, the server answers with
+STDOUT and STDERR frames while the program runs and an EXIT frame with the
+exit code.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+
+HEADER = struct.Struct(">cI")
+
+REQUEST = b"r"
+STDOUT = b"o"
+STDERR = b"e"
+EXIT = b"x"
+
+# exit code when the server goes away before the program finished
+LOST = 70
+
+
+def default_socket_path():
+    if "LOX_SOCKET" in os.environ:
+        return os.environ["LOX_SOCKET"]
+
+    directory = os.environ.get("TMPDIR", "/tmp")
+    return os.path.join(directory, f"lox-{os.getuid()}.sock")
+
+
+def send_frame(connection: socket.socket, kind: bytes, payload: bytes):
+    connection.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+
+def receive_exactly(connection: socket.socket, size: int):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def receive_frame(connection: socket.socket):
+    """Returns `(kind, payload)`, None when the other end closed the connection."""
+    header = receive_exactly(connection, HEADER.size)
+    if header is None:
+        return None
+
+    kind, size = HEADER.unpack(header)
+    payload = receive_exactly(connection, size)
+    if payload is None:
+        return None
+
+    return kind, payload
+
+
+def main():
+    arguments = sys.argv[1:]
+    socket_path = default_socket_path()
+    options = []
+    target = None
+
+    for argument in arguments:
+        if argument.startswith("--socket="):
+            socket_path = argument.split("=", 1)[1]
+        elif argument.startswith("-") and argument != "-":
+            options.append(argument)
+        else:
+            target = argument
+
+    if target is None:
+        print("Usage: python3 -m app.client [options] <file.lox | ->", file=sys.stderr)
+        exit(1)
+
+    request = {"arguments": options}
+    if target == "-":
+        request["source"] = sys.stdin.read()
+    else:
+        request["path"] = os.path.abspath(target)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError as e:
+        print(
+            f"No lox server at {socket_path} ({e.strerror}), "
+            f"start one with python3 -m app.main serve",
+            file=sys.stderr,
+        )
+        exit(1)
+
+    with connection:
+        send_frame(connection, REQUEST, json.dumps(request).encode())
+
+        while True:
+            frame = receive_frame(connection)
+            if frame is None:
+                exit(LOST)
+
+            kind, payload = frame
+            if kind == STDOUT:
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif kind == STDERR:
+                sys.stderr.buffer.write(payload)
+                sys.stderr.buffer.flush()
+            elif kind == EXIT:
+                exit(int(payload))
+
+
+if __name__ == "__main__":
+    main()
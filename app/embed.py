@@ -0,0 +1,182 @@
+"""
+Interpreter for running lox programs from python, compiling each once and
+running it any number of times, each run isolated from the others.
+
+    interpreter = Interpreter(engine="vm")
+    program = interpreter.compile('print "hello";')
+    interpreter.run(program)
+    interpreter.run(program, output=io.StringIO())
+
+A `Program` is the resolved AST and whatever the engine compiles it to. A run
+leaves it as it found it, so one program can be run by any number of callers
+and `Interpreter`s with the same engine, on as many threads at once. Every run
+has its own globals and output, handed down to the engine, and when it ends
+nothing of its heap is left reachable: its globals are dropped, and when no
+other run of the program is going on its inline caches are emptied, they would
+otherwise keep the classes and functions of the runs alive.
+
+Runs going on together share the program's inline caches. Every class of
+every run has its own shapes, so an entry one run made never matches the
+instances of another.
+"""
+
+import io
+import threading
+
+from interpreter import closure_compiler, grammar, lox_runtime
+from interpreter.analysis import analyze_program
+from interpreter.compiler import Compiler
+from interpreter.grammar import Expression, Statement, Get, Set
+from interpreter.parser import Parser
+from interpreter.purity import MEMO_ENGINES
+from interpreter.scanner import Scanner
+from interpreter.transpiler import Transpiler
+from interpreter.vm import VM
+
+
+class CompileError(Exception):
+    """The source has scanner, parser or resolver errors, the message has all of them."""
+
+
+class Program:
+    """A compiled program, `engine` says which `Interpreter`s can run it."""
+
+    __slots__ = ("engine", "statements", "code", "runs", "runs_lock")
+
+    engine: str
+    statements: list
+    code: object  # what the engine runs, see ENGINES
+    runs: int  # runs going on, the last one to end empties the inline caches
+
+    def __init__(self, engine: str, statements: list, code) -> None:
+        self.engine = engine
+        self.statements = statements
+        self.code = code
+        self.runs = 0
+        self.runs_lock = threading.Lock()
+
+
+def property_nodes(statements):
+    """The `Get` and `Set` nodes of the program, the ones with inline caches."""
+    nodes = []
+    pending = list(statements)
+
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, (Expression, Statement)):
+            if isinstance(node, (Get, Set)):
+                nodes.append(node)
+            for klass in type(node).__mro__:
+                for name in getattr(klass, "__slots__", ()):
+                    pending.append(getattr(node, name, None))
+
+    return nodes
+
+
+def compile_tree(statements):
+    return statements, property_nodes(statements)
+
+
+def run_tree(code, output):
+    statements, _ = code
+    grammar.run(statements, output)
+
+
+def forget_tree(code):
+    _, nodes = code
+    for node in nodes:
+        node.cache = None
+
+
+def run_closure(code, output):
+    program, _ = code
+    program(grammar.new_global_environment(output))
+
+
+def forget_closure(code):
+    _, caches = code
+    for cache in caches:
+        cache.forget()
+
+
+def compile_vm(statements):
+    return Compiler().compile(statements)
+
+
+def run_vm(function, output):
+    VM(output).interpret(function)
+
+
+def compile_python(statements):
+    return Transpiler().compile(statements, "<lox>")
+
+
+def forget_nothing(code):
+    pass
+
+
+# engine -> (compile the resolved statements once, run the result from fresh
+# globals printing to the given stream, empty the inline caches)
+ENGINES = {
+    "tree": (compile_tree, run_tree, forget_tree),
+    "closure": (closure_compiler.compile_program, run_closure, forget_closure),
+    "vm": (compile_vm, run_vm, forget_nothing),
+    "python": (compile_python, lox_runtime.run_code, forget_nothing),
+}
+
+
+class Interpreter:
+    def __init__(
+        self, engine: str = "tree", optimize: int = 0, memo: int = None
+    ) -> None:
+        if engine not in ENGINES:
+            raise Exception(
+                f"Unknown engine {engine}, expected one of {', '.join(ENGINES)}"
+            )
+        if memo is not None and engine not in MEMO_ENGINES:
+            raise Exception(f"memo works with the {' and '.join(MEMO_ENGINES)} engines")
+
+        self.engine = engine
+        self.optimize = optimize
+        self.memo = memo
+
+    def compile(self, source: str):
+        """Scans, parses, resolves and compiles `source`, raises `CompileError` on errors."""
+        errors = io.StringIO()
+
+        # the front end prints its errors and exits, like the command line wants
+        try:
+            scanner = Scanner(errors)
+            tokens = scanner.scan_source(source)
+            scanner.close()
+            statements = Parser(tokens, errors).parse()
+        except SystemExit:
+            raise CompileError(errors.getvalue().strip()) from None
+
+        # the resolver raises its errors instead
+        try:
+            statements = analyze_program(statements, self.optimize, self.memo)
+        except Exception as e:
+            raise CompileError(str(e)) from None
+        return Program(self.engine, statements, ENGINES[self.engine][0](statements))
+
+    def run(self, program: Program, output=None):
+        """Runs the program from fresh globals, printing to `output` if given."""
+        if program.engine != self.engine:
+            raise Exception(
+                f"Program compiled for the {program.engine} engine, not {self.engine}"
+            )
+
+        _, run, forget = ENGINES[self.engine]
+
+        with program.runs_lock:
+            program.runs += 1
+        try:
+            run(program.code, output)
+        finally:
+            with program.runs_lock:
+                program.runs -= 1
+                if program.runs == 0:
+                    forget(program.code)
@@ -1,40 +1,344 @@
 import sys
 from interpreter.scanner import Scanner
 from interpreter.parser import Parser
-from interpreter.resolver import Resolver
+from interpreter.analysis import analyze_program, phase
+
+# the optimizer, purity analysis and engines other than `tree` are imported
+# when a run asks for them, they'd only slow down starting every other run
+
+
+def positive_integer(option, value):
+    """`value` given for `option` as an int, exits with a usage error unless it's above 0."""
+    if value is None or not value.isdigit() or int(value) == 0:
+        print(
+            f"{option} expects a positive integer, got {value or 'nothing'}",
+            file=sys.stderr,
+        )
+        exit(1)
+
+    return int(value)
+
+
+def parse_options(arguments):
+    options = {
+        "engine": "tree",
+        "cache": True,
+        "cache_stats": False,
+        "stream": False,
+        "optimize": 0,
+        "ic_stats": False,
+        "memo": None,
+        "memo_stats": False,
+        "interval": None,
+        "top": 10,
+        "output": None,
+        "stats": False,
+        "socket": None,
+        "jobs": None,
+    }
+    positional = []
+
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument.startswith("--engine="):
+            options["engine"] = argument.split("=", 1)[1]
+        elif argument == "--no-cache":
+            options["cache"] = False
+        elif argument == "--cache-stats":
+            options["cache_stats"] = True
+        elif argument == "--ic-stats":
+            options["ic_stats"] = True
+        elif argument == "--memo":
+            from interpreter.purity import DEFAULT_SIZE
+
+            options["memo"] = DEFAULT_SIZE
+        elif argument.startswith("--memo="):
+            options["memo"] = positive_integer("--memo", argument.split("=", 1)[1])
+        elif argument == "--memo-stats":
+            options["memo_stats"] = True
+        elif argument.startswith("--interval="):
+            # milliseconds between profiler samples
+            options["interval"] = float(argument.split("=", 1)[1]) / 1000
+        elif argument.startswith("--top="):
+            options["top"] = int(argument.split("=", 1)[1])
+        elif argument.startswith("--output="):
+            options["output"] = argument.split("=", 1)[1]
+        elif argument == "--stats":
+            options["stats"] = True
+        elif argument.startswith("--socket="):
+            options["socket"] = argument.split("=", 1)[1]
+        elif argument.startswith("--jobs="):
+            options["jobs"] = positive_integer("--jobs", argument.split("=", 1)[1])
+        elif argument == "--jobs":
+            options["jobs"] = positive_integer("--jobs", next(arguments, None))
+        elif argument == "--stream":
+            options["stream"] = True
+        elif argument.startswith("-O"):
+            # `-O` alone turns on everything
+            from interpreter.optimizer import MAX_LEVEL
+
+            level = argument[2:]
+            options["optimize"] = int(level) if level.isdigit() else MAX_LEVEL
+        else:
+            positional.append(argument)
+
+    if options["engine"] not in ENGINES:
+        print(
+            f"Unknown engine {options['engine']}, expected one of {', '.join(ENGINES)}",
+            file=sys.stderr,
+        )
+        exit(1)
+
+    if options["ic_stats"]:
+        from interpreter.inline_cache import CACHED_ENGINES
+
+        if options["engine"] not in CACHED_ENGINES:
+            print(
+                f"--ic-stats works with the {' and '.join(CACHED_ENGINES)} engines",
+                file=sys.stderr,
+            )
+            exit(1)
+
+    if options["memo"] is not None:
+        from interpreter.purity import MEMO_ENGINES
+
+        if options["engine"] not in MEMO_ENGINES:
+            print(
+                f"--memo works with the {' and '.join(MEMO_ENGINES)} engines",
+                file=sys.stderr,
+            )
+            exit(1)
+
+    return positional, options
+
+
+def run_tree(statements):
+    from interpreter import grammar
+
+    grammar.run(statements)
+
+
+def run_vm(statements):
+    from interpreter import vm
+
+    vm.run(statements)
+
+
+def run_closure(statements):
+    from interpreter import closure_compiler
+
+    closure_compiler.run(statements)
+
+
+def run_python(statements):
+    from interpreter import lox_runtime
+    from interpreter.transpiler import Transpiler
+
+    lox_runtime.run_code(Transpiler().compile(statements, "<lox>"))
+
+
+ENGINES = {
+    "tree": run_tree,
+    "closure": run_closure,
+    "vm": run_vm,
+    "python": run_python,
+}
+
+
+def artifact_name(filename):
+    from interpreter.lox_runtime import ARTIFACT_SUFFIX
+
+    if filename.endswith(".lox"):
+        filename = filename[: -len(".lox")]
+    return filename + ARTIFACT_SUFFIX
+
+
+def profile_name(filename):
+    if filename.endswith(".lox"):
+        filename = filename[: -len(".lox")]
+    return filename + ".folded"
+
+
+def run_profiled(statements, filename, options):
+    from interpreter.profiler import Profiler, PROFILED_ENGINES, DEFAULT_INTERVAL
+
+    if options["engine"] not in PROFILED_ENGINES:
+        print(
+            f"profile runs the {' and '.join(PROFILED_ENGINES)} engines",
+            file=sys.stderr,
+        )
+        exit(1)
+
+    profiler = Profiler(options["interval"] or DEFAULT_INTERVAL)
+    profiler.start()
+    try:
+        ENGINES[options["engine"]](statements)
+    finally:
+        profiler.stop()
+
+        output = options["output"] or profile_name(filename)
+        with open(output, "w") as file:
+            file.write(profiler.collapsed())
+
+        print(profiler.table(options["top"]), file=sys.stderr)
+        print(f"collapsed stacks written to {output}", file=sys.stderr)
+
+
+def run_artifact(filename):
+    from interpreter import lox_runtime
+
+    lox_runtime.run_code(lox_runtime.load_artifact(filename))
+
+
+def load_program(filename, cache=None, stream=False, optimize=0, memo=None, stats=None):
+    """
+    Scans, parses, optimizes and resolves the file, or takes the result from
+    the cache. With `memo`, the pure functions are marked to keep that many
+    results.
+    """
+    if cache is not None:
+        variant = f"O{optimize}" if memo is None else f"O{optimize}M{memo}"
+        with phase(stats, "cache"):
+            key = cache.key(filename, variant)
+            statements = cache.load(key)
+        if statements is not None:
+            return statements
+
+    scanner = Scanner()
+
+    if stream:
+        # the parser pulls tokens while the scanner reads the file, the time
+        # of both goes to parse
+        with phase(stats, "parse"):
+            statements = Parser(scanner.stream(filename)).parse()
+            scanner.close()
+    else:
+        with phase(stats, "scan"):
+            tokens = scanner.scan(filename)
+            scanner.close()
+        with phase(stats, "parse"):
+            statements = Parser(tokens).parse()
+
+    statements = analyze_program(statements, optimize, memo, stats)
+
+    if cache is not None:
+        cache.store(key, statements)
+
+    return statements
+
+
+def run_program(statements, options, stats=None):
+    """Runs the resolved program on the chosen engine, then prints the stats asked for."""
+    # inline cache sites and memo tables are only collected for their stats
+    ic_stats = memo_stats = None
+    if options["ic_stats"]:
+        from interpreter.inline_cache import STATS as ic_stats
+
+        ic_stats.recording = True
+    if options["memo_stats"]:
+        from interpreter.memoize import STATS as memo_stats
+
+        memo_stats.recording = True
+
+    if stats is None:
+        ENGINES[options["engine"]](statements)
+    else:
+        stats.instrument()
+        try:
+            with stats.phase("eval"):
+                ENGINES[options["engine"]](statements)
+        finally:
+            stats.restore()
+            print(stats.report(options["engine"]), file=sys.stderr)
+
+    if ic_stats is not None:
+        print(ic_stats.report(), file=sys.stderr)
+    if memo_stats is not None:
+        print(memo_stats.report(), file=sys.stderr)
 
 
 def main():
-    if len(sys.argv) < 3:
+    positional, options = parse_options(sys.argv[1:])
+
+    if positional[:1] == ["serve"]:
+        from app.server import serve
+
+        serve(options["socket"])
+        return
+
+    if len(positional) < 2:
         print("Usage: ./your_program.sh tokenize <filename>", file=sys.stderr)
         exit(1)
 
-    command = sys.argv[1]
-    filename = sys.argv[2]
+    command = positional[0]
+    filename = positional[1]
 
-    scanner = Scanner()
-    tokens = scanner.scan(filename)
-    scanner.close()
-
-    if command == "tokenize":
-        for i in tokens:
-            print(i)
-    elif command == "parse":
-        parser = Parser(tokens)
-        expression = parser.parse()
-        print(expression)
-    elif command == "evaluate":
+    batch = len(positional) > 2 or any(c in filename for c in "*?[")
+    if command == "evaluate" and (batch or options["jobs"] is not None):
+        from app.batch import run_batch
+
+        exit(run_batch(positional[1:], options))
+
+    # compiled programs don't go through the front end at all
+    if command == "evaluate" and filename.endswith(".loxc"):
+        run_artifact(filename)
+        return
+
+    cache = None
+    if options["cache"] and command in ("evaluate", "profile", "compile"):
+        from interpreter.compile_cache import CompileCache
+
+        cache = CompileCache()
+
+    if command == "evaluate":
+        stats = None
+        if options["stats"]:
+            from interpreter.stats import Stats
+
+            stats = Stats()
+
+        statements = load_program(
+            filename,
+            cache,
+            options["stream"],
+            options["optimize"],
+            options["memo"],
+            stats,
+        )
+        run_program(statements, options, stats)
+    elif command == "profile":
+        statements = load_program(
+            filename,
+            cache,
+            options["stream"],
+            options["optimize"],
+            options["memo"],
+        )
+        run_profiled(statements, filename, options)
+    elif command == "compile":
+        from interpreter import lox_runtime
+        from interpreter.transpiler import Transpiler
+
+        statements = load_program(
+            filename, cache, options["stream"], options["optimize"]
+        )
+        code = Transpiler().compile(statements, filename)
+        lox_runtime.write_artifact(artifact_name(filename), code)
+    else:
         scanner = Scanner()
         tokens = scanner.scan(filename)
-        parser = Parser(tokens)
-        statements = parser.parse()
-        resolver = Resolver()
+        scanner.close()
 
-        for i in statements:
-            i.run_resolver(resolver)
+        if command == "tokenize":
+            for i in tokens:
+                print(i)
+        elif command == "parse":
+            parser = Parser(tokens)
+            expression = parser.parse()
+            print(expression)
 
-        for i in statements:
-            i.eval()
+    if cache is not None and options["cache_stats"]:
+        print(cache.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+"""
+Warm interpreter serving program runs over a Unix socket, for short scripts
+run so often that starting python and importing the interpreter costs more
+than running them.
+
+    python3 -m app.main serve [--socket=<path>]
+    python3 -m app.client [options] <file.lox>
+
+The server scans, parses and resolves the program, keeping the result while
+the file's size and mtime stay the same, then forks a child that runs it with
+its output going back to the client. The server itself never runs a program,
+so every child starts from the same fresh globals and nothing one run does is
+seen by the next.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+from collections import OrderedDict
+
+from app.client import (
+    REQUEST,
+    STDOUT,
+    STDERR,
+    EXIT,
+    default_socket_path,
+    send_frame,
+    receive_frame,
+)
+from app.main import parse_options, load_program, run_program
+
+MAX_PROGRAMS = 128
+
+
+class FrameWriter(io.RawIOBase):
+    """Binary stream sending everything written to it as frames of `kind`."""
+
+    def __init__(self, connection: socket.socket, kind: bytes) -> None:
+        self.connection = connection
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        send_frame(self.connection, self.kind, bytes(data))
+        return len(data)
+
+
+def frame_stream(connection: socket.socket, kind: bytes):
+    # a frame per line, so the client sees the output as the program prints it
+    return io.TextIOWrapper(
+        io.BufferedWriter(FrameWriter(connection, kind)),
+        encoding="utf-8",
+        line_buffering=True,
+    )
+
+
+class ProgramCache:
+    """Resolved programs by file (and its size and mtime) or by source, least recently used go first."""
+
+    def __init__(self, max_programs: int = MAX_PROGRAMS) -> None:
+        self.max_programs = max_programs
+        self.programs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, request: dict, options: dict):
+        variant = (options["optimize"], options["memo"])
+
+        if "source" in request:
+            source = request["source"]
+            key = ("source", hashlib.sha256(source.encode()).digest(), variant)
+        else:
+            stat = os.stat(request["path"])
+            key = (request["path"], stat.st_size, stat.st_mtime_ns, variant)
+
+        statements = self.programs.get(key)
+        if statements is not None:
+            self.hits += 1
+            self.programs.move_to_end(key)
+            return statements
+
+        self.misses += 1
+        if "source" in request:
+            # the scanner reads files
+            with tempfile.NamedTemporaryFile("w", suffix=".lox") as file:
+                file.write(source)
+                file.flush()
+                statements = self.compile(file.name, options)
+        else:
+            statements = self.compile(request["path"], options)
+
+        self.programs[key] = statements
+        if len(self.programs) > self.max_programs:
+            self.programs.popitem(last=False)
+
+        return statements
+
+    def compile(self, file_name: str, options: dict):
+        return load_program(
+            file_name,
+            stream=options["stream"],
+            optimize=options["optimize"],
+            memo=options["memo"],
+        )
+
+
+def run_child(connection: socket.socket, statements, options: dict):
+    """Runs the program with its output going to the client, returns the exit code."""
+    sys.stdout = frame_stream(connection, STDOUT)
+    sys.stderr = frame_stream(connection, STDERR)
+
+    try:
+        stats = None
+        if options["stats"]:
+            from interpreter.stats import Stats
+
+            stats = Stats()
+
+        run_program(statements, options, stats)
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        # like python does for an uncaught exception
+        traceback.print_exc()
+        code = 1
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
+
+
+def handle(connection: socket.socket, listener: socket.socket, programs):
+    frame = receive_frame(connection)
+    if frame is None or frame[0] != REQUEST:
+        return
+
+    request = json.loads(frame[1])
+    errors = io.StringIO()
+
+    # the front end reports errors by printing them and exiting, none of
+    # which may happen to the server
+    try:
+        with contextlib.redirect_stdout(errors), contextlib.redirect_stderr(errors):
+            _, options = parse_options(request["arguments"])
+            statements = programs.load(request, options)
+    except SystemExit as e:
+        send_frame(connection, STDERR, errors.getvalue().encode())
+        send_frame(
+            connection, EXIT, str(e.code if isinstance(e.code, int) else 1).encode()
+        )
+        return
+    except Exception:
+        errors.write(traceback.format_exc())
+        send_frame(connection, STDERR, errors.getvalue().encode())
+        send_frame(connection, EXIT, b"1")
+        return
+
+    if os.fork() == 0:
+        listener.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 1
+        try:
+            code = run_child(connection, statements, options)
+            send_frame(connection, EXIT, str(code).encode())
+        finally:
+            os._exit(code)
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def server_running(socket_path: str):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        probe.close()
+    return True
+
+
+def serve(socket_path: str = None):
+    socket_path = socket_path or default_socket_path()
+    if os.path.exists(socket_path):
+        if server_running(socket_path):
+            print(f"A lox server is already running on {socket_path}", file=sys.stderr)
+            exit(1)
+        # left behind by a server that didn't stop cleanly
+        os.remove(socket_path)
+
+    # children are never waited for
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # `kill` stops the server like ctrl-c does, removing the socket
+    signal.signal(signal.SIGTERM, stop)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    programs = ProgramCache()
+
+    print(f"serving on {socket_path}", file=sys.stderr)
+    sys.stderr.flush()
+
+    try:
+        while True:
+            connection, _ = listener.accept()
+            with connection:
+                try:
+                    handle(connection, listener, programs)
+                except (OSError, ValueError, KeyError) as e:
+                    # a bad request or a client gone early only ends its connection
+                    print(f"request failed: {e!r}", file=sys.stderr)
+                    sys.stderr.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        os.remove(socket_path)
@@ -0,0 +1,73 @@
+"""
+Memory held by the AST of a large generated program, in bytes per node.
+
+    python3 -m benchmarks.ast_memory [lines]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from benchmarks.scanner_throughput import CHUNK
+from interpreter.grammar import Expression, Statement
+from interpreter.parser import Parser
+from interpreter.scanner import Scanner
+
+
+def make_lines(count):
+    # whole chunks only, the program has to stay valid
+    lines = []
+    while len(lines) < count:
+        lines.extend((CHUNK % len(lines)).split("\n"))
+    return lines
+
+
+def attribute_values(node):
+    for klass in type(node).__mro__:
+        for name in getattr(klass, "__slots__", ()):
+            if hasattr(node, name):
+                yield getattr(node, name)
+    yield from getattr(node, "__dict__", {}).values()
+
+
+def count_nodes(statements):
+    count = 0
+    pending = list(statements)
+
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, (Expression, Statement)):
+            count += 1
+            pending.extend(attribute_values(node))
+
+    return count
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lines = make_lines(line_count)
+
+    gc.collect()
+    tracemalloc.start()
+
+    scanner = Scanner()
+    scanner.scan_tokens(lines)
+    statements = Parser(scanner.tokens).parse()
+    # tokens the AST doesn't point to are freed with the scanner
+    del scanner
+    gc.collect()
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = count_nodes(statements)
+    print(f"{len(lines)} lines, {nodes} nodes")
+    print(
+        f"{size / 1024 / 1024:.1f}MB, {size / nodes:.1f} bytes/node (tokens included)"
+    )
+
+
+if __name__ == "__main__":
+    main()
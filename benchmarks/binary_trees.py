@@ -0,0 +1,98 @@
+"""
+Binary trees: memory per lox instance and time per allocation, for every engine.
+
+    python3 -m benchmarks.binary_trees [depth]
+
+Memory is measured on a tree held in a global after the tree walker built it.
+The same number for instances that keep their fields in a dict of their own,
+the layout before shapes, is printed next to it.
+"""
+
+import contextlib
+import gc
+import io
+import sys
+import tracemalloc
+
+from app.main import ENGINES
+from benchmarks import common
+from interpreter.callable import MyClass
+from interpreter.internals import Token, TokenType
+
+SOURCE = """
+class Node {
+  init(left, right) {
+    this.left = left;
+    this.right = right;
+  }
+
+  check() {
+    if (this.left == nil) return 1;
+    return 1 + this.left.check() + this.right.check();
+  }
+}
+
+fun make(depth) {
+  if (depth == 0) return Node(nil, nil);
+  return Node(make(depth - 1), make(depth - 1));
+}
+
+var tree = make(%d);
+print tree.check();
+"""
+
+
+class DictInstance:
+    # the instance layout before shapes, for comparison
+    def __init__(self, klass):
+        self.klass = klass
+        self.fields = {}
+
+
+def tree_memory(depth):
+    statements = common.resolve(SOURCE % depth)
+
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ENGINES["tree"](statements)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size
+
+
+def dict_memory(count):
+    klass = MyClass(Token(TokenType.IDENTIFIER, "Node", None, 0), {})
+
+    gc.collect()
+    tracemalloc.start()
+    instances = []
+    for _ in range(count):
+        instance = DictInstance(klass)
+        instance.fields["left"] = None
+        instance.fields["right"] = None
+        instances.append(instance)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # the list holding them isn't part of the instances
+    return size - sys.getsizeof(instances)
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 14
+    nodes = 2 ** (depth + 1) - 1
+
+    print(f"depth {depth}, {nodes} instances")
+    print(f"memory   {tree_memory(depth) / nodes:8.1f} bytes/instance")
+    print(f"  (dict) {dict_memory(nodes) / nodes:8.1f} bytes/instance")
+
+    for engine in ENGINES:
+        best = min(common.run(engine, SOURCE % depth)[0] for _ in range(3))
+        print(f"{engine:8} {best:8.3f}s {best / nodes * 1e9:10.0f} ns/instance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+What the benchmarks running a lox program on every engine share: the front
+end without the compile cache, and a timed run with the output captured.
+"""
+
+import contextlib
+import io
+import time
+
+from app.main import ENGINES
+from interpreter.analysis import analyze_program
+from interpreter.parser import Parser
+from interpreter.scanner import Scanner
+
+
+def resolve(source: str):
+    """Scans, parses and resolves lox source, returns the statements."""
+    scanner = Scanner()
+    statements = Parser(scanner.scan_source(source)).parse()
+    scanner.close()
+    return analyze_program(statements)
+
+
+def run(engine: str, source: str):
+    """Runs the source on `engine`, returns the seconds it ran and its output."""
+    statements = resolve(source)
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        ENGINES[engine](statements)
+    return time.perf_counter() - start, output.getvalue()
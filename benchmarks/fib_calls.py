@@ -0,0 +1,41 @@
+"""
+Time per lox function call on recursive fib, for every engine.
+
+    python3 -m benchmarks.fib_calls [n]
+"""
+
+import sys
+
+from app.main import ENGINES
+from benchmarks import common
+
+SOURCE = """
+fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 2) + fib(n - 1);
+}
+
+print fib(%d);
+"""
+
+
+def call_count(n):
+    # fib(n) makes fib(n - 1) + fib(n - 2) + 1 calls
+    a, b = 1, 1
+    for _ in range(n - 1):
+        a, b = b, a + b + 1
+    return b
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    calls = call_count(n)
+
+    print(f"fib({n}), {calls} calls")
+    for engine in ENGINES:
+        best = min(common.run(engine, SOURCE % n)[0] for _ in range(3))
+        print(f"{engine:8} {best:8.3f}s {best / calls * 1e9:10.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
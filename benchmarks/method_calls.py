@@ -0,0 +1,41 @@
+"""
+Time per `a.method()` call in a loop, for every engine.
+
+    python3 -m benchmarks.method_calls [calls]
+"""
+
+import sys
+
+from app.main import ENGINES
+from benchmarks import common
+
+SOURCE = """
+class Counter {
+  init() {
+    this.count = 0;
+  }
+
+  add(n) {
+    this.count = this.count + n;
+  }
+}
+
+var counter = Counter();
+for (var i = 0; i < %d; i = i + 1) {
+  counter.add(i);
+}
+print counter.count;
+"""
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"{calls} method calls")
+    for engine in ENGINES:
+        best = min(common.run(engine, SOURCE % calls)[0] for _ in range(3))
+        print(f"{engine:8} {best:8.3f}s {best / calls * 1e9:10.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Runs every program in benchmarks/optimizer with and without the optimizer on
+every engine and checks that stdout and the exit code are the same.
+
+    python3 -m benchmarks.optimizer_check [-O<level>]
+"""
+
+import glob
+import os
+import subprocess
+import sys
+import time
+
+from app.main import ENGINES
+
+CORPUS = os.path.join(os.path.dirname(__file__), "optimizer")
+
+
+def run(file_name, engine, *options):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "app.main", "evaluate", "--no-cache"]
+        + [f"--engine={engine}", *options, file_name],
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout, result.returncode, time.perf_counter() - start
+
+
+def main():
+    level = sys.argv[1] if len(sys.argv) > 1 else "-O"
+    failures = 0
+
+    for file_name in sorted(glob.glob(os.path.join(CORPUS, "*.lox"))):
+        for engine in ENGINES:
+            expected, expected_code, plain_time = run(file_name, engine)
+            output, code, optimized_time = run(file_name, engine, level)
+
+            same = output == expected and code == expected_code
+            failures += not same
+            print(
+                f"{'ok  ' if same else 'FAIL'} {os.path.basename(file_name):20} "
+                f"{engine:8} {plain_time:6.3f}s -> {optimized_time:6.3f}s"
+            )
+
+    if failures:
+        print(f"{failures} programs changed output", file=sys.stderr)
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
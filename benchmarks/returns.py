@@ -0,0 +1,101 @@
+"""
+Return heavy recursion: time per `fib` call for every engine, then the two ways
+of getting a return out of nested blocks on their own.
+
+    python3 -m benchmarks.returns [n]
+
+The tree walker used to raise an exception at `return` and catch it in the
+function, statements now give back None or `(value,)` and blocks pass it up.
+The second part runs both in plain python, a return from three blocks deep.
+"""
+
+import sys
+import time
+
+from app.main import ENGINES
+from benchmarks import common
+
+SOURCE = """
+fun fib(n) {
+  if (n < 2) {
+    return n;
+  }
+  return fib(n - 1) + fib(n - 2);
+}
+
+print fib(%d);
+"""
+
+DEPTH = 3
+
+
+class Return(Exception):
+    def __init__(self, value) -> None:
+        self.value = value
+
+
+def raise_return(depth):
+    # a block per level, the return is raised from the innermost one
+    try:
+        if depth == 0:
+            raise Return(depth)
+        raise_return(depth - 1)
+    finally:
+        pass
+
+
+def raise_call():
+    try:
+        raise_return(DEPTH)
+    except Return as e:
+        return e.value
+
+
+def complete_return(depth):
+    try:
+        if depth == 0:
+            return (depth,)
+        completion = complete_return(depth - 1)
+        if completion is not None:
+            return completion
+    finally:
+        pass
+
+
+def complete_call():
+    completion = complete_return(DEPTH)
+    return None if completion is None else completion[0]
+
+
+def calls(n):
+    # fib(n) calls fib this many times
+    a, b = 1, 1
+    for _ in range(n):
+        a, b = b, a + b + 1
+    return a
+
+
+def time_returns(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    total = calls(n)
+
+    print(f"fib({n}), {total} calls")
+    for engine in ENGINES:
+        best = min(common.run(engine, SOURCE % n)[0] for _ in range(3))
+        print(f"{engine:8} {best:8.3f}s {best / total * 1e9:10.0f} ns/call")
+
+    print(f"return from {DEPTH} blocks deep, {total} returns")
+    for name, function in (("raise", raise_call), ("complete", complete_call)):
+        best = min(time_returns(function, total) for _ in range(3))
+        print(f"{name:8} {best:8.3f}s {best / total * 1e9:10.0f} ns/return")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Runs the programs in benchmarks/suite, plus a big generated one that is mostly
+scanning and parsing, through the same pipeline as `app.main evaluate`, and
+compares the results with a stored baseline.
+
+    python3 -m benchmarks.runner [options] [names...]
+
+    --engine=<name>             engine to run, can be given more than once (tree)
+    --warmup=<n>                untimed runs first (1)
+    --repeat=<n>                timed runs, the best is kept (5)
+    --output=<file>             write the results as JSON
+    --baseline[=<file>]         compare with results written by --output before
+                                (benchmarks/baseline.json)
+    --threshold=<ratio>         slowdown that is a regression (0.10)
+    --memory-threshold=<ratio>  peak memory growth that is a regression (0.10)
+
+A run is the whole pipeline without the compile cache: scanning, parsing,
+resolving and running the program. Peak memory is taken from one more run
+under tracemalloc, which is too slow to time. Exits with 1 when a benchmark
+regressed against the baseline. The tracked baseline has every engine, after
+a change that moves the numbers on purpose write it again with
+`--engine=<each> --output=benchmarks/baseline.json`.
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.main import ENGINES, load_program
+
+SUITE = os.path.join(os.path.dirname(__file__), "suite")
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# smaller peak memory growth is noise, however large it is relative to the baseline
+MEMORY_NOISE = 64 * 1024
+
+GENERATED_NAME = "parse_large"
+GENERATED_FUNCTIONS = 1500
+
+GENERATED_FUNCTION = """
+fun function%(i)d(a, b) {
+  var total = a * %(i)d + b / 2 - (a - b);
+  if (total > %(i)d and !(a == b)) {
+    total = total - 1;
+  } else {
+    total = total + "%(i)d" == "0";
+  }
+  for (var i = 0; i < 3; i = i + 1) {
+    total = total + i;
+  }
+  return total;
+}
+"""
+
+GENERATED_CLASS = """
+class Class%(i)d extends Base {
+  init(x) {
+    this.x = x;
+  }
+
+  get() {
+    return this.x + %(i)d;
+  }
+}
+"""
+
+
+def generate(file_name, functions=GENERATED_FUNCTIONS):
+    # declarations aren't run, only the last few lines are
+    with open(file_name, "w") as file:
+        file.write("class Base {}\n")
+        for i in range(functions):
+            file.write(GENERATED_FUNCTION % {"i": i})
+            if i % 10 == 0:
+                file.write(GENERATED_CLASS % {"i": i})
+        file.write("print function1(1, 2);\n")
+        file.write("print Class10(1).get();\n")
+
+
+def parse_options(arguments):
+    options = {
+        "engines": [],
+        "warmup": 1,
+        "repeat": 5,
+        "output": None,
+        "baseline": None,
+        "threshold": 0.10,
+        "memory_threshold": 0.10,
+    }
+    names = []
+
+    for argument in arguments:
+        if argument.startswith("--engine="):
+            options["engines"].append(argument.split("=", 1)[1])
+        elif argument.startswith("--warmup="):
+            options["warmup"] = int(argument.split("=", 1)[1])
+        elif argument.startswith("--repeat="):
+            options["repeat"] = int(argument.split("=", 1)[1])
+        elif argument.startswith("--output="):
+            options["output"] = argument.split("=", 1)[1]
+        elif argument == "--baseline":
+            options["baseline"] = BASELINE
+        elif argument.startswith("--baseline="):
+            options["baseline"] = argument.split("=", 1)[1]
+        elif argument.startswith("--threshold="):
+            options["threshold"] = float(argument.split("=", 1)[1])
+        elif argument.startswith("--memory-threshold="):
+            options["memory_threshold"] = float(argument.split("=", 1)[1])
+        else:
+            names.append(argument)
+
+    options["engines"] = options["engines"] or ["tree"]
+    return names, options
+
+
+def run(engine, file_name):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ENGINES[engine](load_program(file_name))
+
+
+def measure(engine, file_name, warmup, repeat):
+    for _ in range(warmup):
+        run(engine, file_name)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(engine, file_name)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(engine, file_name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "time": min(times),
+        "median": statistics.median(times),
+        "peak_memory": peak,
+    }
+
+
+def change(value, base):
+    return value / base - 1 if base else 0.0
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Prints every benchmark next to its baseline, returns how many regressed."""
+    regressions = 0
+
+    print(
+        f"{'benchmark':32} {'time':>9} {'base':>9} {'change':>7} "
+        f"{'peak':>9} {'base':>9} {'change':>7}"
+    )
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:32} {result['time']:8.3f}s {'-':>9}")
+            continue
+
+        time_change = change(result["time"], base["time"])
+        memory_change = change(result["peak_memory"], base["peak_memory"])
+        memory_regressed = (
+            memory_change > memory_threshold
+            and result["peak_memory"] - base["peak_memory"] > MEMORY_NOISE
+        )
+        regressed = time_change > threshold or memory_regressed
+        regressions += regressed
+
+        print(
+            f"{key:32} {result['time']:8.3f}s {base['time']:8.3f}s "
+            f"{time_change:+7.1%} {result['peak_memory'] / 1024:8.0f}K "
+            f"{base['peak_memory'] / 1024:8.0f}K {memory_change:+7.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+
+    return regressions
+
+
+def main():
+    names, options = parse_options(sys.argv[1:])
+
+    for engine in options["engines"]:
+        if engine not in ENGINES:
+            print(f"Unknown engine {engine}", file=sys.stderr)
+            exit(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        programs = {
+            os.path.basename(file_name)[: -len(".lox")]: file_name
+            for file_name in sorted(glob.glob(os.path.join(SUITE, "*.lox")))
+        }
+        programs[GENERATED_NAME] = os.path.join(directory, GENERATED_NAME + ".lox")
+        generate(programs[GENERATED_NAME])
+
+        for name in names:
+            if name not in programs:
+                print(f"Unknown benchmark {name}", file=sys.stderr)
+                exit(1)
+        if names:
+            programs = {name: programs[name] for name in names}
+
+        results = {}
+        for name, file_name in programs.items():
+            for engine in options["engines"]:
+                result = measure(
+                    engine, file_name, options["warmup"], options["repeat"]
+                )
+                results[f"{name}/{engine}"] = result
+                if options["baseline"] is None:
+                    print(
+                        f"{name + '/' + engine:32} {result['time']:8.3f}s "
+                        f"(median {result['median']:.3f}s) "
+                        f"{result['peak_memory'] / 1024:8.0f}K peak"
+                    )
+
+    if options["output"] is not None:
+        with open(options["output"], "w") as file:
+            json.dump(
+                {"python": platform.python_version(), "results": results},
+                file,
+                indent=2,
+            )
+
+    if options["baseline"] is not None:
+        with open(options["baseline"]) as file:
+            baseline = json.load(file)["results"]
+
+        regressions = compare(
+            results, baseline, options["threshold"], options["memory_threshold"]
+        )
+        if regressions:
+            print(f"{regressions} benchmarks regressed", file=sys.stderr)
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
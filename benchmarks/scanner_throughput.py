@@ -0,0 +1,69 @@
+"""
+Scanner throughput in MB/s on a large generated program.
+
+    python3 -m benchmarks.scanner_throughput [megabytes]
+"""
+
+import sys
+import time
+
+from interpreter.scanner import Scanner
+
+CHUNK = """
+// counts down and keeps the running total
+class Counter {
+  init(start) {
+    this.value = start;
+    this.total = 0;
+  }
+
+  step(amount) {
+    if (this.value >= amount and amount != 0) {
+      this.value = this.value - amount;
+      this.total = this.total + amount * 1.5;
+    }
+    return this.value <= 0 or !true;
+  }
+}
+
+fun run_%d(limit) {
+  var counter = Counter(limit);
+  for (var i = 0; i < limit; i = i + 1) {
+    if (counter.step(2)) return "done after " + "steps";
+  }
+  print counter.total / 3.25;
+  return nil;
+}
+"""
+
+
+def make_source(megabytes):
+    chunks = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        chunk = CHUNK % len(chunks)
+        chunks.append(chunk)
+        size += len(chunk)
+    return "".join(chunks)
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    source = make_source(megabytes)
+    lines = source.split("\n")
+    size = len(source.encode()) / (1024 * 1024)
+
+    best = None
+    for _ in range(3):
+        scanner = Scanner()
+        start = time.perf_counter()
+        scanner.scan_tokens(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{size:.1f}MB, {len(scanner.tokens)} tokens")
+    print(f"{best:.3f}s, {size / best:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
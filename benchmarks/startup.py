@@ -0,0 +1,168 @@
+"""
+Measures how long the interpreter takes to start, the part of every short
+script's run that isn't the script, and checks it against a tracked budget.
+
+    python3 -m benchmarks.startup [options]
+
+    --repeat=<n>       runs of each measurement, the best is kept (10)
+    --budget=<file>    budget to check against (benchmarks/startup_budget.json)
+    --update           write the measured numbers as the new budget instead
+
+Two numbers, both from running `app.main evaluate` on a hello world program in
+a fresh python each time:
+
+- `imports_ms` - time `-X importtime` reports for importing the interpreter,
+  the modules of `app` and `interpreter` and everything they pull in
+- `first_output_ms` - time from starting the process to reading its first
+  line of output, less the time a bare python takes to print one
+
+Both are without the compile cache. Python writes and reads bytecode for the
+imported modules as usual, with PYTHONDONTWRITEBYTECODE set the imports are
+compiled on every run and take several times as long. Exits with 1 when a
+number is over its budget by more than the tolerance stored with it.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BUDGET = os.path.join(os.path.dirname(__file__), "startup_budget.json")
+DEFAULT_TOLERANCE = 0.25
+
+HELLO = 'print "hello";\n'
+INTERPRETER_PACKAGES = ("app", "interpreter")
+
+
+def parse_options(arguments):
+    options = {"repeat": 10, "budget": BUDGET, "update": False}
+
+    for argument in arguments:
+        if argument.startswith("--repeat="):
+            options["repeat"] = int(argument.split("=", 1)[1])
+        elif argument.startswith("--budget="):
+            options["budget"] = argument.split("=", 1)[1]
+        elif argument == "--update":
+            options["update"] = True
+        else:
+            print(f"Unknown option {argument}", file=sys.stderr)
+            exit(1)
+
+    return options
+
+
+def evaluate_command(file_name, *flags):
+    return [
+        sys.executable,
+        *flags,
+        "-m",
+        "app.main",
+        "evaluate",
+        "--no-cache",
+        file_name,
+    ]
+
+
+def imports_time(file_name):
+    """Milliseconds `-X importtime` reports for the interpreter's own imports."""
+    result = subprocess.run(
+        evaluate_command(file_name, "-X", "importtime"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total = 0
+    for line in result.stderr.splitlines():
+        # import time: <self us> | <cumulative us> | <indented module name>
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        # only modules imported straight from the program, nested ones are
+        # indented further, the cumulative time of each has what it imported
+        if name.startswith("  "):
+            continue
+        if name.strip().split(".")[0] in INTERPRETER_PACKAGES:
+            total += int(cumulative)
+
+    return total / 1000
+
+
+def first_output_time(command):
+    """Milliseconds from starting `command` to its first line of output."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+
+    process.stdout.close()
+    process.wait()
+    return elapsed * 1000
+
+
+def measure(repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "hello.lox")
+        with open(file_name, "w") as file:
+            file.write(HELLO)
+
+        # the first run writes the bytecode the others read
+        first_output_time(evaluate_command(file_name))
+
+        bare = min(
+            first_output_time([sys.executable, "-c", "print('hello')"])
+            for _ in range(repeat)
+        )
+        interpreter = min(
+            first_output_time(evaluate_command(file_name)) for _ in range(repeat)
+        )
+        imports = min(imports_time(file_name) for _ in range(repeat))
+
+    return {
+        "imports_ms": round(imports, 2),
+        "first_output_ms": round(interpreter - bare, 2),
+    }
+
+
+def main():
+    options = parse_options(sys.argv[1:])
+    results = measure(options["repeat"])
+
+    if options["update"]:
+        budget = {
+            name: {"budget": value, "tolerance": DEFAULT_TOLERANCE}
+            for name, value in results.items()
+        }
+        with open(options["budget"], "w") as file:
+            json.dump(budget, file, indent=2)
+            file.write("\n")
+
+        for name, value in results.items():
+            print(f"{name:16} {value:8.2f}")
+        return
+
+    with open(options["budget"]) as file:
+        budget = json.load(file)
+
+    over = 0
+    print(f"{'':16} {'measured':>8} {'budget':>8} {'change':>7}")
+    for name, value in results.items():
+        limit = budget[name]["budget"]
+        change = value / limit - 1 if limit else 0.0
+        exceeded = change > budget[name]["tolerance"]
+        over += exceeded
+
+        print(
+            f"{name:16} {value:8.2f} {limit:8.2f} {change:+7.1%}"
+            f"{'  OVER BUDGET' if exceeded else ''}"
+        )
+
+    if over:
+        print(f"{over} startup numbers over budget", file=sys.stderr)
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
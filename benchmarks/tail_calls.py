@@ -0,0 +1,56 @@
+"""
+1M deep tail recursion, self and mutual, for every engine.
+
+    python3 -m benchmarks.tail_calls [depth]
+
+The python engine runs lox functions as python functions, its tail calls still
+use the python stack and it stops at the recursion limit.
+"""
+
+import sys
+
+from app.main import ENGINES
+from benchmarks import common
+
+SOURCE = """
+fun count(n, total) {
+  if (n == 0) return total;
+  return count(n - 1, total + 1);
+}
+
+fun even(n) {
+  if (n == 0) return true;
+  return odd(n - 1);
+}
+
+fun odd(n) {
+  if (n == 0) return false;
+  return even(n - 1);
+}
+
+print count(%d, 0);
+print even(%d);
+"""
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # both functions recurse `depth` times
+    calls = 2 * depth
+
+    print(f"depth {depth}")
+    for engine in ENGINES:
+        try:
+            elapsed, output = common.run(engine, SOURCE % (depth, depth))
+        except RecursionError:
+            print(f"{engine:8} RecursionError")
+            continue
+
+        print(
+            f"{engine:8} {elapsed:8.3f}s {elapsed / calls * 1e9:10.0f} ns/call "
+            f"{' '.join(output.split())}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Memory per token and parser speed on a large generated program, for the token
+list made by `Scanner.scan` and the `TokenBuffer` made by `Scanner.scan_buffer`.
+
+    python3 -m benchmarks.tokens [megabytes]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.scanner_throughput import make_source
+from interpreter.parser import Parser
+from interpreter.scanner import Scanner
+
+
+def measure(file_name, scan):
+    tracemalloc.start()
+    tokens = scan(Scanner(), file_name)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        Parser(tokens).parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return len(tokens), size, best
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+    with tempfile.NamedTemporaryFile("w", suffix=".lox", delete=False) as file:
+        file.write(make_source(megabytes))
+
+    try:
+        for name, scan in [("list", Scanner.scan), ("buffer", Scanner.scan_buffer)]:
+            count, size, parse_time = measure(file.name, scan)
+            print(
+                f"{name:8} {count} tokens, {size / count:6.1f} bytes/token, "
+                f"parse {parse_time:.3f}s"
+            )
+    finally:
+        os.remove(file.name)
+
+
+if __name__ == "__main__":
+    main()
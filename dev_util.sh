@@ -17,9 +17,12 @@ case "$1" in
   "eval")
     python3 -m app.main evaluate test.lox
     ;;
+  "eval-vm")
+    python3 -m app.main evaluate --engine=vm test.lox
+    ;;
   *)
     echo "Unknown flag: $1"
-    echo "Usage: $0 {tokenize|parse|eval}"
+    echo "Usage: $0 {tokenize|parse|eval|eval-vm}"
     exit 1
     ;;
 esac
\ No newline at end of file
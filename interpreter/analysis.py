@@ -0,0 +1,35 @@
+"""
+The passes run on a parsed program before any engine sees it, shared by the
+command line and `app.embed`.
+"""
+
+from contextlib import nullcontext
+
+from interpreter.resolver import Resolver
+
+# the optimizer and the purity analysis are imported when a run asks for them
+
+
+def phase(stats, name):
+    # `--stats` times every phase, without it this does nothing
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def analyze_program(statements, optimize=0, memo=None, stats=None):
+    """Optimizes and resolves parsed statements, with `memo` marks the pure functions."""
+    if optimize:
+        from interpreter.optimizer import Optimizer
+
+        with phase(stats, "optimize"):
+            statements = Optimizer(optimize).optimize(statements)
+
+    with phase(stats, "resolve"):
+        Resolver().resolve_program(statements)
+
+    if memo is not None:
+        from interpreter.purity import PurityAnalyzer
+
+        with phase(stats, "purity"):
+            PurityAnalyzer(memo).analyze(statements)
+
+    return statements
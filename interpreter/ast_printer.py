@@ -1,35 +1,40 @@
-from interpreter.grammar import Expression, Binary, Unary, Literal, Grouping, Variable
+from interpreter.internals import Token, TokenType
 import sys
 
+# grammar imports this module to print expressions, so nodes are told apart by
+# class name instead of importing their classes back from it
+
 class AstPrinter:
     # TODO: implement visitor pattern or move it to grammer's toString methods
-    def print(self, expression: Expression) -> str:
+    def print(self, expression: "Expression") -> str:
         return self.parenthesize("", expression).strip()
 
-    def visit_binary(self, binary: Binary) -> str:
+    def visit_binary(self, binary: "Binary") -> str:
         return self.parenthesize(binary.operator.lexeme, binary.left, binary.right)
 
-    def visit_unary(self, unary: Unary) -> str:
+    def visit_unary(self, unary: "Unary") -> str:
         return self.parenthesize(unary.operator.lexeme, unary.right)
 
-    def visit_literal(self, literal: Literal) -> str:
+    def visit_literal(self, literal: "Literal") -> str:
         return str(literal.value)
 
-    def visit_grouping(self, grouping: Grouping) -> str:
+    def visit_grouping(self, grouping: "Grouping") -> str:
         return self.parenthesize("group", grouping.expression)
 
-    def parenthesize(self, name: str, *expressions: Expression) -> str:
+    VISITORS = {
+        "Binary": visit_binary,
+        "Unary": visit_unary,
+        "Literal": visit_literal,
+        "Grouping": visit_grouping,
+    }
+
+    def parenthesize(self, name: str, *expressions: "Expression") -> str:
         result = f"({name}" if name else ""
 
         for exp in expressions:
-            if isinstance(exp, Binary):
-                result += " " + self.visit_binary(exp)
-            elif isinstance(exp, Unary):
-                result += " " + self.visit_unary(exp)
-            elif isinstance(exp, Literal):
-                result += " " + self.visit_literal(exp)
-            elif isinstance(exp, Grouping):
-                result += " " + self.visit_grouping(exp)
+            visit = self.VISITORS.get(type(exp).__name__)
+            if visit is not None:
+                result += " " + visit(self, exp)
             else:
                 print("exp", exp.__str__)
 
@@ -37,13 +42,13 @@ class AstPrinter:
 
 
 def main():
-    from interpreter.internals import Token
+    from interpreter.grammar import Binary, Unary, Literal, Grouping
 
-    minus = Token("MINUS", "-", 1, 1)
+    minus = Token(TokenType.MINUS, "-", 1, 1)
 
     expression = Binary(
         Unary(minus, Literal(3)),
-        Token("STAR", "*", 1, 1),
+        Token(TokenType.STAR, "*", 1, 1),
         Grouping(Literal(45.234)),
     )
 
@@ -0,0 +1,175 @@
+class OpCode:
+    CONSTANT = 0
+    NIL = 1
+    TRUE = 2
+    FALSE = 3
+    POP = 4
+
+    GET_LOCAL = 5
+    SET_LOCAL = 6
+    GET_UPVALUE = 7
+    SET_UPVALUE = 8
+    GET_GLOBAL = 9
+    SET_GLOBAL = 10
+    DEFINE_GLOBAL = 11
+    GET_PROPERTY = 12
+    SET_PROPERTY = 13
+
+    ADD = 14
+    SUBTRACT = 15
+    MULTIPLY = 16
+    DIVIDE = 17
+    NEGATE = 18
+    NOT = 19
+    EQUAL = 20
+    NOT_EQUAL = 21
+    GREATER = 22
+    GREATER_EQUAL = 23
+    LESS = 24
+    LESS_EQUAL = 25
+
+    PRINT = 26
+    JUMP = 27
+    JUMP_IF_FALSE = 28
+    JUMP_IF_TRUE = 29
+    POP_JUMP_IF_FALSE = 30
+
+    CALL = 31
+    INVOKE = 32
+    CLOSURE = 33
+    CLOSE_UPVALUE = 34
+    RETURN = 35
+
+    CLASS = 36
+    INHERIT = 37
+    METHOD = 38
+
+    # CALL and INVOKE for `return f(...)`, the caller's frame is dropped
+    TAIL_CALL = 39
+    TAIL_INVOKE = 40
+
+    # number of inline operands following each opcode, CLOSURE is followed by
+    # an extra (is_local, index) pair for every upvalue of the function.
+    OPERANDS = {
+        CONSTANT: 1,
+        GET_LOCAL: 1,
+        SET_LOCAL: 1,
+        GET_UPVALUE: 1,
+        SET_UPVALUE: 1,
+        GET_GLOBAL: 1,
+        SET_GLOBAL: 1,
+        DEFINE_GLOBAL: 1,
+        GET_PROPERTY: 1,
+        SET_PROPERTY: 1,
+        JUMP: 1,
+        JUMP_IF_FALSE: 1,
+        JUMP_IF_TRUE: 1,
+        POP_JUMP_IF_FALSE: 1,
+        CALL: 1,
+        INVOKE: 2,
+        CLOSURE: 1,
+        CLASS: 1,
+        METHOD: 1,
+        TAIL_CALL: 1,
+        TAIL_INVOKE: 2,
+    }
+
+    NAMES = {
+        value: name
+        for name, value in vars().items()
+        if name.isupper() and isinstance(value, int)
+    }
+
+
+class Chunk:
+    """
+    A flat list of opcodes with their operands inlined, the constant pool they
+    refer to, and the source line of every code unit for error reporting.
+    """
+
+    def __init__(self) -> None:
+        self.code: list[int] = []
+        self.lines: list[int] = []
+        self.constants: list = []
+        self.constant_indexes: dict = {}
+
+    def write(self, unit: int, line: int):
+        self.code.append(unit)
+        self.lines.append(line)
+        return len(self.code) - 1
+
+    def add_constant(self, value):
+        # 1.0 == True in python, so the type is part of the key
+        key = (type(value), value)
+
+        try:
+            index = self.constant_indexes.get(key)
+        except TypeError:
+            key, index = None, None
+
+        if index is None:
+            self.constants.append(value)
+            index = len(self.constants) - 1
+            if key is not None:
+                self.constant_indexes[key] = index
+
+        return index
+
+
+class FunctionProto:
+    """Compiled, not yet closed over, body of a lox function."""
+
+    def __init__(self, name: str, arity: int = 0) -> None:
+        self.name = name
+        self.arity = arity
+        self.chunk = Chunk()
+        self.upvalue_count = 0
+
+    def __str__(self):
+        return f"<fn {self.name}>"
+
+
+def disassemble(proto: FunctionProto) -> str:
+    chunk = proto.chunk
+    lines = [f"== {proto.name} =="]
+    nested = []
+    index = 0
+
+    while index < len(chunk.code):
+        opcode = chunk.code[index]
+        operand_count = OpCode.OPERANDS.get(opcode, 0)
+        operands = chunk.code[index + 1 : index + 1 + operand_count]
+        text = f"{index:04d} {chunk.lines[index]:4d} {OpCode.NAMES[opcode]:<18}"
+
+        if operands:
+            text += " ".join(str(i) for i in operands)
+
+        if opcode in (
+            OpCode.CONSTANT,
+            OpCode.GET_GLOBAL,
+            OpCode.SET_GLOBAL,
+            OpCode.DEFINE_GLOBAL,
+            OpCode.GET_PROPERTY,
+            OpCode.SET_PROPERTY,
+            OpCode.INVOKE,
+            OpCode.TAIL_INVOKE,
+            OpCode.CLASS,
+            OpCode.METHOD,
+            OpCode.CLOSURE,
+        ):
+            constant = chunk.constants[operands[0]]
+            text += f" '{getattr(constant, 'lexeme', constant)}'"
+
+        index += 1 + operand_count
+
+        if opcode == OpCode.CLOSURE:
+            function = chunk.constants[operands[0]]
+            nested.append(function)
+            index += 2 * function.upvalue_count
+
+        lines.append(text)
+
+    for function in nested:
+        lines.append(disassemble(function))
+
+    return "\n".join(lines)
@@ -1,6 +1,11 @@
 import time
 from interpreter.environment import Environment
-from interpreter.internals import Token, TokenType
+from interpreter.internals import Token
+
+
+def arity_error(arity: int, argument_count: int):
+    # every engine checks calls against the arity and raises this
+    return Exception(f"Expected {arity} arguments but got {argument_count}.")
 
 
 class MyCallable:
@@ -14,32 +19,102 @@ class MyCallable:
         return
 
 
+class Shape:
+    """
+    Field layout shared by all the instances that got the same fields in the
+    same order. `fields` maps a name to its index in the instance's `values`,
+    adding a field moves the instance to the next shape along `transitions`.
+    """
+
+    __slots__ = ("fields", "transitions")
+
+    fields: dict[str, int]
+    transitions: dict[str, "Shape"]
+
+    def __init__(self, fields: dict[str, int] = None) -> None:
+        self.fields = fields if fields is not None else {}
+        self.transitions = {}
+
+    def add(self, name: str):
+        shape = self.transitions.get(name)
+
+        if shape is None:
+            shape = Shape({**self.fields, name: len(self.fields)})
+            self.transitions[name] = shape
+
+        return shape
+
+
+class TailCall:
+    """
+    A call in tail position, `return f(...)`. The function that ends with it
+    returns it instead of making the call, and the trampoline of whoever called
+    that function makes it, so the python stack doesn't grow.
+    """
+
+    __slots__ = ("function", "receiver", "arguments")
+
+    def __init__(self, function, receiver, arguments) -> None:
+        self.function = function
+        self.receiver = receiver
+        self.arguments = arguments
+
+
+def trampoline(result):
+    while type(result) is TailCall:
+        result = result.function.enter(result.receiver, result.arguments)
+
+    return result
+
+
+def tail_call(function, arguments):
+    """Returns the `TailCall` for calling `function`, or the call's result for other callables."""
+    if isinstance(function, MyFunction):
+        return TailCall(function, None, arguments)
+    if isinstance(function, BoundMethod):
+        return TailCall(function.method, function.receiver, arguments)
+
+    return function.call(arguments)
+
+
 class MyClass(MyCallable):
     name: Token = None
+    # the whole inheritance chain flattened, the class's own methods win
     methods: dict[str, MyCallable] = {}
     super_class = None
+    initializer: MyCallable = None
+    initializer_arity: int = 0
+    # every class has its own tree of shapes, so a shape also tells the class
+    shape: Shape = None
 
     def __init__(self, name, methods, super_class=None):
         self.name = name
-        self.methods = methods
         self.super_class = super_class
+        if super_class is not None:
+            methods = {**super_class.methods, **methods}
+        self.methods = methods
+        self.set_initializer(methods.get("init"))
+        self.shape = Shape()
+
+    def set_initializer(self, initializer):
+        self.initializer = initializer
+        self.initializer_arity = initializer.arity() if initializer else 0
 
     def __call__(self, *args, **kwargs):
         instance = MyInstance(self)
 
-        init_method: MyFunction = self.methods.get("init")
-
-        if init_method:
-            init_method.bind(instance)(*args, **kwargs)
+        if self.initializer:
+            self.initializer.invoke(instance, args)
+        elif args:
+            raise arity_error(0, len(args))
 
         return instance
 
-    def arity(self):
-        has_init = self.methods.get("init")
-        if has_init:
-            return has_init.arity()
+    def find_method(self, name: str):
+        return self.methods.get(name)
 
-        return 0
+    def arity(self):
+        return self.initializer_arity
 
     def __str__(self):
         return f"<class {self.name.lexeme}>"
@@ -48,81 +123,130 @@ class MyClass(MyCallable):
 class MyFunction(MyCallable):
     body = None
     parameters: list[Token] = []
+    parameter_count: int = 0
     name: Token = None
     closure: Environment = None
+    is_initializer: bool = False
 
-    def __init__(self, parameters, body, name, closure):
+    def __init__(self, parameters, body, name, closure, is_initializer=False):
         self.parameters = parameters
+        self.parameter_count = len(parameters)
         self.body = body
         self.name = name
         self.closure = closure
+        self.is_initializer = is_initializer
 
     def __call__(self, *args, **kwargs):
-        from interpreter.grammar import ReturnAsException
+        return self.call(args)
+
+    def call(self, arguments):
+        # same as enter, not calling it keeps recursive lox calls one python frame shallower
+        if len(arguments) != self.parameter_count:
+            raise arity_error(self.parameter_count, len(arguments))
+
+        function_environment = Environment(self.closure, self.parameter_count)
+
+        values = function_environment.values
+        for i in range(self.parameter_count):
+            values[i] = arguments[i]
+
+        completion = self.body.eval(function_environment)
+        if completion is None:
+            return None
+
+        result = completion[0]
+        if type(result) is TailCall:
+            return trampoline(result)
+
+        return result
+
+    def invoke(self, instance, arguments):
+        """Calls the method with `instance` as `this`, which takes the first slot."""
+        return trampoline(self.enter(instance, arguments))
 
-        # define parameters in the function environment and create a new environment
-        function_environment = Environment(outer_environment=self.closure)
+    def enter(self, receiver, arguments):
+        """Runs the body once, returns its value or the `TailCall` it ended with."""
+        if len(arguments) != self.parameter_count:
+            raise arity_error(self.parameter_count, len(arguments))
 
-        for i in range(len(self.parameters)):
-            parameter = self.parameters[i]
-            function_environment.define(parameter, args[i])
+        if receiver is None:
+            function_environment = Environment(self.closure, self.parameter_count)
+            offset = 0
+        else:
+            function_environment = Environment(self.closure, self.parameter_count + 1)
+            function_environment.values[0] = receiver
+            offset = 1
 
-        try:
-            self.body.eval(given_environment=function_environment)
-        except ReturnAsException as e:
-            if self.name.lexeme == "init":
-                return self.closure.get(Token(TokenType.THIS, "this", None, 0))
+        values = function_environment.values
+        for i in range(self.parameter_count):
+            values[i + offset] = arguments[i]
 
-            return e.value
+        completion = self.body.eval(function_environment)
+        result = None if completion is None else completion[0]
 
-        if self.name.lexeme == "init":
-            return self.closure.get(Token(TokenType.THIS, "this", None, 0))
+        if self.is_initializer:
+            # `return f();` in init still calls f, but init gives `this` back
+            trampoline(result)
+            return receiver
+
+        return result
 
     def arity(self):
-        return len(self.parameters)
+        return self.parameter_count
 
     def bind(self, instance):
-        new_closure = Environment(outer_environment=self.closure)
-        # it means that replace this with the instance in new environment
-        new_closure.define(
-            Token(
-                token_type=TokenType.THIS,
-                lexeme="this",
-                literal=None,
-                line_number=0,
-            ),
-            instance,
-        )
-        return MyFunction(
-            parameters=self.parameters,
-            body=self.body,
-            name=self.name,
-            closure=new_closure,
-        )
+        return BoundMethod(self, instance)
 
     def __str__(self):
         return f"<fn {self.name.lexeme}>"
 
 
+class BoundMethod(MyCallable):
+    """A method read as a value, `a.method` without calling it right away."""
+
+    method: MyFunction = None
+    receiver = None
+
+    def __init__(self, method: MyFunction, receiver):
+        self.method = method
+        self.receiver = receiver
+
+    def __call__(self, *args, **kwargs):
+        return self.method.invoke(self.receiver, args)
+
+    def call(self, arguments):
+        return self.method.invoke(self.receiver, arguments)
+
+    def arity(self):
+        return self.method.arity()
+
+    def __str__(self):
+        return str(self.method)
+
+
 class MyInstance:
-    klass: MyClass = None
-    fields: dict[str, any] = {}
+    """Field values are kept in a list, in the order given by the shape."""
+
+    __slots__ = ("klass", "shape", "values")
+
+    klass: MyClass
+    shape: Shape
+    values: list
 
     def __init__(self, klass: MyClass):
         self.klass = klass
-        self.fields = {}
+        self.shape = klass.shape
+        self.values = []
 
     def __str__(self):
         return f"<instance of {self.klass.name.lexeme}>"
 
     def get(self, name: Token):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
-
-        method = self.klass.methods.get(name.lexeme)
+        index = self.shape.fields.get(name.lexeme)
+        if index is not None:
+            return self.values[index]
 
-        if not method and self.klass.super_class:
-            method = self.klass.super_class.methods.get(name.lexeme)
+        method = self.klass.find_method(name.lexeme)
 
         if method:
             return method.bind(self)
@@ -130,7 +254,16 @@ class MyInstance:
         raise Exception(f"Undefined property '{name.lexeme}'.")
 
     def set(self, name: Token, value):
-        self.fields[name.lexeme] = value
+        self.set_field(name.lexeme, value)
+
+    def set_field(self, name: str, value):
+        index = self.shape.fields.get(name)
+
+        if index is None:
+            self.shape = self.shape.add(name)
+            self.values.append(value)
+        else:
+            self.values[index] = value
 
 
 # native function clock
@@ -151,4 +284,9 @@ class ClockCallable(MyFunction):
         return 0
 
     def call(self, arguments):
+        if arguments:
+            raise arity_error(0, len(arguments))
         return self()
+
+    def enter(self, receiver, arguments):
+        return self.call(arguments)
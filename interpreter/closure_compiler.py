@@ -0,0 +1,588 @@
+from interpreter.environment import Environment
+from interpreter.natives import NATIVES
+from interpreter.internals import TokenType
+from interpreter.callable import (
+    MyCallable,
+    MyFunction,
+    MyClass,
+    MyInstance,
+    TailCall,
+    arity_error,
+    trampoline,
+    tail_call,
+)
+from interpreter.inline_cache import GetCache, SetCache
+from interpreter.memoize import Memoized, MemoTable
+from interpreter.grammar import (
+    Expression,
+    Binary,
+    Unary,
+    Literal,
+    Grouping,
+    Variable,
+    Assignment,
+    Logical,
+    Call,
+    Get,
+    Set,
+    This,
+    PrintStatement,
+    ExpressionStatement,
+    VarDeclarationStatement,
+    BlockStatement,
+    IfStatement,
+    WhileStatement,
+    FunctionDeclarationStatement,
+    ReturnStatement,
+    ClassDeclarationStatement,
+    new_global_environment,
+)
+
+
+class CompiledFunction(MyFunction):
+    """`MyFunction` whose body is a compiled block instead of an AST."""
+
+    def call(self, arguments):
+        if len(arguments) != self.parameter_count:
+            raise arity_error(self.parameter_count, len(arguments))
+
+        function_environment = Environment(self.closure)
+        function_environment.values = list(arguments)
+
+        result = self.body(function_environment)
+
+        if result is not None:
+            if type(result[0]) is TailCall:
+                return trampoline(result[0])
+
+            return result[0]
+
+    def enter(self, receiver, arguments):
+        if len(arguments) != self.parameter_count:
+            raise arity_error(self.parameter_count, len(arguments))
+
+        function_environment = Environment(self.closure)
+
+        if receiver is None:
+            function_environment.values = list(arguments)
+        else:
+            function_environment.values = [receiver, *arguments]
+
+        result = self.body(function_environment)
+        if result is not None:
+            result = result[0]
+
+        if self.is_initializer:
+            trampoline(result)
+            return receiver
+
+        return result
+
+
+class MemoCompiledFunction(Memoized, CompiledFunction):
+    pass
+
+
+def binary_operation(token_type, left, right):
+    if token_type == TokenType.PLUS:
+        return lambda env: left(env) + right(env)
+    elif token_type == TokenType.MINUS:
+        return lambda env: left(env) - right(env)
+    elif token_type == TokenType.STAR:
+        return lambda env: left(env) * right(env)
+    elif token_type == TokenType.SLASH:
+        return lambda env: left(env) / right(env)
+    elif token_type == TokenType.GREATER:
+        return lambda env: left(env) > right(env)
+    elif token_type == TokenType.GREATER_EQUAL:
+        return lambda env: left(env) >= right(env)
+    elif token_type == TokenType.LESS:
+        return lambda env: left(env) < right(env)
+    elif token_type == TokenType.LESS_EQUAL:
+        return lambda env: left(env) <= right(env)
+    elif token_type == TokenType.EQUAL_EQUAL:
+        return lambda env: left(env) == right(env)
+    elif token_type == TokenType.BANG_EQUAL:
+        return lambda env: left(env) != right(env)
+
+
+def binary_operation_constant(token_type, left, constant):
+    # `n - 1`, `i < 10`... skip calling a closure for the literal operand
+    if token_type == TokenType.PLUS:
+        return lambda env: left(env) + constant
+    elif token_type == TokenType.MINUS:
+        return lambda env: left(env) - constant
+    elif token_type == TokenType.STAR:
+        return lambda env: left(env) * constant
+    elif token_type == TokenType.SLASH:
+        return lambda env: left(env) / constant
+    elif token_type == TokenType.GREATER:
+        return lambda env: left(env) > constant
+    elif token_type == TokenType.GREATER_EQUAL:
+        return lambda env: left(env) >= constant
+    elif token_type == TokenType.LESS:
+        return lambda env: left(env) < constant
+    elif token_type == TokenType.LESS_EQUAL:
+        return lambda env: left(env) <= constant
+    elif token_type == TokenType.EQUAL_EQUAL:
+        return lambda env: left(env) == constant
+    elif token_type == TokenType.BANG_EQUAL:
+        return lambda env: left(env) != constant
+
+
+class ClosureCompiler:
+    """
+    Walks the resolved AST once and turns every node into a python closure
+    taking the current environment. Operators, resolved slots and global lookups
+    are decided here, so running the program doesn't look at tokens any more.
+
+    Expressions compile to `fn(env) -> value`, statements to
+    `fn(env) -> None | (value,)` where the tuple carries a `return`. Globals
+    are the run's, found through `env.globals`, so one compiled program runs
+    from fresh globals every time.
+    """
+
+    def __init__(self) -> None:
+        self.function_depth = 0
+        # every inline cache the program has, so a caller can empty them
+        self.caches = []
+        self.handlers = {
+            Binary: self.binary,
+            Unary: self.unary,
+            Literal: self.literal,
+            Grouping: self.grouping,
+            Variable: self.variable,
+            Assignment: self.assignment,
+            Logical: self.logical,
+            Call: self.call,
+            Get: self.get,
+            Set: self.set,
+            This: self.this,
+            PrintStatement: self.print_statement,
+            ExpressionStatement: self.expression_statement,
+            VarDeclarationStatement: self.var_declaration,
+            BlockStatement: self.block,
+            IfStatement: self.if_statement,
+            WhileStatement: self.while_statement,
+            FunctionDeclarationStatement: self.function_declaration,
+            ReturnStatement: self.return_statement,
+            ClassDeclarationStatement: self.class_declaration,
+        }
+
+    def inline_cache(self, kind, name):
+        cache = kind(name)
+        self.caches.append(cache)
+        return cache
+
+    def compile(self, statements):
+        compiled = [self.statement(statement) for statement in statements]
+
+        def program(env):
+            for statement in compiled:
+                statement(env)
+
+        return program
+
+    ################################################################################################
+
+    def statement(self, statement):
+        return self.handlers[type(statement)](statement)
+
+    def print_statement(self, statement: PrintStatement):
+        expression = self.expression(statement.expression)
+
+        def execute(env):
+            print(expression(env), file=env.globals.output)
+
+        return execute
+
+    def expression_statement(self, statement: ExpressionStatement):
+        expression = self.expression(statement.expression)
+
+        def execute(env):
+            expression(env)
+
+        return execute
+
+    def define(self, slot, name, value):
+        if slot is None:
+
+            def define_global(env):
+                env.globals.values[name] = value(env)
+
+            return define_global
+
+        def define_local(env):
+            env.values[slot] = value(env)
+
+        return define_local
+
+    def var_declaration(self, statement: VarDeclarationStatement):
+        expression = self.expression(statement.expression)
+        return self.define(statement.slot, statement.token.lexeme, expression)
+
+    def statements(self, statements):
+        compiled = [self.statement(statement) for statement in statements]
+
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def execute(env):
+            for statement in compiled:
+                result = statement(env)
+                if result is not None:
+                    return result
+
+        return execute
+
+    def block(self, statement: BlockStatement):
+        body = self.statements(statement.statements)
+
+        slot_count = statement.slot_count
+
+        def execute(env):
+            return body(Environment(env, slot_count))
+
+        return execute
+
+    def if_statement(self, statement: IfStatement):
+        condition = self.expression(statement.condition)
+        then_branch = self.statement(statement.if_statement)
+
+        if statement.else_statement is None:
+
+            def execute(env):
+                if condition(env):
+                    return then_branch(env)
+
+            return execute
+
+        else_branch = self.statement(statement.else_statement)
+
+        def execute(env):
+            if condition(env):
+                return then_branch(env)
+            return else_branch(env)
+
+        return execute
+
+    def while_statement(self, statement: WhileStatement):
+        condition = self.expression(statement.condition)
+        body = self.statement(statement.statement)
+
+        def execute(env):
+            while condition(env):
+                result = body(env)
+                if result is not None:
+                    return result
+
+        return execute
+
+    def function(self, statement: FunctionDeclarationStatement):
+        self.function_depth += 1
+        body = self.block(statement.body)
+        self.function_depth -= 1
+        return body
+
+    def function_declaration(self, statement: FunctionDeclarationStatement):
+        name = statement.name
+        parameters = statement.parameters
+        memo_size = statement.memo_size
+        body = self.function(statement)
+
+        if memo_size is None:
+            make = lambda env: CompiledFunction(parameters, body, name, env)
+        else:
+
+            def make(env):
+                function = MemoCompiledFunction(parameters, body, name, env)
+                function.memo = MemoTable(name.lexeme, memo_size)
+                return function
+
+        return self.define(statement.slot, name.lexeme, make)
+
+    def return_statement(self, statement: ReturnStatement):
+        if self.function_depth == 0:
+            raise Exception(
+                f"on line [{statement.token.line_number}] - Cannot return from top-level code."
+            )
+
+        if statement.expression is None:
+            return lambda env: (None,)
+
+        if isinstance(statement.expression, Call):
+            # `return f(...)`, the call is made once this function has returned
+            expression = self.tail_call(statement.expression)
+        else:
+            expression = self.expression(statement.expression)
+        return lambda env: (expression(env),)
+
+    def class_declaration(self, statement: ClassDeclarationStatement):
+        name = statement.name
+        slot = statement.slot
+        superclass = None
+        if statement.superclass is not None:
+            superclass = self.expression(statement.superclass)
+
+        methods = [
+            (method.name, method.parameters, self.function(method))
+            for method in statement.methods
+        ]
+
+        def execute(env):
+            super_class = None
+
+            if superclass is not None:
+                super_class = superclass(env)
+                if not isinstance(super_class, MyClass):
+                    raise Exception(f"Superclass must be a class.")
+
+            klass = MyClass(
+                name=name,
+                methods={
+                    method_name.lexeme: CompiledFunction(
+                        parameters,
+                        body,
+                        method_name,
+                        env,
+                        is_initializer=method_name.lexeme == "init",
+                    )
+                    for method_name, parameters, body in methods
+                },
+                super_class=super_class,
+            )
+
+            if slot is None:
+                env.globals.values[name.lexeme] = klass
+            else:
+                env.values[slot] = klass
+
+        return execute
+
+    ################################################################################################
+
+    def expression(self, expression: Expression):
+        return self.handlers[type(expression)](expression)
+
+    def binary(self, expression: Binary):
+        token_type = expression.operator.token_type
+        left = self.expression(expression.left)
+
+        if isinstance(expression.right, Literal):
+            return binary_operation_constant(token_type, left, expression.right.value)
+
+        return binary_operation(token_type, left, self.expression(expression.right))
+
+    def unary(self, expression: Unary):
+        right = self.expression(expression.right)
+
+        if expression.operator.token_type == TokenType.MINUS:
+            return lambda env: -right(env)
+
+        return lambda env: not right(env)
+
+    def literal(self, expression: Literal):
+        value = expression.value
+        return lambda env: value
+
+    def grouping(self, expression: Grouping):
+        return self.expression(expression.expression)
+
+    def lookup(self, expression, token):
+        name = token.lexeme
+        distance, slot = expression.depth, expression.slot
+
+        if distance is None:
+            line_number = token.line_number
+
+            def get_global(env):
+                try:
+                    return env.globals.values[name]
+                except KeyError:
+                    if name in NATIVES:
+                        return NATIVES[name]
+                    raise Exception(f"Undefined variable {name} on line {line_number}")
+
+            return get_global
+
+        if distance == 0:
+            return lambda env: env.values[slot]
+        elif distance == 1:
+            return lambda env: env.outer_environment.values[slot]
+        elif distance == 2:
+            return lambda env: env.outer_environment.outer_environment.values[slot]
+
+        def get_at(env):
+            for _ in range(distance):
+                env = env.outer_environment
+            return env.values[slot]
+
+        return get_at
+
+    def variable(self, expression: Variable):
+        native = expression.native
+        if native is not None:
+            return lambda env: native
+
+        return self.lookup(expression, expression.token)
+
+    def this(self, expression: This):
+        return self.lookup(expression, expression.keyword)
+
+    def assignment(self, expression: Assignment):
+        name = expression.token.lexeme
+        value = self.expression(expression.value)
+        distance, slot = expression.depth, expression.slot
+
+        if distance is None:
+            line_number = expression.token.line_number
+
+            def assign_global(env):
+                result = value(env)
+                globals_ = env.globals.values
+                if name not in globals_:
+                    raise Exception(f"Undefined variable {name} on line {line_number}")
+                globals_[name] = result
+                return result
+
+            return assign_global
+
+        def assign_at(env):
+            result = value(env)
+            for _ in range(distance):
+                env = env.outer_environment
+            env.values[slot] = result
+            return result
+
+        return assign_at
+
+    def logical(self, expression: Logical):
+        left = self.expression(expression.left)
+        right = self.expression(expression.right)
+
+        if expression.operator.token_type == TokenType.OR:
+            return lambda env: left(env) or right(env)
+
+        return lambda env: left(env) and right(env)
+
+    def call(self, expression: Call):
+        if isinstance(expression.callee, Get):
+            return self.invoke(expression)
+
+        callee = self.expression(expression.callee)
+        arguments = [self.expression(argument) for argument in expression.arguments]
+
+        def check(function):
+            if not isinstance(function, MyCallable):
+                raise Exception(f"{function} is not callable")
+            return function
+
+        if not arguments:
+            return lambda env: check(callee(env)).call([])
+
+        if len(arguments) == 1:
+            argument = arguments[0]
+            return lambda env: check(callee(env)).call([argument(env)])
+
+        return lambda env: check(callee(env)).call(
+            [argument(env) for argument in arguments]
+        )
+
+    def invoke(self, expression: Call):
+        # `a.b()` calls the method with `a` as `this`, no bound method is made
+        cache = self.inline_cache(GetCache, expression.callee.name)
+        obj = self.expression(expression.callee.object)
+        arguments = [self.expression(argument) for argument in expression.arguments]
+
+        def invoke_method(env):
+            instance = obj(env)
+            if not isinstance(instance, MyInstance):
+                raise Exception(f"Only instances have properties.")
+
+            index, method = cache.lookup(instance)
+            if method is not None:
+                return method.invoke(
+                    instance, [argument(env) for argument in arguments]
+                )
+
+            function = instance.values[index]
+            if not isinstance(function, MyCallable):
+                raise Exception(f"{function} is not callable")
+            return function.call([argument(env) for argument in arguments])
+
+        return invoke_method
+
+    def tail_call(self, expression: Call):
+        arguments = [self.expression(argument) for argument in expression.arguments]
+
+        if isinstance(expression.callee, Get):
+            cache = self.inline_cache(GetCache, expression.callee.name)
+            obj = self.expression(expression.callee.object)
+
+            def tail_invoke(env):
+                instance = obj(env)
+                if not isinstance(instance, MyInstance):
+                    raise Exception(f"Only instances have properties.")
+
+                index, method = cache.lookup(instance)
+                if method is not None:
+                    return TailCall(
+                        method, instance, [argument(env) for argument in arguments]
+                    )
+
+                function = instance.values[index]
+                if not isinstance(function, MyCallable):
+                    raise Exception(f"{function} is not callable")
+                return tail_call(function, [argument(env) for argument in arguments])
+
+            return tail_invoke
+
+        callee = self.expression(expression.callee)
+
+        def tail(env):
+            function = callee(env)
+            if not isinstance(function, MyCallable):
+                raise Exception(f"{function} is not callable")
+            return tail_call(function, [argument(env) for argument in arguments])
+
+        return tail
+
+    def get(self, expression: Get):
+        cache = self.inline_cache(GetCache, expression.name)
+        obj = self.expression(expression.object)
+
+        def get_property(env):
+            instance = obj(env)
+            if isinstance(instance, MyInstance):
+                return cache.get(instance)
+            raise Exception(f"Only instances have properties.")
+
+        return get_property
+
+    def set(self, expression: Set):
+        cache = self.inline_cache(SetCache, expression.name)
+        obj = self.expression(expression.object)
+        value = self.expression(expression.value)
+
+        def set_property(env):
+            instance = obj(env)
+            if isinstance(instance, MyInstance):
+                cache.set(instance, value(env))
+                return
+            raise Exception(f"Only instances have fields.")
+
+        return set_property
+
+
+def compile_program(statements):
+    """
+    Returns the program, which runs with `program(new_global_environment())`,
+    and its inline caches.
+    """
+    compiler = ClosureCompiler()
+    return compiler.compile(statements), compiler.caches
+
+
+def run(statements):
+    program, _ = compile_program(statements)
+    program(new_global_environment())
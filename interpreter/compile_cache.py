@@ -0,0 +1,135 @@
+"""
+On disk cache of resolved programs, so running the same file again skips the
+scanner, parser and resolver.
+
+Entries are pickled statement lists named by the hash of the source and of the
+interpreter itself, editing either gives a new key. When the directory grows
+past `max_size` the least recently used entries are removed, a hit touches the
+entry's mtime.
+"""
+
+import gc
+import hashlib
+import os
+import pickle
+import sys
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "lox")
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".pickle"
+
+
+def interpreter_version():
+    # any change to the front end can change the AST, so hash all of it
+    digest = hashlib.sha256(sys.version.encode())
+    package = os.path.dirname(os.path.abspath(__file__))
+
+    for file_name in sorted(os.listdir(package)):
+        if file_name.endswith(".py"):
+            with open(os.path.join(package, file_name), "rb") as file:
+                digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+class CompileCache:
+    directory: str = DEFAULT_DIRECTORY
+    max_size: int = DEFAULT_MAX_SIZE
+    hits: int = 0
+    misses: int = 0
+
+    def __init__(self, directory: str = None, max_size: int = None) -> None:
+        self.directory = directory or os.environ.get("LOX_CACHE_DIR", DEFAULT_DIRECTORY)
+        self.max_size = max_size or int(
+            os.environ.get("LOX_CACHE_SIZE", DEFAULT_MAX_SIZE)
+        )
+        self.version = interpreter_version()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, file_name: str, variant: str = ""):
+        # `variant` tells apart programs built from the same file with other options
+        digest = hashlib.sha256((self.version + variant).encode())
+
+        with open(file_name, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def path(self, key: str):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def load(self, key: str):
+        """Returns the cached statements for `key`, None on a miss."""
+        path = self.path(key)
+
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+
+        # the AST is lots of small objects, the collector would walk it over and over
+        gc.disable()
+        try:
+            statements = pickle.loads(data)
+        except (pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        finally:
+            gc.enable()
+
+        os.utime(path)
+        self.hits += 1
+        return statements
+
+    def store(self, key: str, statements):
+        gc.disable()
+        try:
+            data = pickle.dumps(statements, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # very deeply nested programs aren't worth caching
+            return
+        finally:
+            gc.enable()
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+
+        # write then rename so a concurrent run never reads half an entry
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another run at the same time
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def report(self):
+        return f"cache: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,424 @@
+from interpreter.bytecode import OpCode, FunctionProto
+from interpreter.internals import TokenType
+from interpreter.grammar import (
+    Expression,
+    Binary,
+    Unary,
+    Literal,
+    Grouping,
+    Variable,
+    Assignment,
+    Logical,
+    Call,
+    Get,
+    Set,
+    This,
+    PrintStatement,
+    ExpressionStatement,
+    VarDeclarationStatement,
+    BlockStatement,
+    IfStatement,
+    WhileStatement,
+    FunctionDeclarationStatement,
+    ReturnStatement,
+    ClassDeclarationStatement,
+)
+
+
+class FunctionKind:
+    SCRIPT = "script"
+    FUNCTION = "function"
+    METHOD = "method"
+    INITIALIZER = "initializer"
+
+
+class Local:
+    def __init__(self, name: str, depth: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class FunctionState:
+    """Per function compilation state, chained to the enclosing function."""
+
+    def __init__(self, enclosing, name: str, kind: str) -> None:
+        self.enclosing: FunctionState = enclosing
+        self.function = FunctionProto(name)
+        self.kind = kind
+        self.scope_depth = 0
+        self.upvalues: list[tuple[int, int]] = []
+
+        # slot zero holds the callee, or the receiver for methods
+        if kind in (FunctionKind.METHOD, FunctionKind.INITIALIZER):
+            self.locals = [Local("this", 0)]
+        else:
+            self.locals = [Local("", 0)]
+
+    def resolve_local(self, name: str):
+        for index in range(len(self.locals) - 1, -1, -1):
+            if self.locals[index].name == name:
+                return index
+        return None
+
+    def resolve_upvalue(self, name: str):
+        if self.enclosing is None:
+            return None
+
+        local = self.enclosing.resolve_local(name)
+        if local is not None:
+            self.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(1, local)
+
+        upvalue = self.enclosing.resolve_upvalue(name)
+        if upvalue is not None:
+            return self.add_upvalue(0, upvalue)
+
+        return None
+
+    def add_upvalue(self, is_local: int, index: int):
+        upvalue = (is_local, index)
+        if upvalue in self.upvalues:
+            return self.upvalues.index(upvalue)
+
+        self.upvalues.append(upvalue)
+        self.function.upvalue_count = len(self.upvalues)
+        return len(self.upvalues) - 1
+
+
+class Compiler:
+    """
+    Lowers the resolved statement list produced by `Parser.parse()` into
+    bytecode for `interpreter.vm.VM`.
+
+    Locals live in stack slots, variables captured by closures are turned into
+    upvalues, and everything declared at the top level goes to the globals table
+    just like the global environment of the tree walker.
+    """
+
+    BINARY_OPCODES = {
+        TokenType.PLUS: OpCode.ADD,
+        TokenType.MINUS: OpCode.SUBTRACT,
+        TokenType.STAR: OpCode.MULTIPLY,
+        TokenType.SLASH: OpCode.DIVIDE,
+        TokenType.GREATER: OpCode.GREATER,
+        TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+        TokenType.LESS: OpCode.LESS,
+        TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+        TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+        TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+    }
+
+    def __init__(self) -> None:
+        self.state: FunctionState = None
+        self.line = 0
+        self.handlers = {
+            Binary: self.binary,
+            Unary: self.unary,
+            Literal: self.literal,
+            Grouping: self.grouping,
+            Variable: self.variable,
+            Assignment: self.assignment,
+            Logical: self.logical,
+            Call: self.call,
+            Get: self.get,
+            Set: self.set,
+            This: self.this,
+            PrintStatement: self.print_statement,
+            ExpressionStatement: self.expression_statement,
+            VarDeclarationStatement: self.var_declaration,
+            BlockStatement: self.block,
+            IfStatement: self.if_statement,
+            WhileStatement: self.while_statement,
+            FunctionDeclarationStatement: self.function_declaration,
+            ReturnStatement: self.return_statement,
+            ClassDeclarationStatement: self.class_declaration,
+        }
+
+    def compile(self, statements) -> FunctionProto:
+        self.state = FunctionState(None, "script", FunctionKind.SCRIPT)
+
+        for statement in statements:
+            self.statement(statement)
+
+        self.emit_return()
+        return self.state.function
+
+    ################################################################################################
+
+    @property
+    def chunk(self):
+        return self.state.function.chunk
+
+    def emit(self, *units):
+        for unit in units:
+            self.chunk.write(unit, self.line)
+
+    def emit_constant(self, value):
+        self.emit(OpCode.CONSTANT, self.chunk.add_constant(value))
+
+    def emit_name(self, opcode, token):
+        self.line = token.line_number
+        self.emit(opcode, self.chunk.add_constant(token.lexeme))
+
+    def emit_jump(self, opcode):
+        self.emit(opcode, -1)
+        return len(self.chunk.code) - 1
+
+    def patch_jump(self, operand_index):
+        self.chunk.code[operand_index] = len(self.chunk.code)
+
+    def emit_return(self):
+        if self.state.kind == FunctionKind.INITIALIZER:
+            self.emit(OpCode.GET_LOCAL, 0)
+        else:
+            self.emit(OpCode.NIL)
+        self.emit(OpCode.RETURN)
+
+    def begin_scope(self):
+        self.state.scope_depth += 1
+
+    def end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals.pop().is_captured:
+                self.emit(OpCode.CLOSE_UPVALUE)
+            else:
+                self.emit(OpCode.POP)
+
+    def add_local(self, name: str):
+        self.state.locals.append(Local(name, self.state.scope_depth))
+
+    def define_variable(self, token):
+        # locals are simply left on the stack in their slot
+        if self.state.scope_depth > 0:
+            self.add_local(token.lexeme)
+        else:
+            self.emit_name(OpCode.DEFINE_GLOBAL, token)
+
+    def named_variable(self, token, assign=False):
+        self.line = token.line_number
+        state = self.state
+        name = token.lexeme
+
+        index = state.resolve_local(name)
+        if index is not None:
+            self.emit(OpCode.SET_LOCAL if assign else OpCode.GET_LOCAL, index)
+            return
+
+        index = state.resolve_upvalue(name)
+        if index is not None:
+            self.emit(OpCode.SET_UPVALUE if assign else OpCode.GET_UPVALUE, index)
+            return
+
+        self.emit_name(OpCode.SET_GLOBAL if assign else OpCode.GET_GLOBAL, token)
+
+    ################################################################################################
+
+    def statement(self, statement):
+        self.handlers[type(statement)](statement)
+
+    def print_statement(self, statement: PrintStatement):
+        self.expression(statement.expression)
+        self.emit(OpCode.PRINT)
+
+    def expression_statement(self, statement: ExpressionStatement):
+        self.expression(statement.expression)
+        self.emit(OpCode.POP)
+
+    def var_declaration(self, statement: VarDeclarationStatement):
+        self.expression(statement.expression)
+        self.define_variable(statement.token)
+
+    def block(self, statement: BlockStatement):
+        self.begin_scope()
+        for inner in statement.statements:
+            self.statement(inner)
+        self.end_scope()
+
+    def if_statement(self, statement: IfStatement):
+        self.expression(statement.condition)
+        else_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self.statement(statement.if_statement)
+
+        if statement.else_statement is None:
+            self.patch_jump(else_jump)
+            return
+
+        end_jump = self.emit_jump(OpCode.JUMP)
+        self.patch_jump(else_jump)
+        self.statement(statement.else_statement)
+        self.patch_jump(end_jump)
+
+    def while_statement(self, statement: WhileStatement):
+        loop_start = len(self.chunk.code)
+        self.expression(statement.condition)
+        exit_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self.statement(statement.statement)
+        self.emit(OpCode.JUMP, loop_start)
+        self.patch_jump(exit_jump)
+
+    def function_declaration(self, statement: FunctionDeclarationStatement):
+        # declared before the body is compiled so the function can recurse
+        if self.state.scope_depth > 0:
+            self.add_local(statement.name.lexeme)
+            self.function(statement, FunctionKind.FUNCTION)
+        else:
+            self.function(statement, FunctionKind.FUNCTION)
+            self.emit_name(OpCode.DEFINE_GLOBAL, statement.name)
+
+    def function(self, statement: FunctionDeclarationStatement, kind: str):
+        self.line = statement.name.line_number
+        state = FunctionState(self.state, statement.name.lexeme, kind)
+        state.function.arity = len(statement.parameters)
+        self.state = state
+
+        self.begin_scope()
+        for parameter in statement.parameters:
+            self.add_local(parameter.lexeme)
+
+        # the body shares the parameter scope, the frame is popped on return
+        for inner in statement.body.statements:
+            self.statement(inner)
+        self.emit_return()
+
+        self.state = state.enclosing
+        self.line = statement.name.line_number
+        self.emit(OpCode.CLOSURE, self.chunk.add_constant(state.function))
+        for is_local, index in state.upvalues:
+            self.emit(is_local, index)
+
+    def return_statement(self, statement: ReturnStatement):
+        self.line = statement.token.line_number
+
+        if self.state.kind == FunctionKind.SCRIPT:
+            raise Exception(
+                f"on line [{self.line}] - Cannot return from top-level code."
+            )
+
+        if self.state.kind == FunctionKind.INITIALIZER:
+            # init always hands back the instance, whatever it returns
+            if statement.expression is not None:
+                self.expression(statement.expression)
+                self.emit(OpCode.POP)
+            self.emit(OpCode.GET_LOCAL, 0)
+        elif isinstance(statement.expression, Call):
+            self.call(statement.expression, tail=True)
+        elif statement.expression is not None:
+            self.expression(statement.expression)
+        else:
+            self.emit(OpCode.NIL)
+
+        self.emit(OpCode.RETURN)
+
+    def class_declaration(self, statement: ClassDeclarationStatement):
+        name = statement.name
+        self.line = name.line_number
+        self.emit(OpCode.CLASS, self.chunk.add_constant(name))
+        self.define_variable(name)
+
+        if statement.superclass is not None:
+            self.variable(statement.superclass)
+            self.named_variable(name)
+            self.emit(OpCode.INHERIT)
+
+        self.named_variable(name)
+        for method in statement.methods:
+            if method.name.lexeme == "init":
+                kind = FunctionKind.INITIALIZER
+            else:
+                kind = FunctionKind.METHOD
+
+            self.function(method, kind)
+            self.emit_name(OpCode.METHOD, method.name)
+        self.emit(OpCode.POP)
+
+    ################################################################################################
+
+    def expression(self, expression: Expression):
+        self.handlers[type(expression)](expression)
+
+    def binary(self, expression: Binary):
+        self.expression(expression.left)
+        self.expression(expression.right)
+        self.line = expression.operator.line_number
+        self.emit(self.BINARY_OPCODES[expression.operator.token_type])
+
+    def unary(self, expression: Unary):
+        self.expression(expression.right)
+        self.line = expression.operator.line_number
+
+        if expression.operator.token_type == TokenType.MINUS:
+            self.emit(OpCode.NEGATE)
+        else:
+            self.emit(OpCode.NOT)
+
+    def literal(self, expression: Literal):
+        value = expression.value
+
+        if value is None:
+            self.emit(OpCode.NIL)
+        elif value is True:
+            self.emit(OpCode.TRUE)
+        elif value is False:
+            self.emit(OpCode.FALSE)
+        else:
+            self.emit_constant(value)
+
+    def grouping(self, expression: Grouping):
+        self.expression(expression.expression)
+
+    def variable(self, expression: Variable):
+        self.named_variable(expression.token)
+
+    def this(self, expression: This):
+        self.named_variable(expression.keyword)
+
+    def assignment(self, expression: Assignment):
+        self.expression(expression.value)
+        self.named_variable(expression.token, assign=True)
+
+    def logical(self, expression: Logical):
+        self.expression(expression.left)
+
+        if expression.operator.token_type == TokenType.OR:
+            end_jump = self.emit_jump(OpCode.JUMP_IF_TRUE)
+        else:
+            end_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+
+        self.emit(OpCode.POP)
+        self.expression(expression.right)
+        self.patch_jump(end_jump)
+
+    def call(self, expression: Call, tail=False):
+        callee = expression.callee
+
+        # `a.b()` looks the method up and calls it without binding it first
+        if isinstance(callee, Get):
+            self.expression(callee.object)
+            for argument in expression.arguments:
+                self.expression(argument)
+            self.line = callee.name.line_number
+            self.emit(
+                OpCode.TAIL_INVOKE if tail else OpCode.INVOKE,
+                self.chunk.add_constant(callee.name.lexeme),
+                len(expression.arguments),
+            )
+            return
+
+        self.expression(callee)
+        for argument in expression.arguments:
+            self.expression(argument)
+        self.line = expression.right_paren.line_number
+        self.emit(OpCode.TAIL_CALL if tail else OpCode.CALL, len(expression.arguments))
+
+    def get(self, expression: Get):
+        self.expression(expression.object)
+        self.emit_name(OpCode.GET_PROPERTY, expression.name)
+
+    def set(self, expression: Set):
+        self.expression(expression.object)
+        self.expression(expression.value)
+        self.emit_name(OpCode.SET_PROPERTY, expression.name)
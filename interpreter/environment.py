@@ -1,42 +1,87 @@
+from types import MappingProxyType
+
 from interpreter.internals import Token
 
 
 class Environment:
-    def __init__(self, outer_environment=None) -> None:
-        self.values: dict = {}
-        self.outer_environment: Environment = outer_environment
-        self.define_default_functions()
+    """
+    Runtime frame of a local scope. The resolver gives every local a slot in
+    its scope, so the frame is just a fixed size list indexed by that slot.
+    `globals` is the run's `GlobalEnvironment`, at the end of the chain.
+    """
+
+    __slots__ = ("values", "outer_environment", "globals")
+
+    def __init__(self, outer_environment, size: int = 0) -> None:
+        self.values: list = [None] * size
+        self.outer_environment = outer_environment
+        self.globals = outer_environment.globals
+
+    def define(self, slot: int, value: object):
+        self.values[slot] = value
+        return value
+
+    def get_at(self, distance: int, slot: int):
+        return self.ancestor(distance).values[slot]
+
+    def assign_at(self, distance: int, slot: int, value: object):
+        self.ancestor(distance).values[slot] = value
+        return value
+
+    def ancestor(self, distance: int):
+        environment = self
+        for _ in range(distance):
+            environment = environment.outer_environment
+        return environment
+
+
+class BuiltinsEnvironment:
+    """
+    Read only frame with the native functions, the root of every environment
+    chain. Globals with the same name shadow them.
+    """
+
+    __slots__ = ("values",)
 
-    def define_default_functions(self):
-        from interpreter.callable import ClockCallable
-        from interpreter.internals import TokenType
+    outer_environment = None
 
-        self.define(Token(TokenType.IDENTIFIER, "clock", None, 0), ClockCallable())
+    def __init__(self, natives: dict) -> None:
+        self.values = MappingProxyType(natives)
+
+    def has_key(self, token: Token):
+        return token.lexeme in self.values
+
+
+class GlobalEnvironment:
+    """
+    Top level variables aren't resolved, they are looked up by name when used so
+    functions can refer to globals declared after them. Every run has its own,
+    with the stream its prints go to, sys.stdout when None.
+    """
+
+    def __init__(self, builtins: BuiltinsEnvironment = None, output=None) -> None:
+        self.values: dict = {}
+        self.outer_environment = builtins
+        self.globals = self
+        self.output = output
 
     def define(self, token: Token, value: object):
         self.values[token.lexeme] = value
         return value
 
     def assign(self, token: Token, value: object):
-        if self.has_key(token) and token.lexeme in self.values:
-            self.define(token, value)
-        elif self.outer_environment and self.outer_environment.has_key(token):
-            self.outer_environment.assign(token, value)
-        else:
+        if token.lexeme not in self.values:
+            if self.outer_environment and self.outer_environment.has_key(token):
+                raise Exception(
+                    f"Cannot assign to native function {token.lexeme} on line {token.line_number}"
+                )
             self.raise_undefined_variable_error(token)
 
-        return value
-
-    def assign_at(self, distance: int, token: Token, value: object):
-        self.ancestor(distance).values[token.lexeme] = value
+        self.values[token.lexeme] = value
         return value
 
     def has_key(self, token: Token):
-        if token.lexeme in self.values:
-            return True
-        elif self.outer_environment:
-            return self.outer_environment.has_key(token)
-        return False
+        return token.lexeme in self.values
 
     def raise_undefined_variable_error(self, token: Token):
         raise Exception(
@@ -44,18 +89,13 @@ class Environment:
         )
 
     def get(self, token: Token):
-        if self.has_key(token) and token.lexeme in self.values:
+        try:
             return self.values[token.lexeme]
+        except KeyError:
+            pass
+
+        # natives only get here when a global with the same name is declared later
         if self.outer_environment and self.outer_environment.has_key(token):
-            return self.outer_environment.get(token)
+            return self.outer_environment.values[token.lexeme]
 
         return self.raise_undefined_variable_error(token)
-
-    def get_at(self, distance: int, token: Token):
-        return self.ancestor(distance).values[token.lexeme]
-
-    def ancestor(self, distance: int):
-        environment = self
-        for _ in range(distance):
-            environment = environment.outer_environment
-        return environment
@@ -18,5 +18,6 @@ class Error:
             f": {self.message}" if self.message else ""
         )
 
-    def print_to_stderr(self):
-        print(self, file=sys.stderr)
+    def print_to_stderr(self, stream=None):
+        # or to `stream` when given, for callers collecting the errors
+        print(self, file=stream if stream is not None else sys.stderr)
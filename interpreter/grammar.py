@@ -1,9 +1,23 @@
 from interpreter.constants import *
 from interpreter.internals import Token, TokenType
-from interpreter.environment import Environment
-from contextlib import contextmanager
-from interpreter.callable import MyCallable, MyFunction, MyClass, MyInstance
+from interpreter.environment import (
+    Environment,
+    GlobalEnvironment,
+    BuiltinsEnvironment,
+)
+from interpreter.callable import (
+    MyCallable,
+    MyFunction,
+    MyClass,
+    MyInstance,
+    TailCall,
+    tail_call,
+)
+from interpreter.ast_printer import AstPrinter
+from interpreter.inline_cache import GetCache, SetCache
+from interpreter.memoize import MemoFunction, MemoTable
 from interpreter.resolver import Resolver
+from interpreter.natives import NATIVES
 
 """
 expression     → literal
@@ -29,63 +43,65 @@ variable       → IDENTIFIER
 logical        → expression operator expression
 """
 
-environment = Environment()
-depth_map = {}
 
+def new_global_environment(output=None):
+    """Fresh globals for a run, nothing another run declared is in them."""
+    return GlobalEnvironment(BuiltinsEnvironment(NATIVES), output)
 
-def resolve(expression, depth):
-    depth_map[expression] = depth
 
+def run(statements, output=None):
+    """Runs the program from fresh globals, printing to `output`, stdout when None."""
+    environment = new_global_environment(output)
+    for statement in statements:
+        statement.eval(environment)
 
-def lookup_variable(token, expression):
-    distance = depth_map.get(expression)
 
-    if distance is not None:
-        return environment.get_at(distance, token)
-    else:
-        return environment.get(token)
+def lookup_variable(environment, token, expression):
+    if expression.depth is None:
+        return environment.globals.get(token)
 
+    return environment.get_at(expression.depth, expression.slot)
 
-@contextmanager
-def swap_environment(new_environment):
-    global environment
-    try:
-        previous = environment
-        environment = new_environment
-        yield
-    finally:
-        environment = previous
+
+def define_variable(environment, slot, token, value):
+    # only locals have a slot, top level declarations are defined by name
+    if slot is None:
+        return environment.globals.define(token, value)
+
+    return environment.define(slot, value)
 
 
 class Expression:
-    def __str__(self) -> str:
-        from interpreter.ast_printer import AstPrinter
+    __slots__ = ()
 
+    def __str__(self) -> str:
         return AstPrinter().print(self)
 
-    def eval(self):
+    def eval(self, environment):
         pass
 
-    def is_truthy(self):
-        return bool(self.eval())
+    def is_truthy(self, environment):
+        return bool(self.eval(environment))
 
     def run_resolver(self, resolver: Resolver):
         pass
 
 
 class Binary(Expression):
-    left: Expression = None
-    operator: Token = None
-    right: Expression = None
+    __slots__ = ("left", "operator", "right")
+
+    left: Expression
+    operator: Token
+    right: Expression
 
     def __init__(self, left: Expression, operator: Token, right: Expression) -> None:
         self.left = left
         self.operator = operator
         self.right = right
 
-    def eval(self):
-        left = self.left.eval()
-        right = self.right.eval()
+    def eval(self, environment):
+        left = self.left.eval(environment)
+        right = self.right.eval(environment)
         operator = self.operator
 
         if operator.token_type == TokenType.PLUS:
@@ -118,15 +134,17 @@ class Binary(Expression):
 
 
 class Unary(Expression):
-    operator: Token = None
-    right: Expression = None
+    __slots__ = ("operator", "right")
+
+    operator: Token
+    right: Expression
 
     def __init__(self, operator: Token, right: Expression) -> None:
         self.operator = operator
         self.right = right
 
-    def eval(self):
-        right: Expression = self.right.eval()
+    def eval(self, environment):
+        right: Expression = self.right.eval(environment)
         operator: Token = self.operator
 
         if operator.token_type == TokenType.MINUS:
@@ -139,12 +157,14 @@ class Unary(Expression):
 
 
 class Literal(Expression):
-    value: any = None
+    __slots__ = ("value",)
+
+    value: any
 
     def __init__(self, value: any) -> None:
         self.value = value
 
-    def eval(self):
+    def eval(self, environment):
         return self.value
 
     def __str__(self):
@@ -155,26 +175,39 @@ class Literal(Expression):
 
 
 class Grouping(Expression):
-    expression: Expression = None
+    __slots__ = ("expression",)
+
+    expression: Expression
 
     def __init__(self, expression: Expression) -> None:
         self.expression = expression
 
-    def eval(self):
-        return self.expression.eval()
+    def eval(self, environment):
+        return self.expression.eval(environment)
 
     def run_resolver(self, resolver):
         resolver.resolve(self.expression)
 
 
 class Variable(Expression):
-    token: Token = None
+    __slots__ = ("token", "depth", "slot", "native")
+
+    token: Token
+    depth: int
+    slot: int
+    native: MyCallable  # bound by the resolver when the name is a native
 
     def __init__(self, token: Token) -> None:
         self.token = token
+        self.depth = None
+        self.slot = None
+        self.native = None
 
-    def eval(self):
-        return lookup_variable(self.token, self)
+    def eval(self, environment):
+        if self.native is not None:
+            return self.native
+
+        return lookup_variable(environment, self.token, self)
 
     def __str__(self):
         return self.token.lexeme
@@ -185,56 +218,66 @@ class Variable(Expression):
                 raise Exception(f"Cannot read local variable in its own initializer")
 
         resolver.resolve_local(self, self.token)
+        if self.depth is None:
+            self.native = resolver.resolve_native(self.token)
 
 
 class Assignment(Expression):
-    token: Token = None
-    value: object = None
+    __slots__ = ("token", "value", "depth", "slot")
+
+    token: Token
+    value: object
+    depth: int
+    slot: int
 
     def __init__(self, token: Token, value: object) -> None:
         self.token = token
         self.value = value
+        self.depth = None
+        self.slot = None
 
-    def eval(self):
+    def eval(self, environment):
         value = self.value
 
         if isinstance(self.value, Expression):
-            value = self.value.eval()
+            value = self.value.eval(environment)
 
-        distance = depth_map.get(self)
-        if distance is not None:
-            environment.assign_at(distance, self.token, value)
+        if self.depth is not None:
+            environment.assign_at(self.depth, self.slot, value)
         else:
-            environment.assign(self.token, value)
+            environment.globals.assign(self.token, value)
         return value
 
     def run_resolver(self, resolver):
         resolver.resolve(self.value)
+        resolver.resolve_local(self, self.token)
 
 
 class Logical(Expression):
-    left: Expression = None
-    operator: Token = None
-    right: Expression = None
+    __slots__ = ("left", "operator", "right")
+
+    left: Expression
+    operator: Token
+    right: Expression
 
     def __init__(self, left: Expression, operator: Token, right: Expression):
         self.left = left
         self.operator = operator
         self.right = right
 
-    def eval(self):
-        left_res = self.left.eval()
+    def eval(self, environment):
+        left_res = self.left.eval(environment)
 
         if self.operator.token_type == TokenType.OR:
-            if self.left.is_truthy():
+            if self.left.is_truthy(environment):
                 return left_res
         else:
             # because in AND operator we return right expression only if left is falsy
             # check python in case of doubt
-            if not self.left.is_truthy():
+            if not self.left.is_truthy(environment):
                 return left_res
 
-        return self.right.eval()
+        return self.right.eval(environment)
 
     def run_resolver(self, resolver):
         resolver.resolve(self.left)
@@ -242,9 +285,11 @@ class Logical(Expression):
 
 
 class Call(Expression):
-    arguments: list[Expression] = []
-    callee: Expression = None
-    right_paren: Token = None
+    __slots__ = ("arguments", "callee", "right_paren")
+
+    arguments: list[Expression]
+    callee: Expression
+    right_paren: Token
 
     def __init__(
         self, callee: Expression, arguments: list[Expression], right_paren: Token
@@ -253,15 +298,64 @@ class Call(Expression):
         self.right_paren = right_paren
         self.callee = callee
 
-    def eval(self):
-        callable_obj: MyCallable = self.callee.eval()
+    def eval(self, environment):
+        if type(self.callee) is Get:
+            return self.invoke(self.callee, environment)
+
+        callable_obj: MyCallable = self.callee.eval(environment)
 
         if not isinstance(callable_obj, MyCallable):
             raise Exception(f"{callable_obj} is not callable")
 
-        arguments = [arg.eval() for arg in self.arguments]
+        arguments = [arg.eval(environment) for arg in self.arguments]
         return callable_obj.call(arguments)
 
+    def invoke(self, callee: "Get", environment):
+        # `a.b()` calls the method with `a` as `this`, no bound method is made
+        obj = callee.object.eval(environment)
+
+        if not isinstance(obj, MyInstance):
+            raise Exception(f"Only instances have properties.")
+
+        index, method = (callee.cache or callee.new_cache()).lookup(obj)
+
+        if method is not None:
+            return method.invoke(obj, [arg.eval(environment) for arg in self.arguments])
+
+        # a field holding something callable
+        callable_obj = obj.values[index]
+        if not isinstance(callable_obj, MyCallable):
+            raise Exception(f"{callable_obj} is not callable")
+
+        return callable_obj.call([arg.eval(environment) for arg in self.arguments])
+
+    def eval_tail(self, environment):
+        """Like eval, but calls to lox functions come back as a `TailCall` to make."""
+        if type(self.callee) is Get:
+            obj = self.callee.object.eval(environment)
+
+            if not isinstance(obj, MyInstance):
+                raise Exception(f"Only instances have properties.")
+
+            callee = self.callee
+            index, method = (callee.cache or callee.new_cache()).lookup(obj)
+
+            if method is not None:
+                return TailCall(
+                    method, obj, [arg.eval(environment) for arg in self.arguments]
+                )
+
+            callable_obj = obj.values[index]
+        else:
+            callable_obj = self.callee.eval(environment)
+
+        if not isinstance(callable_obj, MyCallable):
+            raise Exception(f"{callable_obj} is not callable")
+
+        return tail_call(
+            callable_obj, [arg.eval(environment) for arg in self.arguments]
+        )
+
     def run_resolver(self, resolver):
         resolver.resolve(self.callee)
 
@@ -270,18 +364,26 @@ class Call(Expression):
 
 
 class Get(Expression):
-    name: Token = None
-    object: Expression = None
+    __slots__ = ("name", "object", "cache")
+
+    name: Token
+    object: Expression
+    cache: GetCache  # made the first time the node runs
 
     def __init__(self, object: Expression, name: Token) -> None:
         self.name = name
         self.object = object
+        self.cache = None
 
-    def eval(self):
-        obj: MyInstance = self.object.eval()
+    def new_cache(self):
+        self.cache = GetCache(self.name)
+        return self.cache
+
+    def eval(self, environment):
+        obj: MyInstance = self.object.eval(environment)
 
         if isinstance(obj, MyInstance):
-            return obj.get(self.name)
+            return (self.cache or self.new_cache()).get(obj)
 
         raise Exception(f"Only instances have properties.")
 
@@ -290,20 +392,28 @@ class Get(Expression):
 
 
 class Set(Expression):
-    name: Token = None
-    object: Expression = None
-    value: Expression = None
+    __slots__ = ("name", "object", "value", "cache")
+
+    name: Token
+    object: Expression
+    value: Expression
+    cache: SetCache  # made the first time the node runs
 
     def __init__(self, object: Expression, name: Token, value: Expression) -> None:
         self.name = name
         self.object = object
         self.value = value
+        self.cache = None
+
+    def new_cache(self):
+        self.cache = SetCache(self.name)
+        return self.cache
 
-    def eval(self):
-        obj: MyInstance = self.object.eval()
+    def eval(self, environment):
+        obj: MyInstance = self.object.eval(environment)
 
         if isinstance(obj, MyInstance):
-            obj.set(self.name, self.value.eval())
+            (self.cache or self.new_cache()).set(obj, self.value.eval(environment))
             return
 
         raise Exception(f"Only instances have fields.")
@@ -314,13 +424,19 @@ class Set(Expression):
 
 
 class This(Expression):
-    keyword: Token = None
+    __slots__ = ("keyword", "depth", "slot")
+
+    keyword: Token
+    depth: int
+    slot: int
 
     def __init__(self, keyword: Token) -> None:
         self.keyword = keyword
+        self.depth = None
+        self.slot = None
 
-    def eval(self):
-        return lookup_variable(self.keyword, self)
+    def eval(self, environment):
+        return lookup_variable(environment, self.keyword, self)
 
     def run_resolver(self, resolver):
         resolver.resolve_local(self, self.keyword)
@@ -374,82 +490,101 @@ primary        → "true" | "false" | "nil"
 
 
 class Statement:
-    expression: Expression = None
+    __slots__ = ()
 
     def __init__(self, expression: Expression) -> None:
         self.expression = expression
 
-    def eval(self):
+    def eval(self, environment):
         pass
 
     def run_resolver(self, resolver: Resolver):
         pass
 
+    def declared_name(self):
+        return None
+
 
 class PrintStatement(Statement):
+    __slots__ = ("expression",)
+
     PRINT = "print"
 
-    def eval(self):
-        print(self.expression.eval())
+    def eval(self, environment):
+        print(self.expression.eval(environment), file=environment.globals.output)
 
     def run_resolver(self, resolver):
         resolver.resolve(self.expression)
 
 
 class ExpressionStatement(Statement):
-    def eval(self):
-        return self.expression.eval()
+    __slots__ = ("expression",)
+
+    def eval(self, environment):
+        self.expression.eval(environment)
 
     def run_resolver(self, resolver):
         resolver.resolve(self.expression)
 
 
 class VarDeclarationStatement(Statement):
-    expression: Expression = None
-    token: Token = None
+    __slots__ = ("expression", "token", "slot")
+
+    expression: Expression
+    token: Token
+    slot: int
 
     def __init__(self, token: Token, expression: Expression) -> None:
         self.expression = expression
         self.token = token
+        self.slot = None
 
-    def eval(self):
-        return environment.define(self.token, self.expression.eval())
+    def declared_name(self):
+        return self.token.lexeme
+
+    def eval(self, environment):
+        define_variable(
+            environment, self.slot, self.token, self.expression.eval(environment)
+        )
 
     def run_resolver(self, resolver):
-        resolver.declare(self.token.lexeme)
+        self.slot = resolver.declare(self.token.lexeme)
         if self.expression:
             resolver.resolve(self.expression)
         resolver.define(self.token.lexeme)
 
 
 class BlockStatement(Statement):
-    statements: list[Statement] = []
+    __slots__ = ("statements", "slot_count")
+
+    statements: list[Statement]
+    slot_count: int
 
     def __init__(self, statements: list[Statement]):
         self.statements = statements
+        self.slot_count = 0
 
-    def eval(self, given_environment: Environment = None):
-        if given_environment is not None:
-            block_environment = Environment(outer_environment=given_environment)
-        else:
-            block_environment = Environment(outer_environment=environment)
+    def eval(self, environment):
+        environment = Environment(environment, self.slot_count)
 
-        # swap the environment for the execution.
-        with swap_environment(block_environment):
-            for stat in self.statements:
-                stat.eval()
+        for stat in self.statements:
+            completion = stat.eval(environment)
+            if completion is not None:
+                return completion
 
     def run_resolver(self, resolver):
         resolver.begin_scope()
         for statement in self.statements:
             resolver.resolve(statement)
-        resolver.end_scope()
+        self.slot_count = resolver.end_scope()
 
 
 class IfStatement(Statement):
-    condition: Expression = None
-    if_statement: Statement = None
-    else_statement: Statement = None
+    __slots__ = ("condition", "if_statement", "else_statement")
+
+    condition: Expression
+    if_statement: Statement
+    else_statement: Statement
 
     def __init__(
         self,
@@ -461,11 +596,11 @@ class IfStatement(Statement):
         self.if_statement = if_statement
         self.else_statement = else_statement
 
-    def eval(self):
-        if self.condition.is_truthy():
-            self.if_statement.eval()
+    def eval(self, environment):
+        if self.condition.is_truthy(environment):
+            return self.if_statement.eval(environment)
         elif self.else_statement is not None:
-            self.else_statement.eval()
+            return self.else_statement.eval(environment)
 
     def run_resolver(self, resolver):
         resolver.resolve(self.condition)
@@ -476,16 +611,20 @@ class IfStatement(Statement):
 
 
 class WhileStatement(Statement):
-    condition: Expression = None
-    statement: Statement = None
+    __slots__ = ("condition", "statement")
+
+    condition: Expression
+    statement: Statement
 
     def __init__(self, condition: Exception, statement: Statement):
         self.condition = condition
         self.statement = statement
 
-    def eval(self):
-        while self.condition.is_truthy():
-            self.statement.eval()
+    def eval(self, environment):
+        while self.condition.is_truthy(environment):
+            completion = self.statement.eval(environment)
+            if completion is not None:
+                return completion
 
     def run_resolver(self, resolver):
         resolver.resolve(self.condition)
@@ -493,70 +632,109 @@ class WhileStatement(Statement):
 
 
 class FunctionDeclarationStatement(Statement):
-    name: Token = None
-    parameters: list[Token] = []
-    body: BlockStatement = None
+    __slots__ = ("name", "parameters", "body", "slot", "memo_size")
+
+    name: Token
+    parameters: list[Token]
+    body: BlockStatement
+    slot: int
+    memo_size: int  # set by the purity analysis when the function is memoized
 
     def __init__(self, name: Token, parameters: list[Token], body: BlockStatement):
         self.name = name
         self.parameters = parameters
         self.body = body
+        self.slot = None
+        self.memo_size = None
+
+    def declared_name(self):
+        return self.name.lexeme
+
+    def eval(self, environment):
+        if self.memo_size is None:
+            function = MyFunction(
+                body=self.body,
+                parameters=self.parameters,
+                name=self.name,
+                closure=environment,
+            )
+        else:
+            function = MemoFunction(
+                body=self.body,
+                parameters=self.parameters,
+                name=self.name,
+                closure=environment,
+            )
+            function.memo = MemoTable(self.name.lexeme, self.memo_size)
 
-    def eval(self):
-        function = MyFunction(
-            body=self.body,
-            parameters=self.parameters,
-            name=self.name,
-            closure=environment,
-        )
-        environment.define(self.name, function)
-        return function
+        define_variable(environment, self.slot, self.name, function)
 
     def run_resolver(self, resolver):
-        resolver.declare(self.name.lexeme)
+        self.slot = resolver.declare(self.name.lexeme)
         resolver.define(self.name.lexeme)
+        self.resolve_function(resolver)
 
+    def resolve_function(self, resolver, receiver=False):
+        # parameters take the first slots of the call's environment, in order,
+        # after `this` for methods
         resolver.begin_scope()
 
+        if receiver:
+            resolver.declare("this")
+            resolver.define("this")
+
         for param in self.parameters:
             resolver.declare(param.lexeme)
             resolver.define(param.lexeme)
 
+        resolver.function_depth += 1
         resolver.resolve(self.body)
+        resolver.function_depth -= 1
 
         # end the scope
         resolver.end_scope()
 
 
-class ReturnAsException(Exception):
-    value: any = None
-
-    def __init__(self, value: any) -> None:
-        self.value = value
-
-
 class ReturnStatement(Statement):
-    expression: Expression = None
-    token: Token = None
+    __slots__ = ("expression", "token", "tail_call")
+
+    expression: Expression
+    token: Token
+    tail_call: bool
 
     def __init__(self, token, expression: Expression) -> None:
         self.expression = expression
         self.token = token
+        self.tail_call = False
 
-    def eval(self):
-        value = self.expression.eval()
+    def eval(self, environment):
+        if self.tail_call:
+            return (self.expression.eval_tail(environment),)
+        if self.expression is None:
+            return (None,)
 
-        raise ReturnAsException(value)
+        return (self.expression.eval(environment),)
 
     def run_resolver(self, resolver):
+        if resolver.function_depth == 0:
+            raise Exception(
+                f"on line [{self.token.line_number}] - Cannot return from top-level code."
+            )
+
         if self.expression:
             resolver.resolve(self.expression)
 
+            # `return f(...)`, the call is made once this function has returned
+            self.tail_call = isinstance(self.expression, Call)
+
 
 class ClassDeclarationStatement(Statement):
-    name: Token = None
-    methods: list[FunctionDeclarationStatement] = []
-    superclass: Variable = None
+    __slots__ = ("name", "methods", "superclass", "slot")
+
+    name: Token
+    methods: list[FunctionDeclarationStatement]
+    superclass: Variable
+    slot: int
 
     def __init__(
         self,
@@ -567,25 +745,36 @@ class ClassDeclarationStatement(Statement):
         self.name = name
         self.methods = methods
         self.superclass = superclass
+        self.slot = None
+
+    def declared_name(self):
+        return self.name.lexeme
 
-    def eval(self):
+    def eval(self, environment):
         super_class = None
 
         if self.superclass:
-            super_class = self.superclass.eval()
+            super_class = self.superclass.eval(environment)
             if not isinstance(super_class, MyClass):
                 raise Exception(f"Superclass must be a class.")
 
-        environment.define(self.name, None)
-        klass = MyClass(name=self.name, methods={}, super_class=super_class)
+        define_variable(environment, self.slot, self.name, None)
 
+        methods = {}
         for method in self.methods:
-            klass.methods[method.name.lexeme] = method.eval()
+            methods[method.name.lexeme] = MyFunction(
+                body=method.body,
+                parameters=method.parameters,
+                name=method.name,
+                closure=environment,
+                is_initializer=method.name.lexeme == "init",
+            )
 
-        environment.assign(self.name, klass)
+        klass = MyClass(name=self.name, methods=methods, super_class=super_class)
+        define_variable(environment, self.slot, self.name, klass)
 
     def run_resolver(self, resolver):
-        resolver.declare(self.name.lexeme)
+        self.slot = resolver.declare(self.name.lexeme)
         resolver.define(self.name.lexeme)
 
         if self.superclass:
@@ -594,10 +783,5 @@ class ClassDeclarationStatement(Statement):
 
             resolver.resolve(self.superclass)
 
-        resolver.begin_scope()
-        resolver.scopes[-1]["this"] = True
-
         for method in self.methods:
-            method.run_resolver(resolver)
-
-        resolver.end_scope()
+            method.resolve_function(resolver, receiver=True)
@@ -0,0 +1,184 @@
+"""
+Inline caches for property reads and writes, one per `Get` / `Set` site.
+
+A site remembers what it did for each shape of the instances it has seen: the
+index of the field in the instance's values, or the method found in the class.
+Shapes never change and every class has its own, so an entry stays right for
+as long as the program runs. The first shape is kept apart from the others
+since most sites only ever see one, up to `MAX_ENTRIES` shapes are kept after
+that and a site that sees more stops remembering new ones.
+"""
+
+from interpreter.callable import MyInstance, Shape
+from interpreter.internals import Token
+
+MAX_ENTRIES = 4
+# the ones with `Get` / `Set` sites, the others look properties up every time
+CACHED_ENGINES = ("tree", "closure")
+
+
+class CacheStats:
+    # a site misses before it can hit, so it registers itself on its first miss,
+    # only while `recording`: the list keeps the sites and what they saw alive
+    recording: bool = False
+
+    def __init__(self) -> None:
+        self.sites = []
+
+    def hits(self):
+        return sum(site.hits for site in self.sites)
+
+    def misses(self):
+        return sum(site.misses for site in self.sites)
+
+    def megamorphic(self):
+        return sum(1 for site in self.sites if site.megamorphic())
+
+    def hit_rate(self):
+        hits, misses = self.hits(), self.misses()
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def reset(self):
+        """Empties every site that remembered something, for the next program run."""
+        for site in self.sites:
+            site.forget()
+        self.sites = []
+
+    def report(self):
+        return (
+            f"inline caches: {self.hits()} hits, {self.misses()} misses "
+            f"({self.hit_rate():.1%} hit rate), {len(self.sites)} sites, "
+            f"{self.megamorphic()} megamorphic"
+        )
+
+
+STATS = CacheStats()
+
+
+class InlineCache:
+    __slots__ = ("name", "lexeme", "shape", "entry", "entries", "hits", "misses")
+
+    name: Token
+    lexeme: str
+    shape: Shape
+    entry: tuple
+    entries: dict
+
+    def __init__(self, name: Token) -> None:
+        self.name = name
+        self.lexeme = name.lexeme
+        # the first shape seen and its entry, the others are in `entries`
+        self.shape = None
+        self.entry = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def megamorphic(self):
+        return None in self.entries
+
+    def forget(self):
+        # the shapes belong to classes of a run that ended, and keep its heap alive
+        self.shape = None
+        self.entry = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, shape: Shape, entry: tuple):
+        if self.misses == 0 and STATS.recording:
+            STATS.sites.append(self)
+        self.misses += 1
+
+        if self.shape is None:
+            self.shape, self.entry = shape, entry
+        elif len(self.entries) < MAX_ENTRIES - 1:
+            self.entries[shape] = entry
+        else:
+            # megamorphic, the site keeps using what it has but learns nothing new
+            self.entries[None] = None
+
+
+class GetCache(InlineCache):
+    """Entries are `(index, None)` for a field, `(None, method)` for a method."""
+
+    __slots__ = ()
+
+    def get(self, instance: MyInstance):
+        shape = instance.shape
+
+        if shape is self.shape:
+            index, method = self.entry
+            self.hits += 1
+        else:
+            index, method = self.lookup(instance)
+
+        if method is None:
+            return instance.values[index]
+        return method.bind(instance)
+
+    def lookup(self, instance: MyInstance):
+        """Returns the entry for the instance's shape, without binding the method."""
+        shape = instance.shape
+
+        if shape is self.shape:
+            self.hits += 1
+            return self.entry
+
+        entry = self.entries.get(shape)
+        if entry is None:
+            return self.miss(instance)
+
+        self.hits += 1
+        return entry
+
+    def miss(self, instance: MyInstance):
+        shape = instance.shape
+        index = shape.fields.get(self.lexeme)
+
+        if index is not None:
+            entry = (index, None)
+        else:
+            method = instance.klass.find_method(self.lexeme)
+            if not method:
+                raise Exception(f"Undefined property '{self.lexeme}'.")
+            entry = (None, method)
+
+        self.remember(shape, entry)
+        return entry
+
+
+class SetCache(InlineCache):
+    """
+    Entries are `(index, None)` to overwrite a field, `(index, shape)` to add
+    it and move the instance to the new shape.
+    """
+
+    __slots__ = ()
+
+    def set(self, instance: MyInstance, value):
+        shape = instance.shape
+
+        if shape is self.shape:
+            index, next_shape = self.entry
+        else:
+            entry = self.entries.get(shape)
+            if entry is None:
+                return self.miss(instance, value)
+            index, next_shape = entry
+
+        self.hits += 1
+        if next_shape is None:
+            instance.values[index] = value
+        else:
+            instance.shape = next_shape
+            instance.values.append(value)
+
+    def miss(self, instance: MyInstance, value):
+        shape = instance.shape
+        instance.set_field(self.lexeme, value)
+
+        if instance.shape is shape:
+            self.remember(shape, (shape.fields[self.lexeme], None))
+        else:
+            self.remember(shape, (len(shape.fields), instance.shape))
@@ -1,54 +1,107 @@
+import sys
+from array import array
+
+
 class TokenType:
+    # kinds are small ints so the parser compares ints, `NAMES` has the names
+    # `tokenize` prints
+
     # Single-character tokens
-    LEFT_PAREN = "LEFT_PAREN"
-    RIGHT_PAREN = "RIGHT_PAREN"
-    LEFT_BRACE = "LEFT_BRACE"
-    RIGHT_BRACE = "RIGHT_BRACE"
-    COMMA = "COMMA"
-    DOT = "DOT"
-    MINUS = "MINUS"
-    PLUS = "PLUS"
-    SEMICOLON = "SEMICOLON"
-    SLASH = "SLASH"
-    STAR = "STAR"
-    COMMENT = "COMMENT"
+    LEFT_PAREN = 0
+    RIGHT_PAREN = 1
+    LEFT_BRACE = 2
+    RIGHT_BRACE = 3
+    COMMA = 4
+    DOT = 5
+    MINUS = 6
+    PLUS = 7
+    SEMICOLON = 8
+    SLASH = 9
+    STAR = 10
+    COMMENT = 11
 
     # One or two character tokens
-    BANG = "BANG"
-    BANG_EQUAL = "BANG_EQUAL"
-    EQUAL = "EQUAL"
-    EQUAL_EQUAL = "EQUAL_EQUAL"
-    GREATER = "GREATER"
-    GREATER_EQUAL = "GREATER_EQUAL"
-    LESS = "LESS"
-    LESS_EQUAL = "LESS_EQUAL"
-    AND = "AND"
-    OR = "OR"
+    BANG = 12
+    BANG_EQUAL = 13
+    EQUAL = 14
+    EQUAL_EQUAL = 15
+    GREATER = 16
+    GREATER_EQUAL = 17
+    LESS = 18
+    LESS_EQUAL = 19
+    AND = 20
+    OR = 21
 
     # Literals
-    IDENTIFIER = "IDENTIFIER"
-    STRING = "STRING"
-    NUMBER = "NUMBER"
+    IDENTIFIER = 22
+    STRING = 23
+    NUMBER = 24
 
     # Keywords
-    FALSE = "FALSE"
-    TRUE = "TRUE"
-    NULL = "NULL"
-    NIL = "NIL"
-    CLASS = "CLASS"
-    ELSE = "ELSE"
-    PRINT = "PRINT"
-    VAR = "VAR"
-    IF = "IF"
-    WHILE = "WHILE"
-    FOR = "FOR"
-    FUNCTION = "FUN"
-    RETURN = "RETURN"
-    THIS = "THIS"
-    EXTENDS = "EXTENDS"
+    FALSE = 25
+    TRUE = 26
+    NULL = 27
+    NIL = 28
+    CLASS = 29
+    ELSE = 30
+    PRINT = 31
+    VAR = 32
+    IF = 33
+    WHILE = 34
+    FOR = 35
+    FUNCTION = 36
+    RETURN = 37
+    THIS = 38
+    EXTENDS = 39
+    SUPER = 40
 
     # End of file
-    EOF = "EOF"
+    EOF = 41
+
+    NAMES = [
+        "LEFT_PAREN",
+        "RIGHT_PAREN",
+        "LEFT_BRACE",
+        "RIGHT_BRACE",
+        "COMMA",
+        "DOT",
+        "MINUS",
+        "PLUS",
+        "SEMICOLON",
+        "SLASH",
+        "STAR",
+        "COMMENT",
+        "BANG",
+        "BANG_EQUAL",
+        "EQUAL",
+        "EQUAL_EQUAL",
+        "GREATER",
+        "GREATER_EQUAL",
+        "LESS",
+        "LESS_EQUAL",
+        "AND",
+        "OR",
+        "IDENTIFIER",
+        "STRING",
+        "NUMBER",
+        "FALSE",
+        "TRUE",
+        "NULL",
+        "NIL",
+        "CLASS",
+        "ELSE",
+        "PRINT",
+        "VAR",
+        "IF",
+        "WHILE",
+        "FOR",
+        "FUN",
+        "RETURN",
+        "THIS",
+        "EXTENDS",
+        "SUPER",
+        "EOF",
+    ]
 
 
 class ReservedLiteral:
@@ -60,6 +113,10 @@ class ReservedLiteral:
     BOOLEAN_LITERALS = [FALSE, TRUE, NIL]
 
 
+# literal of the keywords that have one
+KEYWORD_LITERALS = {TokenType.TRUE: True, TokenType.FALSE: False, TokenType.NIL: None}
+
+
 class ReservedLexeme:
     """
     What is a lexeme?
@@ -240,11 +297,56 @@ class ReservedLexeme:
     }
 
 
+class TokenBuffer:
+    """
+    Struct of arrays version of a token list for bulk scanning. Kinds, offsets
+    of the lexemes in `source` and line numbers are packed in arrays and a
+    `Token` is only made when one is read, so it can be handed to `Parser`
+    like a list.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.kinds = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.line_numbers = array("I")
+
+    def append(self, kind: int, start: int, end: int, line_number: int):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.line_numbers.append(line_number)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index: int):
+        kind = self.kinds[index]
+        lexeme = self.source[self.starts[index] : self.ends[index]]
+
+        if kind == TokenType.NUMBER:
+            literal = float(lexeme)
+        elif kind == TokenType.STRING:
+            literal = lexeme[1:-1]
+        else:
+            lexeme = sys.intern(lexeme)
+            literal = KEYWORD_LITERALS.get(kind, ReservedLiteral.NULL)
+
+        return Token(kind, lexeme, literal, self.line_numbers[index])
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+
 class Token:
-    token_type: str = None
-    lexeme: str = None
-    literal: str = None
-    line_number: int = None
+    __slots__ = ("token_type", "lexeme", "literal", "line_number")
+
+    token_type: int
+    lexeme: str
+    literal: object
+    line_number: int
 
     def __init__(self, token_type, lexeme, literal, line_number) -> None:
         self.token_type = token_type
@@ -253,6 +355,7 @@ class Token:
         self.line_number = line_number
 
     def __str__(self) -> str:
+        name = TokenType.NAMES[self.token_type]
         if self.literal in ReservedLiteral.BOOLEAN_LITERALS:
-            return f"{self.token_type} {self.lexeme} {ReservedLiteral.NULL}"
-        return f"{self.token_type} {self.lexeme} {self.literal}"
+            return f"{name} {self.lexeme} {ReservedLiteral.NULL}"
+        return f"{name} {self.lexeme} {self.literal}"
@@ -0,0 +1,208 @@
+"""
+Runtime support for programs produced by `interpreter.transpiler`.
+
+Lox functions become plain python functions, methods take the receiver as their
+first argument and are wrapped in `Method` so `MyClass` and `MyInstance` from
+`interpreter/callable.py` can bind and call them the same way as `MyFunction`.
+"""
+
+import importlib.util
+import marshal
+from types import FunctionType
+
+from interpreter.callable import MyCallable, MyClass, MyInstance, arity_error
+from interpreter.internals import Token, TokenType
+from interpreter.natives import NATIVES
+
+ARTIFACT_MAGIC = b"LOXC"
+ARTIFACT_VERSION = b"\x01"
+ARTIFACT_SUFFIX = ".loxc"
+
+
+def lox_name(python_name: str):
+    # transpiled names are `<lox name>_<suffix>`, see `Transpiler.python_name`
+    return python_name.rsplit("_", 1)[0]
+
+
+class Method(MyCallable):
+    def __init__(self, function, name: str, is_initializer: bool = False):
+        self.function = function
+        self.name = name
+        self.is_initializer = is_initializer
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args)
+
+    def invoke(self, instance, arguments):
+        return self.function(instance, *arguments)
+
+    def bind(self, instance):
+        return BoundMethod(instance, self)
+
+    def arity(self):
+        return self.function.__code__.co_argcount - 1
+
+    def __str__(self):
+        return f"<fn {self.name}>"
+
+
+class BoundMethod(MyCallable):
+    def __init__(self, receiver, method: Method):
+        self.receiver = receiver
+        self.method = method
+
+    def __call__(self, *args, **kwargs):
+        return self.method.function(self.receiver, *args)
+
+    def arity(self):
+        return self.method.arity()
+
+    def __str__(self):
+        return str(self.method)
+
+
+def lox_print(value, output=None):
+    if type(value) is FunctionType:
+        print(f"<fn {lox_name(value.__name__)}>", file=output)
+    else:
+        print(value, file=output)
+
+
+def lox_store(box: list, value):
+    box[0] = value
+    return value
+
+
+def lox_assign_global(name: str, line_number: int, value):
+    # only emitted for globals the program never declares
+    raise Exception(f"Undefined variable {name} on line {line_number}")
+
+
+def lox_call(callee, *args):
+    # the frozen boxes of a closure are keyword only, they aren't counted
+    if type(callee) is FunctionType:
+        arity = callee.__code__.co_argcount
+    elif isinstance(callee, MyCallable):
+        arity = callee.arity()
+    else:
+        raise Exception(f"{callee} is not callable")
+
+    if arity != len(args):
+        raise arity_error(arity, len(args))
+    return callee(*args)
+
+
+def lox_get(instance, name: str):
+    if not isinstance(instance, MyInstance):
+        raise Exception(f"Only instances have properties.")
+
+    index = instance.shape.fields.get(name)
+    if index is not None:
+        return instance.values[index]
+
+    method = instance.klass.methods.get(name)
+    if method is None:
+        raise Exception(f"Undefined property '{name}'.")
+
+    return BoundMethod(instance, method)
+
+
+def lox_set(instance, name: str, value):
+    if not isinstance(instance, MyInstance):
+        raise Exception(f"Only instances have fields.")
+
+    instance.set_field(name, value)
+
+
+def lox_invoke(instance, name: str, *args):
+    # `a.b()` calls the method with the receiver, no bound method in between
+    if not isinstance(instance, MyInstance):
+        raise Exception(f"Only instances have properties.")
+
+    index = instance.shape.fields.get(name)
+    if index is not None:
+        return lox_call(instance.values[index], *args)
+
+    method = instance.klass.methods.get(name)
+    if method is None:
+        raise Exception(f"Undefined property '{name}'.")
+
+    if method.arity() != len(args):
+        raise arity_error(method.arity(), len(args))
+    return method.function(instance, *args)
+
+
+def lox_class(name: str, line_number: int, super_class, methods: list):
+    if super_class is not None and not isinstance(super_class, MyClass):
+        raise Exception(f"Superclass must be a class.")
+
+    # MyClass copies the inherited methods down, the class's own ones override them
+    table = {}
+    for method_name, function in methods:
+        table[method_name] = Method(function, method_name, method_name == "init")
+
+    return MyClass(
+        name=Token(TokenType.IDENTIFIER, name, None, line_number),
+        methods=table,
+        super_class=super_class,
+    )
+
+
+def new_namespace(output=None):
+    namespace = {
+        "__name__": "__lox__",
+        "lox_print": lox_print,
+        "lox_store": lox_store,
+        "lox_assign_global": lox_assign_global,
+        "lox_call": lox_call,
+        "lox_get": lox_get,
+        "lox_set": lox_set,
+        "lox_invoke": lox_invoke,
+        "lox_class": lox_class,
+    }
+    # natives are globals named like the transpiled ones, see `Transpiler.python_name`
+    for name, function in NATIVES.items():
+        namespace[f"{name}_g"] = function
+
+    if output is not None:
+        namespace["lox_print"] = lambda value: lox_print(value, output)
+
+    return namespace
+
+
+def run_code(code, output=None):
+    try:
+        exec(code, new_namespace(output))
+    except NameError as e:
+        # python lines are lox lines, the name was read in the innermost frame
+        traceback = e.__traceback__
+        while traceback.tb_next is not None:
+            traceback = traceback.tb_next
+        raise Exception(
+            f"Undefined variable {lox_name(e.name)} on line {traceback.tb_lineno}"
+        ) from None
+
+
+def write_artifact(file_name: str, code):
+    with open(file_name, "wb") as file:
+        file.write(ARTIFACT_MAGIC)
+        file.write(ARTIFACT_VERSION)
+        file.write(importlib.util.MAGIC_NUMBER)
+        file.write(marshal.dumps(code))
+
+
+def load_artifact(file_name: str):
+    with open(file_name, "rb") as file:
+        data = file.read()
+
+    header = ARTIFACT_MAGIC + ARTIFACT_VERSION + importlib.util.MAGIC_NUMBER
+
+    if not data.startswith(ARTIFACT_MAGIC):
+        raise Exception(f"{file_name} is not a compiled lox program")
+    if not data.startswith(header):
+        raise Exception(
+            f"{file_name} was compiled by another interpreter or python version, "
+            "compile it again"
+        )
+
+    return marshal.loads(data[len(header) :])
@@ -0,0 +1,165 @@
+"""
+Memoization of pure lox functions, turned on with `--memo`.
+
+The `tree` and `closure` engines make the functions `PurityAnalyzer` found pure
+with a `MemoTable`, a LRU of results keyed by the arguments. It is only used
+when all of them are numbers, strings, booleans or nil, anything else could be
+changed between two calls.
+"""
+
+from collections import OrderedDict
+
+from interpreter.callable import MyFunction, arity_error, trampoline
+
+# `None` is a result like any other
+MISSING = object()
+
+
+def memo_key(arguments, count: int):
+    """
+    The first `count` arguments as a dict key, None when one of them isn't a
+    number, string, boolean or nil.
+    """
+    key = tuple(arguments[:count])
+
+    exact = False
+    for argument in key:
+        kind = type(argument)
+        if kind is float:
+            # 0.0 and -0.0 are equal but don't print the same
+            exact = exact or argument == 0.0
+        elif kind is bool:
+            # True == 1.0 and they hash the same
+            exact = True
+        elif kind is not str and argument is not None:
+            return None
+
+    if exact:
+        # no plain key holds a tuple, these can't be mistaken for one
+        return (tuple(map(repr, key)),)
+
+    return key
+
+
+class MemoStats:
+    # a table misses before it can hit, so it registers itself on its first miss,
+    # only while `recording`: the list keeps the tables and their results alive
+    recording: bool = False
+
+    def __init__(self) -> None:
+        self.tables = []
+
+    def hits(self):
+        return sum(table.hits for table in self.tables)
+
+    def misses(self):
+        return sum(table.misses for table in self.tables)
+
+    def evictions(self):
+        return sum(table.evictions for table in self.tables)
+
+    def hit_rate(self):
+        hits, misses = self.hits(), self.misses()
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def reset(self):
+        # the tables belong to the functions of a run that ended
+        self.tables = []
+
+    def report(self):
+        lines = [
+            f"memo: {self.hits()} hits, {self.misses()} misses "
+            f"({self.hit_rate():.1%} hit rate), {self.evictions()} evictions, "
+            f"{len(self.tables)} functions"
+        ]
+        for table in self.tables:
+            lines.append(
+                f"  {table.name:20} {table.hits} hits, {table.misses} misses, "
+                f"{len(table.results)} entries"
+            )
+        return "\n".join(lines)
+
+
+STATS = MemoStats()
+
+
+class MemoTable:
+    """The results of one function, the least recently used go first when it's full."""
+
+    __slots__ = ("name", "max_size", "results", "hits", "misses", "evictions")
+
+    name: str
+    max_size: int
+    results: OrderedDict
+
+    def __init__(self, name: str, max_size: int) -> None:
+        self.name = name
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        result = self.results.get(key, MISSING)
+
+        if result is MISSING:
+            if self.misses == 0 and STATS.recording:
+                STATS.tables.append(self)
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results.move_to_end(key)
+
+        return result
+
+    def put(self, key, result):
+        self.results[key] = result
+
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+
+class Memoized:
+    """
+    Mixin for a `MyFunction` class, calls look in `memo` before running the
+    body. `memo` is set right after the function is made.
+    """
+
+    memo: MemoTable = None
+
+    def call(self, arguments):
+        # before the lookup, a hit mustn't hide a call with the wrong arguments
+        if len(arguments) != self.parameter_count:
+            raise arity_error(self.parameter_count, len(arguments))
+
+        key = memo_key(arguments, self.parameter_count)
+        if key is None:
+            return super().call(arguments)
+
+        result = self.memo.get(key)
+        if result is MISSING:
+            result = super().call(arguments)
+            self.memo.put(key, result)
+
+        return result
+
+    def enter(self, receiver, arguments):
+        # reached by a tail call, a miss runs the body without storing the
+        # result: it may end with a tail call, and making it here would take
+        # a python frame for every tail call in the chain
+        if len(arguments) != self.parameter_count:
+            raise arity_error(self.parameter_count, len(arguments))
+
+        key = memo_key(arguments, self.parameter_count)
+        if key is not None:
+            result = self.memo.get(key)
+            if result is not MISSING:
+                return result
+
+        return super().enter(receiver, arguments)
+
+
+class MemoFunction(Memoized, MyFunction):
+    pass
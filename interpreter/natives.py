@@ -0,0 +1,20 @@
+"""
+Native functions available to every lox program. They are declared once here
+and bound by the resolver, or looked up in the builtins frame at the root of
+the environment chain, so nothing is created per environment.
+"""
+
+from interpreter.callable import MyCallable, ClockCallable
+
+NATIVES: dict[str, MyCallable] = {}
+
+
+def native(name: str, function: MyCallable):
+    if name in NATIVES:
+        raise Exception(f"Native function {name} is already defined")
+
+    NATIVES[name] = function
+    return function
+
+
+native("clock", ClockCallable())
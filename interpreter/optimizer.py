@@ -0,0 +1,354 @@
+"""
+AST optimizer, runs between the parser and the resolver.
+
+- level 1 folds operators on literals and drops `if`/`while` branches whose
+  condition is a literal
+- level 2 also replaces reads of `var`s that are initialized with a literal and
+  never assigned again by that literal
+
+Folding calls the node's own `eval` on its literal operands, so it gives
+exactly what running it would. When that raises (`"a" - 1`, `1 / 0`) the node
+is left alone and the error still happens at runtime.
+"""
+
+from interpreter.grammar import (
+    Binary,
+    Unary,
+    Literal,
+    Grouping,
+    Variable,
+    Assignment,
+    Logical,
+    Call,
+    Get,
+    Set,
+    PrintStatement,
+    ExpressionStatement,
+    VarDeclarationStatement,
+    BlockStatement,
+    IfStatement,
+    WhileStatement,
+    FunctionDeclarationStatement,
+    ReturnStatement,
+    ClassDeclarationStatement,
+)
+from interpreter.internals import TokenType
+
+MAX_LEVEL = 2
+
+
+def is_declaration(statement):
+    # a branch that is a bare declaration still declares the name in the
+    # enclosing scope when it doesn't run, so it can't be dropped
+    return isinstance(
+        statement,
+        (
+            VarDeclarationStatement,
+            FunctionDeclarationStatement,
+            ClassDeclarationStatement,
+        ),
+    )
+
+
+class Binding:
+    """A declared name, tracked to know if its `var` is a constant."""
+
+    def __init__(self, declaration=None) -> None:
+        self.declaration = declaration  # the VarDeclarationStatement, None otherwise
+        self.defined = False  # False while its own initializer is walked
+        self.constant = declaration is not None
+        self.value_known = False
+        self.value = None
+
+
+class ConstantAnalyzer:
+    """
+    Finds which declaration every variable read refers to, following the
+    resolver's scoping rules, and which declarations are assigned or declared
+    conditionally. Globals are bound by name and only for reads that come after
+    their declaration in the source.
+    """
+
+    def __init__(self) -> None:
+        self.scopes: list[dict[str, Binding]] = []
+        self.globals: dict[str, Binding] = {}
+        self.assigned_global_names = set()
+        self.declarations: dict[VarDeclarationStatement, Binding] = {}
+        self.references: dict[Variable, Binding] = {}
+
+    def analyze(self, statements):
+        self.statements(statements)
+
+        for name in self.assigned_global_names:
+            if name in self.globals:
+                self.globals[name].constant = False
+
+    def statements(self, statements):
+        for statement in statements:
+            self.statement(statement, conditional=False)
+
+    def declare(self, name: str, declaration=None, conditional=False):
+        binding = Binding(declaration)
+        binding.constant = declaration is not None and not conditional
+
+        if self.scopes:
+            self.scopes[-1][name] = binding
+        elif name in self.globals:
+            # redeclared globals are different values at different times
+            self.globals[name].constant = False
+            binding = self.globals[name]
+        else:
+            self.globals[name] = binding
+
+        return binding
+
+    def lookup(self, name: str):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                binding = scope[name]
+                return binding if binding.defined else None
+
+        return self.globals.get(name)
+
+    def statement(self, statement, conditional):
+        if isinstance(statement, (PrintStatement, ExpressionStatement)):
+            self.expression(statement.expression)
+        elif isinstance(statement, VarDeclarationStatement):
+            name = statement.token.lexeme
+
+            if self.scopes:
+                # like the resolver, a local is declared before its initializer
+                binding = self.declare(name, statement, conditional)
+                self.expression(statement.expression)
+            else:
+                self.expression(statement.expression)
+                binding = self.declare(name, statement, conditional)
+
+            binding.defined = True
+            self.declarations[statement] = binding
+        elif isinstance(statement, BlockStatement):
+            self.scopes.append({})
+            self.statements(statement.statements)
+            self.scopes.pop()
+        elif isinstance(statement, IfStatement):
+            self.expression(statement.condition)
+            self.statement(statement.if_statement, conditional=True)
+            if statement.else_statement is not None:
+                self.statement(statement.else_statement, conditional=True)
+        elif isinstance(statement, WhileStatement):
+            self.expression(statement.condition)
+            self.statement(statement.statement, conditional=True)
+        elif isinstance(statement, FunctionDeclarationStatement):
+            self.declare(statement.name.lexeme).defined = True
+            self.function(statement)
+        elif isinstance(statement, ReturnStatement):
+            if statement.expression is not None:
+                self.expression(statement.expression)
+        elif isinstance(statement, ClassDeclarationStatement):
+            self.declare(statement.name.lexeme).defined = True
+            if statement.superclass is not None:
+                self.expression(statement.superclass)
+
+            self.scopes.append({"this": Binding()})
+            for method in statement.methods:
+                self.function(method)
+            self.scopes.pop()
+
+    def function(self, statement: FunctionDeclarationStatement):
+        self.scopes.append({})
+        for parameter in statement.parameters:
+            self.declare(parameter.lexeme).defined = True
+
+        self.statement(statement.body, conditional=False)
+        self.scopes.pop()
+
+    def expression(self, expression):
+        if isinstance(expression, Variable):
+            binding = self.lookup(expression.token.lexeme)
+            if binding is not None:
+                self.references[expression] = binding
+        elif isinstance(expression, Assignment):
+            self.expression(expression.value)
+
+            binding = self.lookup(expression.token.lexeme)
+            if binding is not None:
+                binding.constant = False
+            if not any(expression.token.lexeme in scope for scope in self.scopes):
+                # may be a global that isn't declared yet at this point
+                self.assigned_global_names.add(expression.token.lexeme)
+        elif isinstance(expression, (Binary, Logical)):
+            self.expression(expression.left)
+            self.expression(expression.right)
+        elif isinstance(expression, Unary):
+            self.expression(expression.right)
+        elif isinstance(expression, Grouping):
+            self.expression(expression.expression)
+        elif isinstance(expression, Call):
+            self.expression(expression.callee)
+            for argument in expression.arguments:
+                self.expression(argument)
+        elif isinstance(expression, Get):
+            self.expression(expression.object)
+        elif isinstance(expression, Set):
+            self.expression(expression.object)
+            self.expression(expression.value)
+
+
+class Optimizer:
+    def __init__(self, level: int = MAX_LEVEL) -> None:
+        self.level = level
+        self.analyzer = None
+
+    def optimize(self, statements):
+        if self.level <= 0:
+            return statements
+
+        if self.level >= 2:
+            self.analyzer = ConstantAnalyzer()
+            self.analyzer.analyze(statements)
+
+        return self.statements(statements)
+
+    ################################################################################################
+
+    def statements(self, statements):
+        optimized = []
+
+        for statement in statements:
+            statement = self.statement(statement)
+            if statement is not None:
+                optimized.append(statement)
+
+        return optimized
+
+    def branch(self, statement):
+        # a removed `if` or `while` body still has to be a statement
+        statement = self.statement(statement)
+        return statement if statement is not None else BlockStatement([])
+
+    def statement(self, statement):
+        """Returns the optimized statement, None when it can be dropped."""
+        if isinstance(statement, (PrintStatement, ExpressionStatement)):
+            statement.expression = self.expression(statement.expression)
+        elif isinstance(statement, VarDeclarationStatement):
+            statement.expression = self.expression(statement.expression)
+            self.record_constant(statement)
+        elif isinstance(statement, BlockStatement):
+            statement.statements = self.statements(statement.statements)
+        elif isinstance(statement, IfStatement):
+            return self.if_statement(statement)
+        elif isinstance(statement, WhileStatement):
+            statement.condition = self.expression(statement.condition)
+            if (
+                isinstance(statement.condition, Literal)
+                and not statement.condition.value
+                and not is_declaration(statement.statement)
+            ):
+                return None
+            statement.statement = self.branch(statement.statement)
+        elif isinstance(statement, FunctionDeclarationStatement):
+            self.statement(statement.body)
+        elif isinstance(statement, ReturnStatement):
+            if statement.expression is not None:
+                statement.expression = self.expression(statement.expression)
+        elif isinstance(statement, ClassDeclarationStatement):
+            for method in statement.methods:
+                self.statement(method.body)
+
+        return statement
+
+    def if_statement(self, statement: IfStatement):
+        statement.condition = self.expression(statement.condition)
+
+        if isinstance(statement.condition, Literal):
+            if statement.condition.value:
+                taken, dropped = statement.if_statement, statement.else_statement
+            else:
+                taken, dropped = statement.else_statement, statement.if_statement
+
+            if not is_declaration(dropped):
+                return self.statement(taken) if taken is not None else None
+
+        statement.if_statement = self.branch(statement.if_statement)
+        if statement.else_statement is not None:
+            statement.else_statement = self.branch(statement.else_statement)
+
+        return statement
+
+    def record_constant(self, statement: VarDeclarationStatement):
+        if self.analyzer is None:
+            return
+
+        binding = self.analyzer.declarations.get(statement)
+        if binding is not None and binding.constant:
+            if isinstance(statement.expression, Literal):
+                binding.value = statement.expression.value
+                binding.value_known = True
+
+    ################################################################################################
+
+    def expression(self, expression):
+        if isinstance(expression, Binary):
+            expression.left = self.expression(expression.left)
+            expression.right = self.expression(expression.right)
+            if isinstance(expression.left, Literal) and isinstance(
+                expression.right, Literal
+            ):
+                return self.fold(expression)
+        elif isinstance(expression, Unary):
+            expression.right = self.expression(expression.right)
+            if isinstance(expression.right, Literal):
+                return self.fold(expression)
+        elif isinstance(expression, Grouping):
+            inner = self.expression(expression.expression)
+            if isinstance(inner, Literal):
+                return inner
+            expression.expression = inner
+        elif isinstance(expression, Logical):
+            return self.logical(expression)
+        elif isinstance(expression, Variable):
+            return self.variable(expression)
+        elif isinstance(expression, Assignment):
+            expression.value = self.expression(expression.value)
+        elif isinstance(expression, Call):
+            expression.callee = self.expression(expression.callee)
+            expression.arguments = [
+                self.expression(argument) for argument in expression.arguments
+            ]
+        elif isinstance(expression, Get):
+            expression.object = self.expression(expression.object)
+        elif isinstance(expression, Set):
+            expression.object = self.expression(expression.object)
+            expression.value = self.expression(expression.value)
+
+        return expression
+
+    def fold(self, expression):
+        # an operator on literals, it reads no variables and needs no environment
+        try:
+            return Literal(expression.eval(None))
+        except Exception:
+            return expression
+
+    def logical(self, expression: Logical):
+        expression.left = self.expression(expression.left)
+        expression.right = self.expression(expression.right)
+
+        if not isinstance(expression.left, Literal):
+            return expression
+
+        # the left side decides on its own whether the right one is the result
+        left = expression.left.value
+        if expression.operator.token_type == TokenType.OR:
+            return expression.left if left else expression.right
+        return expression.right if left else expression.left
+
+    def variable(self, expression: Variable):
+        if self.analyzer is None:
+            return expression
+
+        binding = self.analyzer.references.get(expression)
+        if binding is not None and binding.constant and binding.value_known:
+            return Literal(binding.value)
+
+        return expression
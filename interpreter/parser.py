@@ -41,9 +41,14 @@ class Parser:
                    | "(" expression ")" ;
     """
 
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.current = 0
+    def __init__(self, tokens, error_output=None):
+        # tokens are pulled one at a time, so a lazy scanner only ever has the
+        # current and the previous one alive
+        self.tokens = iter(tokens)
+        # errors are printed here, stderr when None
+        self.error_output = error_output if error_output is not None else sys.stderr
+        self.previous_token = None
+        self.current_token = next(self.tokens)
 
     def parse(self):
         statements: list[ExpressionStatement] = []
@@ -55,17 +60,18 @@ class Parser:
 
     def advance(self):
         if not self.is_at_end():
-            self.current += 1
+            self.previous_token = self.current_token
+            self.current_token = next(self.tokens)
         return self.previous()
 
     def is_at_end(self):
         return self.peek().token_type == TokenType.EOF
 
     def peek(self):
-        return self.tokens[self.current]
+        return self.current_token
 
     def previous(self):
-        return self.tokens[self.current - 1]
+        return self.previous_token
 
     def match(self, *types):
         for token_type in types:
@@ -85,7 +91,7 @@ class Parser:
         try:
             raise Exception(message)
         except Exception as e:
-            print(e, file=sys.stderr)
+            print(e, file=self.error_output)
             exit(65)
 
     def expression(self):
@@ -343,7 +349,7 @@ class Parser:
         body = self.statement()
 
         if increment:
-            body = BlockStatement(statements=[body, increment])
+            body = BlockStatement(statements=[body, ExpressionStatement(increment)])
 
         body = WhileStatement(condition=condition_statement.expression, statement=body)
 
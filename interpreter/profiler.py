@@ -0,0 +1,114 @@
+"""
+Sampling profiler for lox programs, `python3 -m app.main profile <file>`.
+
+A timer signal interrupts the program every `interval` seconds of cpu time and
+the handler reads the lox call stack off the interrupted python stack: every
+running lox function has a `call` or `enter` frame whose `self` is the
+function, named `name:line` after the token it was declared with. Nothing is
+recorded between samples, so the program itself runs as fast as without it.
+
+The samples come out as collapsed stacks, one `<script>;outer:1;inner:5 42`
+line per distinct stack, which flame graph tools read, and as a table of the
+time spent in each function (self) and in it and what it called (total). The
+kernel doesn't keep to short intervals, so the times are the cpu time the run
+took split by each function's share of the samples, not samples * interval.
+"""
+
+import signal
+import time
+from collections import Counter
+
+from interpreter.callable import MyFunction, trampoline
+from interpreter.closure_compiler import CompiledFunction
+
+SCRIPT = "<script>"
+DEFAULT_INTERVAL = 0.001
+# the ones running lox functions as python calls
+PROFILED_ENGINES = ("tree", "closure")
+
+# a function that ended with a tail call has its `call` frame waiting on the
+# trampoline, the function actually running is the one the trampoline entered
+CALL_CODES = {MyFunction.call.__code__, CompiledFunction.call.__code__}
+FUNCTION_CODES = CALL_CODES | {
+    MyFunction.enter.__code__,
+    CompiledFunction.enter.__code__,
+}
+TRAMPOLINE_CODE = trampoline.__code__
+
+
+def label(function: MyFunction):
+    return f"{function.name.lexeme}:{function.name.line_number}"
+
+
+class Profiler:
+    interval: float = DEFAULT_INTERVAL
+    samples: Counter = None  # stack of labels, outermost first -> samples
+    cpu_time: float = 0.0  # seconds of cpu time between start and stop
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        self.interval = interval
+        self.samples = Counter()
+        self.cpu_time = 0.0
+        self.started = None
+        self.previous_handler = None
+
+    def start(self):
+        self.previous_handler = signal.signal(signal.SIGPROF, self.sample)
+        self.started = time.process_time()
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        self.cpu_time += time.process_time() - self.started
+        signal.signal(signal.SIGPROF, self.previous_handler)
+
+    def sample(self, signum, frame):
+        stack = []
+        inner = None
+
+        while frame is not None:
+            code = frame.f_code
+            if code in FUNCTION_CODES and not (
+                code in CALL_CODES and inner is TRAMPOLINE_CODE
+            ):
+                stack.append(label(frame.f_locals["self"]))
+
+            inner = code
+            frame = frame.f_back
+
+        stack.append(SCRIPT)
+        stack.reverse()
+        self.samples[tuple(stack)] += 1
+
+    def collapsed(self):
+        return "".join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in sorted(self.samples.items())
+        )
+
+    def table(self, top: int = 10):
+        self_samples = Counter()
+        total_samples = Counter()
+
+        for stack, count in self.samples.items():
+            self_samples[stack[-1]] += count
+            # recursion puts a function on the stack many times, count it once
+            for name in set(stack):
+                total_samples[name] += count
+
+        samples = sum(self.samples.values())
+        per_sample = self.cpu_time / samples if samples else 0.0
+        lines = [
+            f"{samples} samples, {self.cpu_time:.3f}s",
+            f"{'function':30} {'self':>9} {'':>6} {'total':>9} {'':>6}",
+        ]
+
+        names = sorted(total_samples, key=lambda name: (-self_samples[name], name))
+        for name in names[:top]:
+            own, total = self_samples[name], total_samples[name]
+            lines.append(
+                f"{name:30} {own * per_sample:8.3f}s {own / samples:6.1%} "
+                f"{total * per_sample:8.3f}s {total / samples:6.1%}"
+            )
+
+        return "\n".join(lines)
@@ -0,0 +1,163 @@
+"""
+Finds the pure lox functions, the ones `--memo` memoizes.
+
+A function is pure when it is declared once with `fun` at the top level, never
+assigned, and its body
+
+- doesn't `print`, declare functions or classes, or use properties and `this`
+- only assigns its own locals
+- only reads its own locals and the names of other pure functions
+- only calls pure functions, natives like `clock` aren't
+
+so with the same arguments it always gives the same result and does nothing
+else. The analysis runs after the resolver, which tells locals from globals.
+"""
+
+from interpreter.grammar import (
+    Binary,
+    Unary,
+    Literal,
+    Grouping,
+    Variable,
+    Assignment,
+    Logical,
+    Call,
+    ExpressionStatement,
+    VarDeclarationStatement,
+    BlockStatement,
+    IfStatement,
+    WhileStatement,
+    FunctionDeclarationStatement,
+    ReturnStatement,
+)
+
+DEFAULT_SIZE = 10_000
+# the ones calling the memo tables, the others would run without them
+MEMO_ENGINES = ("tree", "closure")
+
+
+class Impure(Exception):
+    pass
+
+
+class PurityAnalyzer:
+    def __init__(self, memo_size: int = DEFAULT_SIZE) -> None:
+        self.memo_size = memo_size
+        # for the function being walked, the names of the globals it calls or reads
+        self.uses: set[str] = set()
+        self.assigned_global_names: set[str] = set()
+
+    def analyze(self, statements):
+        """Sets `memo_size` on the pure functions and returns their names."""
+        declarations = {}
+        declared_names = set()
+        duplicated_names = set()
+
+        for statement in statements:
+            name = statement.declared_name()
+            if name in declared_names:
+                duplicated_names.add(name)
+            declared_names.add(name)
+
+            if isinstance(statement, FunctionDeclarationStatement):
+                declarations[name] = statement
+
+        self.find_global_assignments(statements)
+
+        uses = {}
+        for name, declaration in declarations.items():
+            if name in duplicated_names or name in self.assigned_global_names:
+                continue
+
+            self.uses = set()
+            try:
+                self.function(declaration)
+            except Impure:
+                continue
+            uses[name] = self.uses
+
+        # a function that uses an impure one is impure too, until nothing changes
+        pure = set(uses)
+        changed = True
+        while changed:
+            changed = False
+            for name in list(pure):
+                if not uses[name] <= pure:
+                    pure.remove(name)
+                    changed = True
+
+        for name in pure:
+            declarations[name].memo_size = self.memo_size
+
+        return pure
+
+    def find_global_assignments(self, node):
+        # anything assigning a global makes a function of that name impure,
+        # wherever it is in the program
+        if isinstance(node, list):
+            for item in node:
+                self.find_global_assignments(item)
+        elif isinstance(node, Assignment):
+            if node.depth is None:
+                self.assigned_global_names.add(node.token.lexeme)
+            self.find_global_assignments(node.value)
+        elif hasattr(node, "__slots__"):
+            for slot in type(node).__slots__:
+                child = getattr(node, slot, None)
+                if isinstance(child, list) or hasattr(child, "run_resolver"):
+                    self.find_global_assignments(child)
+
+    def function(self, declaration: FunctionDeclarationStatement):
+        # the parameters are one scope, the body another
+        self.statement(declaration.body, 1)
+
+    def statement(self, statement, scopes):
+        """`scopes` counts the scopes open in the function, deeper names aren't its own."""
+        if isinstance(statement, (ExpressionStatement, VarDeclarationStatement)):
+            self.expression(statement.expression, scopes)
+        elif isinstance(statement, BlockStatement):
+            for inner in statement.statements:
+                self.statement(inner, scopes + 1)
+        elif isinstance(statement, IfStatement):
+            self.expression(statement.condition, scopes)
+            self.statement(statement.if_statement, scopes)
+            if statement.else_statement is not None:
+                self.statement(statement.else_statement, scopes)
+        elif isinstance(statement, WhileStatement):
+            self.expression(statement.condition, scopes)
+            self.statement(statement.statement, scopes)
+        elif isinstance(statement, ReturnStatement):
+            if statement.expression is not None:
+                self.expression(statement.expression, scopes)
+        else:
+            # print, functions and classes
+            raise Impure()
+
+    def expression(self, expression, scopes):
+        if isinstance(expression, Literal):
+            pass
+        elif isinstance(expression, Variable):
+            if expression.native is not None:
+                raise Impure()
+            if expression.depth is None:
+                self.uses.add(expression.token.lexeme)
+            elif expression.depth >= scopes:
+                raise Impure()
+        elif isinstance(expression, Assignment):
+            if expression.depth is None or expression.depth >= scopes:
+                raise Impure()
+            self.expression(expression.value, scopes)
+        elif isinstance(expression, (Binary, Logical)):
+            self.expression(expression.left, scopes)
+            self.expression(expression.right, scopes)
+        elif isinstance(expression, Unary):
+            self.expression(expression.right, scopes)
+        elif isinstance(expression, Grouping):
+            self.expression(expression.expression, scopes)
+        elif isinstance(expression, Call):
+            self.expression(expression.callee, scopes)
+            for argument in expression.arguments:
+                self.expression(argument, scopes)
+        else:
+            # properties and `this`
+            raise Impure()
@@ -1,18 +1,37 @@
+from interpreter.natives import NATIVES
+
+
 class Resolver:
-    scopes = []
+    def __init__(self) -> None:
+        # all on the instance, nothing one program declared is seen by the next
+        self.scopes = []  # name -> whether the variable is defined yet, per scope
+        self.slots = []  # name -> slot of the variable in its scope's frame, per scope
+        self.global_names = set()  # names declared at the top level of the program
+        self.function_depth = 0  # functions the statement being resolved is in
 
     def resolve(self, statement):
         statement.run_resolver(self)
 
+    def resolve_program(self, statements):
+        # globals can shadow natives from anywhere in the program, so collect them first
+        self.global_names = {statement.declared_name() for statement in statements}
+
+        for statement in statements:
+            statement.run_resolver(self)
+
     def begin_scope(self):
         self.scopes.append({})
+        self.slots.append({})
 
     def end_scope(self):
+        """Closes the innermost scope and returns how many slots its frame needs."""
         self.scopes.pop()
+        return len(self.slots.pop())
 
     def declare(self, name: str):
+        """Declares `name` in the innermost scope and returns its slot, None for globals."""
         if not self.scopes:
-            return
+            return None
 
         scope = self.scopes[-1]
         if name in scope:
@@ -21,6 +40,9 @@ class Resolver:
             )
 
         scope[name] = False
+        slots = self.slots[-1]
+        slots[name] = len(slots)
+        return slots[name]
 
     def define(self, name: str):
         if not self.scopes:
@@ -30,9 +52,15 @@ class Resolver:
         scope[name] = True
 
     def resolve_local(self, expr, name):
-        from interpreter.grammar import resolve as set_depth
-
         for i in range(len(self.scopes) - 1, -1, -1):
             if name.lexeme in self.scopes[i]:
-                set_depth(expr, len(self.scopes) - 1 - i)
+                expr.depth = len(self.scopes) - 1 - i
+                expr.slot = self.slots[i][name.lexeme]
                 return
+
+    def resolve_native(self, name):
+        """Returns the native `name` refers to, None if it isn't one or a global shadows it."""
+        if name.lexeme in self.global_names:
+            return None
+
+        return NATIVES.get(name.lexeme)
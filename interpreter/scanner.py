@@ -1,13 +1,59 @@
-import interpreter.constants as constants
+import mmap
+import re
+import sys
+
 from interpreter.error import Error
-from interpreter.internals import Token, TokenType, ReservedLexeme, ReservedLiteral
+from interpreter.internals import (
+    Token,
+    TokenBuffer,
+    TokenType,
+    ReservedLexeme,
+    ReservedLiteral,
+    KEYWORD_LITERALS,
+)
+
+# one alternative per kind of token, tried in order after skipping blanks.
+# comments come before operators so `//` isn't two slashes, `other` catches
+# anything else one character at a time and the empty match at the end of the
+# line eats trailing blanks
+TOKEN_PATTERN = re.compile(
+    r"""
+    [ \t]*
+    (?:
+        (?P<identifier>[^\W\d]\w*)
+        |(?P<comment>//.*)
+        |(?P<operator>!=|==|>=|<=|&&|\|\||[(){},.;/*\-+=!<>])
+        |(?P<number>\d+(?:\.\d*)?)
+        |(?P<string>"[^"]*")
+        |(?P<unterminated>".*)
+        |(?P<other>.)
+        |$
+    )
+    """,
+    re.VERBOSE,
+)
+
+# the lexemes are kept in the tables so every token shares the same string
+
+# operator -> (token type, lexeme)
+OPERATORS = {
+    lexeme: (ReservedLexeme.LEXEME_TOKEN_TYPE_MAP[lexeme], lexeme)
+    for lexeme in ReservedLexeme.SINGLE_CHAR_LEXEMES
+    + ReservedLexeme.DOUBLE_CHAR_LEXEMES
+}
+
+# keyword -> (token type, literal, lexeme)
+KEYWORDS = {}
+for word in ReservedLexeme.RESERVED_WORDS:
+    token_type = TokenType.NAMES.index(word.upper())
+    literal = KEYWORD_LITERALS.get(token_type, ReservedLiteral.NULL)
+    KEYWORDS[word] = (token_type, literal, word)
 
 
 class Scanner:
-    # TODO: refactor this class to make it more readable
-
-    def __init__(self) -> None:
+    def __init__(self, error_output=None) -> None:
         self.has_errors: bool = False  # Flag to check if there are any errors
+        self.error_output = error_output  # Errors are printed here, stderr when None
         self.line_number: int = 0  # Current line number
         self.tokens: list[Token] = []  # List of tokens
         self.print_stdout: bool = True  # Flag to check if the output should be printed
@@ -20,131 +66,164 @@ class Scanner:
         self.scan_tokens(lines)
         return self.tokens
 
-    def scan_line(self, line):
-        # TODO: refactor this method to make it more readable
-        current_lexeme = ""
-        index = 0
+    def scan_source(self, source):
+        """Same as `scan` for source text instead of a file."""
+        # universal newlines, the same lines `scan` gets in text mode
+        source = source.replace("\r\n", "\n").replace("\r", "\n")
 
-        while index < len(line):
-            current_lexeme = line[index]
+        self.scan_tokens(source.split("\n"))
+        return self.tokens
 
-            if index + 1 < len(line):
-                double_char_lexeme = current_lexeme + line[index + 1]
-            else:
-                double_char_lexeme = ""
+    def stream(self, file_name):
+        """
+        Yields the tokens of the file one line at a time instead of building the
+        whole list, the file is memory mapped so it's never read in full either.
+        """
+        with open(file_name, "rb") as file:
+            try:
+                source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                source = file
+
+            with source:
+                ended_with_newline = True
+
+                for chunk in iter(source.readline, b""):
+                    # universal newlines, the same lines `scan` gets in text mode
+                    text = chunk.decode().replace("\r\n", "\n").replace("\r", "\n")
+                    lines = text.split("\n")
+                    ended_with_newline = text.endswith("\n")
+                    if ended_with_newline:
+                        lines.pop()
+
+                    for line in lines:
+                        self.line_number += 1
+                        self.scan_line(line)
+
+                        yield from self.tokens
+                        self.tokens.clear()
+
+        if ended_with_newline:
+            self.line_number += 1
 
-            if double_char_lexeme == ReservedLexeme.COMMENT:
-                index = len(line)
-                continue
+        self.add_token(TokenType.EOF, "", ReservedLiteral.NULL)
+        yield self.tokens.pop()
+
+    def scan_line(self, line):
+        tokens = self.tokens
+        line_number = self.line_number
 
-            if current_lexeme == constants.SPACE or current_lexeme == constants.TAB:
-                index += 1
+        for match in TOKEN_PATTERN.finditer(line):
+            kind = match.lastgroup
+            if kind is None:
                 continue
 
-            if double_char_lexeme in ReservedLexeme.DOUBLE_CHAR_LEXEMES:
-                self.add_token(
-                    ReservedLexeme.LEXEME_TOKEN_TYPE_MAP[double_char_lexeme],
-                    double_char_lexeme,
-                    ReservedLexeme.NULL,
+            lexeme = match.group(kind)
+
+            if kind == "identifier":
+                if lexeme in KEYWORDS:
+                    token_type, literal, lexeme = KEYWORDS[lexeme]
+                    tokens.append(Token(token_type, lexeme, literal, line_number))
+                elif lexeme[0].isalpha() or lexeme[0] == "_":
+                    tokens.append(
+                        Token(
+                            TokenType.IDENTIFIER,
+                            sys.intern(lexeme),
+                            ReservedLiteral.NULL,
+                            line_number,
+                        )
+                    )
+                else:
+                    # `\w` also has numeric characters that can't start a name
+                    self.add_error("Unexpected character", lexeme[0])
+                    self.scan_line(line[match.start(kind) + 1 :])
+                    return
+            elif kind == "operator":
+                token_type, lexeme = OPERATORS[lexeme]
+                tokens.append(
+                    Token(token_type, lexeme, ReservedLexeme.NULL, line_number)
+                )
+            elif kind == "number":
+                tokens.append(
+                    Token(TokenType.NUMBER, lexeme, float(lexeme), line_number)
                 )
-                index += 2
-            elif current_lexeme in ReservedLexeme.SINGLE_CHAR_LEXEMES:
-                self.add_token(
-                    ReservedLexeme.LEXEME_TOKEN_TYPE_MAP[current_lexeme],
-                    current_lexeme,
-                    ReservedLexeme.NULL,
+            elif kind == "string":
+                tokens.append(
+                    Token(TokenType.STRING, lexeme, lexeme[1:-1], line_number)
                 )
-                index += 1
-            elif current_lexeme == '"':
-                index = self.scan_string(line, index + 1)
-            elif current_lexeme.isdigit():
-                index = self.scan_number(line, index)
-            elif current_lexeme.isalpha() or current_lexeme == "_":
-                index = self.scan_identifier(line, index)
-            else:
-                self.add_error("Unexpected character", current_lexeme)
-                index += 1
-
-    def scan_string(self, line, index):
-        literal = ""
-        end_found = False
-
-        while index < len(line):
-            current_token = line[index]
-
-            if current_token == '"':
-                end_found = True
-                break
-
-            literal += current_token
-            index += 1
-
-        if not end_found:
-            self.add_error("Unterminated string.")
-            return index + 1
-
-        lexeme = f'"{literal}"'
-        self.add_token(TokenType.STRING, lexeme, literal)
-        return index + 1
-
-    def scan_number(self, line, index):
-        number = ""
-        dot_found = False
-
-        while index < len(line):
-            current_token = line[index]
-
-            if current_token.isdigit():
-                number += current_token
-            elif current_token == "." and not dot_found:
-                number += current_token
-                dot_found = True
-            else:
-                break
-
-            index += 1
-
-        self.add_token(TokenType.NUMBER, number, float(number))
-        return index
-
-    def scan_identifier(self, line, index):
-        identifier = ""
-
-        while index < len(line):
-            current_token = line[index]
-
-            if current_token.isalnum() or current_token == "_":
-                identifier += current_token
-            else:
-                break
-
-            index += 1
-
-        if identifier in ReservedLexeme.RESERVED_WORDS:
-            if identifier in ReservedLexeme.BOOLEAN_LEXEMES:
-                if identifier == "true":
-                    literal = True
-                elif identifier == "false":
-                    literal = False
+            elif kind == "unterminated":
+                self.add_error("Unterminated string.")
+            elif kind == "other":
+                self.add_error("Unexpected character", lexeme)
+
+    def scan_buffer(self, file_name):
+        """
+        Bulk scans the whole file into a `TokenBuffer`. Tokens are only created
+        when the parser reads them, so the full list never exists.
+        """
+        with open(file_name) as file:
+            source = file.read()
+
+        buffer = TokenBuffer(source)
+        offset = 0
+
+        for index, line in enumerate(source.split("\n")):
+            self.line_number = index + 1
+            self.buffer_line(buffer, line, offset)
+            offset += len(line) + 1
+
+        buffer.append(TokenType.EOF, offset - 1, offset - 1, self.line_number)
+        return buffer
+
+    def buffer_line(self, buffer, line, offset):
+        # same as scan_line, but only the kind and position of tokens are kept
+        append = buffer.append
+        line_number = self.line_number
+
+        for match in TOKEN_PATTERN.finditer(line):
+            kind = match.lastgroup
+            if kind is None or kind == "comment":
+                continue
+
+            start, end = match.span(kind)
+
+            if kind == "identifier":
+                lexeme = match.group(kind)
+                if lexeme in KEYWORDS:
+                    append(
+                        KEYWORDS[lexeme][0], offset + start, offset + end, line_number
+                    )
+                elif lexeme[0].isalpha() or lexeme[0] == "_":
+                    append(
+                        TokenType.IDENTIFIER, offset + start, offset + end, line_number
+                    )
                 else:
-                    literal = None
-                self.add_token(
-                    identifier.upper(),
-                    identifier,
-                    literal,
+                    self.add_error("Unexpected character", lexeme[0])
+                    self.buffer_line(buffer, line[start + 1 :], offset + start + 1)
+                    return
+            elif kind == "operator":
+                append(
+                    OPERATORS[match.group(kind)][0],
+                    offset + start,
+                    offset + end,
+                    line_number,
                 )
-            else:
-                self.add_token(identifier.upper(), identifier, ReservedLiteral.NULL)
-        else:
-            self.add_token(TokenType.IDENTIFIER, identifier, ReservedLiteral.NULL)
-        return index
+            elif kind == "number":
+                append(TokenType.NUMBER, offset + start, offset + end, line_number)
+            elif kind == "string":
+                append(TokenType.STRING, offset + start, offset + end, line_number)
+            elif kind == "unterminated":
+                self.add_error("Unterminated string.")
+            elif kind == "other":
+                self.add_error("Unexpected character", match.group(kind))
 
     def add_token(self, token_type, lexeme, literal):
         self.tokens.append(Token(token_type, lexeme, literal, self.line_number))
 
     def add_error(self, error_type, message=""):
         err = Error(error_type, message, self.line_number)
-        err.print_to_stderr()
+        err.print_to_stderr(self.error_output)
         self.has_errors = True
 
     def scan_tokens(self, lines):
@@ -0,0 +1,118 @@
+"""
+Execution statistics for `--stats`: wall time of every phase and counters of
+what the program did, printed as JSON after the run.
+
+The counters come from wrappers `instrument` puts around the methods that do
+the counted things for the length of the run, and `restore` takes them away.
+Nothing is counted otherwise, so a run without `--stats` is the same code as
+before and pays nothing for it.
+
+- `nodes` - AST node evaluations by class, in the `tree` engine
+- `environments` - local `Environment`s made, one per block and call
+- `function_calls` - calls of lox functions and methods, a tail call counts
+- `binds` - bound methods made for `a.method` that isn't called right away
+- `instances` - instances made
+- `returns` - `return`s run by the tree walker, none of them raises an exception
+"""
+
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from interpreter.callable import MyFunction, MyInstance
+from interpreter.closure_compiler import CompiledFunction
+from interpreter.environment import Environment
+from interpreter.grammar import Expression, Statement, Call, ReturnStatement
+
+
+def subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from subclasses(subclass)
+
+
+def counted(counters: Counter, key: str, function):
+    def wrapper(*args, **kwargs):
+        counters[key] += 1
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+def counted_by_class(counters: Counter, function):
+    # subclasses without an `eval` of their own still count under their name
+    def wrapper(self, *args, **kwargs):
+        counters[type(self).__name__] += 1
+        return function(self, *args, **kwargs)
+
+    return wrapper
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self.counters = Counter()
+        self.nodes = Counter()
+        # (owner, attribute, original) of everything `instrument` replaced
+        self.replaced = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def replace(self, owner, attribute: str, wrapper):
+        self.replaced.append((owner, attribute, owner.__dict__[attribute]))
+        setattr(owner, attribute, wrapper)
+
+    def instrument(self):
+        counters = self.counters
+
+        for cls in [*subclasses(Expression), *subclasses(Statement)]:
+            if "eval" in cls.__dict__:
+                self.replace(cls, "eval", counted_by_class(self.nodes, cls.eval))
+        self.replace(Call, "eval_tail", counted(self.nodes, "Call", Call.eval_tail))
+
+        self.replace(
+            Environment,
+            "__init__",
+            counted(counters, "environments", Environment.__init__),
+        )
+        self.replace(
+            MyInstance, "__init__", counted(counters, "instances", MyInstance.__init__)
+        )
+        self.replace(MyFunction, "bind", counted(counters, "binds", MyFunction.bind))
+        for cls in (MyFunction, CompiledFunction):
+            for name in ("call", "enter"):
+                self.replace(
+                    cls, name, counted(counters, "function_calls", cls.__dict__[name])
+                )
+
+    def restore(self):
+        for owner, attribute, original in reversed(self.replaced):
+            setattr(owner, attribute, original)
+        self.replaced = []
+
+    def report(self, engine: str):
+        counters = {
+            name: self.counters[name]
+            for name in ("environments", "function_calls", "binds", "instances")
+        }
+        counters["returns"] = self.nodes[ReturnStatement.__name__]
+
+        return json.dumps(
+            {
+                "engine": engine,
+                "phases": {name: round(t, 6) for name, t in self.phases.items()},
+                "total": round(sum(self.phases.values()), 6),
+                "counters": counters,
+                "nodes": dict(self.nodes.most_common()),
+            },
+            indent=2,
+        )
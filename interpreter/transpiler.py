@@ -0,0 +1,639 @@
+"""
+Ahead of time translation of a lox program to a python code object.
+
+Every lox function (and the top level code, as `lox_main`) becomes a python
+function. Lox block scopes don't exist in python, so every declaration gets a
+unique python name (`<name>_<n>`, globals are `<name>_g`) and blocks are simply
+inlined. Lox creates a fresh variable every time a block runs while a python
+closure captures the variable of the whole function call, so locals declared in
+a loop body and captured by a closure are kept in a one element list (a box)
+that the closure freezes through a keyword only default argument.
+"""
+
+import ast
+import math
+
+from interpreter.internals import TokenType
+from interpreter.grammar import (
+    Binary,
+    Unary,
+    Literal,
+    Grouping,
+    Variable,
+    Assignment,
+    Logical,
+    Call,
+    Get,
+    Set,
+    This,
+    PrintStatement,
+    ExpressionStatement,
+    VarDeclarationStatement,
+    BlockStatement,
+    IfStatement,
+    WhileStatement,
+    FunctionDeclarationStatement,
+    ReturnStatement,
+    ClassDeclarationStatement,
+)
+
+
+class Binding:
+    def __init__(self, name: str, python_name: str, owner, in_loop: bool) -> None:
+        self.name = name
+        self.python_name = python_name
+        self.owner: FunctionInfo = owner  # None for globals
+        self.in_loop = in_loop
+        self.captured = False
+
+    @property
+    def boxed(self):
+        return self.captured and self.in_loop
+
+
+class FunctionInfo:
+    def __init__(self, parent) -> None:
+        self.parent: FunctionInfo = parent
+        self.loop_depth = 0
+        self.free: set[Binding] = set()  # used here or deeper, owned further out
+        self.nonlocals: set[Binding] = set()
+        self.globals: set[Binding] = set()
+
+
+class ScopeAnalyzer:
+    """
+    First pass: links every declaration and variable use to a `Binding` and
+    works out which functions capture or assign variables they don't own.
+    """
+
+    def __init__(self) -> None:
+        self.scopes: list[dict[str, Binding]] = []
+        self.function: FunctionInfo = None
+        self.global_bindings: dict[str, Binding] = {}
+        self.declared_globals: set[str] = set()
+        # bindings only ever set by one `fun`, and its number of parameters
+        self.arities: dict[Binding, int] = {}
+        self.rebound: set[Binding] = set()
+        self.declared: set[Binding] = set()
+        self.bindings: dict = {}  # declaration or use (AST node / token) -> Binding
+        self.functions: dict = {}  # function declaration -> FunctionInfo
+        self.counter = 0
+
+    def analyze(self, statements) -> FunctionInfo:
+        main = self.function = FunctionInfo(None)
+        for statement in statements:
+            self.statement(statement)
+        return main
+
+    def global_binding(self, name: str):
+        binding = self.global_bindings.get(name)
+        if binding is None:
+            binding = Binding(name, f"{name}_g", None, False)
+            self.global_bindings[name] = binding
+        return binding
+
+    def declare(self, key, name: str):
+        if not self.scopes:
+            binding = self.global_binding(name)
+            self.function.globals.add(binding)
+            self.declared_globals.add(name)
+        else:
+            self.counter += 1
+            binding = Binding(
+                name,
+                f"{name}_{self.counter}",
+                self.function,
+                self.function.loop_depth > 0,
+            )
+            self.scopes[-1][name] = binding
+
+        if binding in self.declared:
+            self.rebound.add(binding)
+        self.declared.add(binding)
+        self.bindings[key] = binding
+        return binding
+
+    def reference(self, node, name: str, assign=False):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                binding = scope[name]
+                break
+        else:
+            binding = self.global_binding(name)
+            if assign:
+                self.function.globals.add(binding)
+                self.rebound.add(binding)
+            self.bindings[node] = binding
+            return
+
+        self.bindings[node] = binding
+        if assign:
+            self.rebound.add(binding)
+        if binding.owner is self.function:
+            return
+
+        binding.captured = True
+        if assign:
+            self.function.nonlocals.add(binding)
+
+        function = self.function
+        while function is not binding.owner:
+            function.free.add(binding)
+            function = function.parent
+
+    ################################################################################################
+
+    def statement(self, statement):
+        if isinstance(statement, (PrintStatement, ExpressionStatement)):
+            self.expression(statement.expression)
+        elif isinstance(statement, VarDeclarationStatement):
+            self.expression(statement.expression)
+            self.declare(statement, statement.token.lexeme)
+        elif isinstance(statement, BlockStatement):
+            self.block(statement.statements)
+        elif isinstance(statement, IfStatement):
+            self.expression(statement.condition)
+            self.statement(statement.if_statement)
+            if statement.else_statement is not None:
+                self.statement(statement.else_statement)
+        elif isinstance(statement, WhileStatement):
+            self.expression(statement.condition)
+            self.function.loop_depth += 1
+            self.statement(statement.statement)
+            self.function.loop_depth -= 1
+        elif isinstance(statement, FunctionDeclarationStatement):
+            binding = self.declare(statement, statement.name.lexeme)
+            self.arities[binding] = len(statement.parameters)
+            self.function_body(statement, is_method=False)
+        elif isinstance(statement, ReturnStatement):
+            if statement.expression is not None:
+                self.expression(statement.expression)
+        elif isinstance(statement, ClassDeclarationStatement):
+            self.declare(statement, statement.name.lexeme)
+            if statement.superclass is not None:
+                self.expression(statement.superclass)
+            for method in statement.methods:
+                self.function_body(method, is_method=True)
+
+    def block(self, statements):
+        self.scopes.append({})
+        for statement in statements:
+            self.statement(statement)
+        self.scopes.pop()
+
+    def function_body(self, statement: FunctionDeclarationStatement, is_method):
+        function = FunctionInfo(self.function)
+        self.functions[statement] = function
+        self.function = function
+        self.scopes.append({})
+
+        if is_method:
+            self.scopes[-1]["this"] = Binding("this", "this", function, False)
+
+        for parameter in statement.parameters:
+            self.declare(parameter, parameter.lexeme)
+
+        self.block(statement.body.statements)
+
+        self.scopes.pop()
+        self.function = function.parent
+
+    def expression(self, expression):
+        if isinstance(expression, (Binary, Logical)):
+            self.expression(expression.left)
+            self.expression(expression.right)
+        elif isinstance(expression, Unary):
+            self.expression(expression.right)
+        elif isinstance(expression, Grouping):
+            self.expression(expression.expression)
+        elif isinstance(expression, Variable):
+            self.reference(expression, expression.token.lexeme)
+        elif isinstance(expression, This):
+            self.reference(expression, "this")
+        elif isinstance(expression, Assignment):
+            self.expression(expression.value)
+            self.reference(expression, expression.token.lexeme, assign=True)
+        elif isinstance(expression, Call):
+            self.expression(expression.callee)
+            for argument in expression.arguments:
+                self.expression(argument)
+        elif isinstance(expression, Get):
+            self.expression(expression.object)
+        elif isinstance(expression, Set):
+            self.expression(expression.object)
+            self.expression(expression.value)
+
+
+def load(name: str):
+    return ast.Name(id=name, ctx=ast.Load())
+
+
+def store(name: str):
+    return ast.Name(id=name, ctx=ast.Store())
+
+
+def call(function: str, *arguments):
+    return ast.Call(func=load(function), args=list(arguments), keywords=[])
+
+
+def constant(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return call("float", ast.Constant(value=str(value)))
+    return ast.Constant(value=value)
+
+
+def function_def(name: str, arguments: ast.arguments, body: list):
+    node = ast.FunctionDef(
+        name=name, args=arguments, body=body, decorator_list=[], returns=None
+    )
+    if "type_params" in ast.FunctionDef._fields:
+        node.type_params = []
+    return node
+
+
+class Transpiler:
+    """
+    Second pass: builds a python `ast.Module` from the lox statements using the
+    bindings found by `ScopeAnalyzer`, python line numbers are the lox ones.
+    """
+
+    BINARY_OPERATORS = {
+        TokenType.PLUS: ast.Add,
+        TokenType.MINUS: ast.Sub,
+        TokenType.STAR: ast.Mult,
+        TokenType.SLASH: ast.Div,
+    }
+
+    COMPARISON_OPERATORS = {
+        TokenType.GREATER: ast.Gt,
+        TokenType.GREATER_EQUAL: ast.GtE,
+        TokenType.LESS: ast.Lt,
+        TokenType.LESS_EQUAL: ast.LtE,
+        TokenType.EQUAL_EQUAL: ast.Eq,
+        TokenType.BANG_EQUAL: ast.NotEq,
+    }
+
+    def __init__(self) -> None:
+        self.analyzer = ScopeAnalyzer()
+        self.function: FunctionInfo = None
+        self.is_initializer = False
+        self.line = 1
+        self.counter = 0
+
+    def transpile(self, statements) -> ast.Module:
+        main = self.analyzer.analyze(statements)
+        self.function = main
+
+        body = self.function_prelude(main) + self.statements(statements)
+        module = ast.Module(
+            body=[
+                function_def("lox_main", self.arguments([], []), body or [ast.Pass()]),
+                ast.Expr(value=call("lox_main")),
+            ],
+            type_ignores=[],
+        )
+        return ast.fix_missing_locations(module)
+
+    def compile(self, statements, file_name: str):
+        return compile(self.transpile(statements), file_name, "exec")
+
+    ################################################################################################
+
+    def binding(self, key) -> Binding:
+        return self.analyzer.bindings[key]
+
+    def at_line(self, node, line_number=None):
+        node.lineno = node.end_lineno = line_number or self.line
+        node.col_offset = node.end_col_offset = 0
+        return node
+
+    def arguments(self, parameters: list[str], frozen: list[str]):
+        return ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg=name) for name in parameters],
+            vararg=None,
+            kwonlyargs=[ast.arg(arg=name) for name in frozen],
+            kw_defaults=[load(name) for name in frozen],
+            kwarg=None,
+            defaults=[],
+        )
+
+    def function_prelude(self, function: FunctionInfo):
+        prelude = []
+
+        if function.globals:
+            names = sorted(binding.python_name for binding in function.globals)
+            prelude.append(self.at_line(ast.Global(names=names)))
+
+        nonlocals = sorted(
+            binding.python_name for binding in function.nonlocals if not binding.boxed
+        )
+        if nonlocals:
+            prelude.append(self.at_line(ast.Nonlocal(names=nonlocals)))
+
+        return prelude
+
+    def lox_function(
+        self, statement: FunctionDeclarationStatement, name: str, kind: str
+    ):
+        self.line = statement.name.line_number
+        function = self.analyzer.functions[statement]
+        enclosing = self.function, self.is_initializer
+        self.function = function
+        self.is_initializer = kind == "initializer"
+
+        parameters = [self.binding(i).python_name for i in statement.parameters]
+        if kind != "function":
+            parameters.insert(0, "this")
+
+        # boxes declared in a loop of the enclosing function are frozen here
+        frozen = sorted(
+            binding.python_name
+            for binding in function.free
+            if binding.boxed and binding.owner is function.parent
+        )
+
+        body = self.function_prelude(function)
+        body += self.statements(statement.body.statements)
+        if self.is_initializer:
+            body.append(self.at_line(ast.Return(value=load("this"))))
+
+        self.function, self.is_initializer = enclosing
+        return self.at_line(
+            function_def(
+                name, self.arguments(parameters, frozen), body or [ast.Pass()]
+            ),
+            statement.name.line_number,
+        )
+
+    def undeclared(self, binding: Binding):
+        # the other engines raise when a global is assigned before it's declared,
+        # python would just make it
+        return (
+            binding.owner is None and binding.name not in self.analyzer.declared_globals
+        )
+
+    def assign_undeclared(self, expression: Assignment, value):
+        return call(
+            "lox_assign_global",
+            ast.Constant(value=expression.token.lexeme),
+            ast.Constant(value=expression.token.line_number),
+            value,
+        )
+
+    def known_arity(self, callee):
+        """Parameters of the function `callee` always is, None if that isn't known."""
+        if not isinstance(callee, Variable):
+            return None
+
+        binding = self.binding(callee)
+        if binding in self.analyzer.rebound:
+            return None
+        return self.analyzer.arities.get(binding)
+
+    def read(self, binding: Binding):
+        if binding.boxed:
+            return ast.Subscript(
+                value=load(binding.python_name),
+                slice=ast.Constant(value=0),
+                ctx=ast.Load(),
+            )
+        return load(binding.python_name)
+
+    def write(self, binding: Binding):
+        if binding.boxed:
+            return ast.Subscript(
+                value=load(binding.python_name),
+                slice=ast.Constant(value=0),
+                ctx=ast.Store(),
+            )
+        return store(binding.python_name)
+
+    def declare(self, binding: Binding, value):
+        if binding.boxed:
+            value = ast.List(elts=[value], ctx=ast.Load())
+        return self.at_line(
+            ast.Assign(targets=[store(binding.python_name)], value=value)
+        )
+
+    ################################################################################################
+
+    def statements(self, statements) -> list:
+        body = []
+        for statement in statements:
+            body.extend(self.statement(statement))
+        return body
+
+    def suite(self, statement):
+        return self.statement(statement) or [self.at_line(ast.Pass())]
+
+    def statement(self, statement) -> list:
+        if isinstance(statement, ExpressionStatement):
+            return [self.expression_statement(statement.expression)]
+        elif isinstance(statement, PrintStatement):
+            value = self.expression(statement.expression)
+            return [self.at_line(ast.Expr(value=call("lox_print", value)))]
+        elif isinstance(statement, VarDeclarationStatement):
+            self.line = statement.token.line_number
+            value = self.expression(statement.expression)
+            return [self.declare(self.binding(statement), value)]
+        elif isinstance(statement, BlockStatement):
+            return self.statements(statement.statements)
+        elif isinstance(statement, IfStatement):
+            test = self.expression(statement.condition)
+            node = self.at_line(ast.If(test=test, body=[], orelse=[]))
+            node.body = self.suite(statement.if_statement)
+            if statement.else_statement is not None:
+                node.orelse = self.suite(statement.else_statement)
+            return [node]
+        elif isinstance(statement, WhileStatement):
+            test = self.expression(statement.condition)
+            node = self.at_line(ast.While(test=test, body=[], orelse=[]))
+            node.body = self.suite(statement.statement)
+            return [node]
+        elif isinstance(statement, FunctionDeclarationStatement):
+            return self.function_declaration(statement)
+        elif isinstance(statement, ReturnStatement):
+            return self.return_statement(statement)
+        elif isinstance(statement, ClassDeclarationStatement):
+            return self.class_declaration(statement)
+
+        raise Exception(f"Cannot transpile {type(statement).__name__}")
+
+    def expression_statement(self, expression):
+        # plain statements for the common `a = ...;` and `a.b = ...;` forms
+        if isinstance(expression, Assignment):
+            self.line = expression.token.line_number
+            value = self.expression(expression.value)
+            binding = self.binding(expression)
+            if self.undeclared(binding):
+                return self.at_line(
+                    ast.Expr(value=self.assign_undeclared(expression, value))
+                )
+
+            target = self.write(binding)
+            return self.at_line(ast.Assign(targets=[target], value=value))
+
+        return self.at_line(ast.Expr(value=self.expression(expression)))
+
+    def function_declaration(self, statement: FunctionDeclarationStatement):
+        binding = self.binding(statement)
+
+        if not binding.boxed:
+            return [self.lox_function(statement, binding.python_name, "function")]
+
+        # the box has to exist before the function freezes it
+        function_name = f"{binding.python_name}f"
+        return [
+            self.declare(binding, ast.Constant(value=None)),
+            self.lox_function(statement, function_name, "function"),
+            self.at_line(
+                ast.Assign(targets=[self.write(binding)], value=load(function_name))
+            ),
+        ]
+
+    def return_statement(self, statement: ReturnStatement):
+        self.line = statement.token.line_number
+
+        if self.function.parent is None:
+            raise Exception(
+                f"on line [{self.line}] - Cannot return from top-level code."
+            )
+
+        body = []
+        value = None
+        if statement.expression is not None:
+            value = self.expression(statement.expression)
+
+        if self.is_initializer:
+            # init always hands back the instance, whatever it returns
+            if value is not None:
+                body.append(self.at_line(ast.Expr(value=value)))
+            value = load("this")
+
+        body.append(self.at_line(ast.Return(value=value)))
+        return body
+
+    def class_declaration(self, statement: ClassDeclarationStatement):
+        name = statement.name
+        binding = self.binding(statement)
+        body = []
+
+        if binding.boxed:
+            body.append(self.declare(binding, ast.Constant(value=None)))
+
+        methods = []
+        for method in statement.methods:
+            self.counter += 1
+            function_name = f"{method.name.lexeme}_m{self.counter}"
+            kind = "initializer" if method.name.lexeme == "init" else "method"
+            body.append(self.lox_function(method, function_name, kind))
+            methods.append(
+                ast.Tuple(
+                    elts=[ast.Constant(value=method.name.lexeme), load(function_name)],
+                    ctx=ast.Load(),
+                )
+            )
+
+        self.line = name.line_number
+        super_class = ast.Constant(value=None)
+        if statement.superclass is not None:
+            super_class = self.expression(statement.superclass)
+
+        klass = call(
+            "lox_class",
+            ast.Constant(value=name.lexeme),
+            ast.Constant(value=name.line_number),
+            super_class,
+            ast.List(elts=methods, ctx=ast.Load()),
+        )
+        body.append(
+            self.at_line(ast.Assign(targets=[self.write(binding)], value=klass))
+        )
+        return body
+
+    ################################################################################################
+
+    def expression(self, expression):
+        if isinstance(expression, Literal):
+            return constant(expression.value)
+        elif isinstance(expression, Grouping):
+            return self.expression(expression.expression)
+        elif isinstance(expression, Binary):
+            self.line = expression.operator.line_number
+            token_type = expression.operator.token_type
+            left = self.expression(expression.left)
+            right = self.expression(expression.right)
+
+            if token_type in self.BINARY_OPERATORS:
+                operator = self.BINARY_OPERATORS[token_type]()
+                return ast.BinOp(left=left, op=operator, right=right)
+
+            # single comparisons only, python would chain `a < b < c`
+            operator = self.COMPARISON_OPERATORS[token_type]()
+            return ast.Compare(left=left, ops=[operator], comparators=[right])
+        elif isinstance(expression, Unary):
+            operand = self.expression(expression.right)
+            if expression.operator.token_type == TokenType.MINUS:
+                return ast.UnaryOp(op=ast.USub(), operand=operand)
+            return ast.UnaryOp(op=ast.Not(), operand=operand)
+        elif isinstance(expression, Logical):
+            operator = (
+                ast.Or()
+                if expression.operator.token_type == TokenType.OR
+                else ast.And()
+            )
+            values = [
+                self.expression(expression.left),
+                self.expression(expression.right),
+            ]
+            return ast.BoolOp(op=operator, values=values)
+        elif isinstance(expression, Variable):
+            # on the variable's own line, an undefined global reports it
+            return self.at_line(
+                self.read(self.binding(expression)), expression.token.line_number
+            )
+        elif isinstance(expression, This):
+            return self.read(self.binding(expression))
+        elif isinstance(expression, Assignment):
+            self.line = expression.token.line_number
+            binding = self.binding(expression)
+            value = self.expression(expression.value)
+            if self.undeclared(binding):
+                return self.assign_undeclared(expression, value)
+            if binding.boxed:
+                return call("lox_store", load(binding.python_name), value)
+            return ast.NamedExpr(target=store(binding.python_name), value=value)
+        elif isinstance(expression, Call):
+            arguments = [self.expression(argument) for argument in expression.arguments]
+
+            # `a.b()` calls the method without creating a bound method first
+            if isinstance(expression.callee, Get):
+                get = expression.callee
+                self.line = get.name.line_number
+                return call(
+                    "lox_invoke",
+                    self.expression(get.object),
+                    ast.Constant(value=get.name.lexeme),
+                    *arguments,
+                )
+
+            callee = self.expression(expression.callee)
+            if self.known_arity(expression.callee) == len(arguments):
+                return ast.Call(func=callee, args=arguments, keywords=[])
+
+            # checks the callee and the number of arguments like the other engines
+            return call("lox_call", callee, *arguments)
+        elif isinstance(expression, Get):
+            self.line = expression.name.line_number
+            obj = self.expression(expression.object)
+            return call("lox_get", obj, ast.Constant(value=expression.name.lexeme))
+        elif isinstance(expression, Set):
+            self.line = expression.name.line_number
+            obj = self.expression(expression.object)
+            value = self.expression(expression.value)
+            return call(
+                "lox_set", obj, ast.Constant(value=expression.name.lexeme), value
+            )
+
+        raise Exception(f"Cannot transpile {type(expression).__name__}")
@@ -0,0 +1,485 @@
+from interpreter.bytecode import OpCode, FunctionProto
+from interpreter.callable import MyCallable, MyClass, MyInstance, arity_error
+from interpreter.natives import NATIVES
+from interpreter.compiler import Compiler
+
+# the dispatch loop compares against module constants instead of paying an
+# attribute lookup on OpCode for every instruction
+CONSTANT = OpCode.CONSTANT
+NIL = OpCode.NIL
+TRUE = OpCode.TRUE
+FALSE = OpCode.FALSE
+POP = OpCode.POP
+GET_LOCAL = OpCode.GET_LOCAL
+SET_LOCAL = OpCode.SET_LOCAL
+GET_UPVALUE = OpCode.GET_UPVALUE
+SET_UPVALUE = OpCode.SET_UPVALUE
+GET_GLOBAL = OpCode.GET_GLOBAL
+SET_GLOBAL = OpCode.SET_GLOBAL
+DEFINE_GLOBAL = OpCode.DEFINE_GLOBAL
+GET_PROPERTY = OpCode.GET_PROPERTY
+SET_PROPERTY = OpCode.SET_PROPERTY
+ADD = OpCode.ADD
+SUBTRACT = OpCode.SUBTRACT
+MULTIPLY = OpCode.MULTIPLY
+DIVIDE = OpCode.DIVIDE
+NEGATE = OpCode.NEGATE
+NOT = OpCode.NOT
+EQUAL = OpCode.EQUAL
+NOT_EQUAL = OpCode.NOT_EQUAL
+GREATER = OpCode.GREATER
+GREATER_EQUAL = OpCode.GREATER_EQUAL
+LESS = OpCode.LESS
+LESS_EQUAL = OpCode.LESS_EQUAL
+PRINT = OpCode.PRINT
+JUMP = OpCode.JUMP
+JUMP_IF_FALSE = OpCode.JUMP_IF_FALSE
+JUMP_IF_TRUE = OpCode.JUMP_IF_TRUE
+POP_JUMP_IF_FALSE = OpCode.POP_JUMP_IF_FALSE
+CALL = OpCode.CALL
+INVOKE = OpCode.INVOKE
+CLOSURE = OpCode.CLOSURE
+CLOSE_UPVALUE = OpCode.CLOSE_UPVALUE
+RETURN = OpCode.RETURN
+CLASS = OpCode.CLASS
+INHERIT = OpCode.INHERIT
+METHOD = OpCode.METHOD
+TAIL_CALL = OpCode.TAIL_CALL
+TAIL_INVOKE = OpCode.TAIL_INVOKE
+
+
+class Upvalue:
+    """
+    A variable captured by a closure. While the enclosing function is running it
+    points at the stack slot, once the slot goes away the value is moved in here.
+    """
+
+    __slots__ = ("index", "value", "is_open")
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.value = None
+        self.is_open = True
+
+
+class Closure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: FunctionProto, upvalues: list) -> None:
+        self.function = function
+        self.upvalues = upvalues
+
+    def arity(self):
+        return self.function.arity
+
+    def bind(self, instance):
+        return BoundMethod(instance, self)
+
+    def __str__(self):
+        return f"<fn {self.function.name}>"
+
+
+class BoundMethod:
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver, method: Closure) -> None:
+        self.receiver = receiver
+        self.method = method
+
+    def arity(self):
+        return self.method.arity()
+
+    def __str__(self):
+        return str(self.method)
+
+
+class Frame:
+    __slots__ = ("closure", "ip", "base")
+
+    def __init__(self, closure: Closure, ip: int, base: int) -> None:
+        self.closure = closure
+        self.ip = ip
+        self.base = base
+
+
+class VM:
+    """
+    Stack based virtual machine running the output of `interpreter.compiler`.
+
+    Lox calls don't nest python calls, the frame stack is kept by the VM itself.
+    Classes and instances are the same `MyClass` / `MyInstance` objects the tree
+    walker uses, with closures standing in for `MyFunction`.
+    """
+
+    def __init__(self, output=None) -> None:
+        self.globals: dict = dict(NATIVES)
+        self.output = output  # where `print` writes, sys.stdout when None
+        self.stack: list = []
+        self.frames: list[Frame] = []
+        self.open_upvalues: dict[int, Upvalue] = {}
+
+    def interpret(self, function: FunctionProto):
+        closure = Closure(function, [])
+        self.stack.append(closure)
+        self.frames.append(Frame(closure, 0, 0))
+        self.run()
+
+    def capture_upvalue(self, index: int):
+        upvalue = self.open_upvalues.get(index)
+        if upvalue is None:
+            upvalue = self.open_upvalues[index] = Upvalue(index)
+        return upvalue
+
+    def close_upvalues(self, last: int):
+        stack = self.stack
+        for index in [i for i in self.open_upvalues if i >= last]:
+            upvalue = self.open_upvalues.pop(index)
+            upvalue.value = stack[index]
+            upvalue.is_open = False
+
+    def call_value(self, callee, argument_count: int, frame: Frame):
+        """
+        Calls the value sitting below the arguments on the stack. Returns the new
+        frame for lox functions, natives are run right away and return None.
+        """
+        stack = self.stack
+        base = len(stack) - argument_count - 1
+
+        if type(callee) is Closure:
+            return self.push_frame(callee, argument_count, base)
+
+        if type(callee) is BoundMethod:
+            stack[base] = callee.receiver
+            return self.push_frame(callee.method, argument_count, base)
+
+        if isinstance(callee, MyClass):
+            stack[base] = MyInstance(callee)
+            initializer = callee.initializer
+
+            if initializer is not None:
+                return self.push_frame(initializer, argument_count, base)
+            if argument_count:
+                raise arity_error(0, argument_count)
+
+            del stack[base + 1 :]
+            return None
+
+        if isinstance(callee, MyCallable):
+            arguments = stack[base + 1 :]
+            del stack[base:]
+            stack.append(callee.call(arguments))
+            return None
+
+        raise Exception(f"{callee} is not callable")
+
+    def push_frame(self, closure: Closure, argument_count: int, base: int):
+        arity = closure.function.arity
+        if argument_count != arity:
+            raise arity_error(arity, argument_count)
+
+        if len(self.frames) >= 10000:
+            raise RecursionError("Stack overflow.")
+
+        frame = Frame(closure, 0, base)
+        self.frames.append(frame)
+        return frame
+
+    def invoke(self, instance, name: str, argument_count: int, frame: Frame):
+        if not isinstance(instance, MyInstance):
+            raise Exception(f"Only instances have properties.")
+
+        index = instance.shape.fields.get(name)
+        if index is not None:
+            value = instance.values[index]
+            self.stack[-argument_count - 1] = value
+            return self.call_value(value, argument_count, frame)
+
+        method = instance.klass.methods.get(name)
+        if method is None:
+            raise Exception(f"Undefined property '{name}'.")
+
+        return self.push_frame(
+            method, argument_count, len(self.stack) - argument_count - 1
+        )
+
+    def drop_caller(self, caller: Frame, frame: Frame):
+        """The callee of a tail call takes the caller's place on the stack."""
+        if self.open_upvalues:
+            self.close_upvalues(caller.base)
+
+        del self.stack[caller.base : frame.base]
+        frame.base = caller.base
+        del self.frames[-2]
+
+    def runtime_error(self, frame: Frame, message: str):
+        line = frame.closure.function.chunk.lines[frame.ip - 1]
+        return Exception(f"{message} on line {line}")
+
+    def run(self):
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        globals_ = self.globals
+
+        frame = self.frames[-1]
+        chunk = frame.closure.function.chunk
+        code = chunk.code
+        constants = chunk.constants
+        upvalues = frame.closure.upvalues
+        base = frame.base
+        ip = 0
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                push(stack[base + code[ip]])
+                ip += 1
+            elif op == CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+            elif op == GET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                try:
+                    push(globals_[name])
+                except KeyError:
+                    frame.ip = ip
+                    raise self.runtime_error(frame, f"Undefined variable {name}")
+            elif op == POP_JUMP_IF_FALSE:
+                if pop():
+                    ip += 1
+                else:
+                    ip = code[ip]
+            elif op == SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+            elif op == POP:
+                pop()
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == SUBTRACT:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == LESS:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif op == LESS_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif op == JUMP:
+                ip = code[ip]
+            elif op == CALL:
+                argument_count = code[ip]
+                ip += 1
+                frame.ip = ip
+                new_frame = self.call_value(
+                    stack[-argument_count - 1], argument_count, frame
+                )
+                if new_frame is not None:
+                    frame = new_frame
+                    chunk = frame.closure.function.chunk
+                    code = chunk.code
+                    constants = chunk.constants
+                    upvalues = frame.closure.upvalues
+                    base = frame.base
+                    ip = 0
+            elif op == INVOKE:
+                name = constants[code[ip]]
+                argument_count = code[ip + 1]
+                ip += 2
+                frame.ip = ip
+                new_frame = self.invoke(
+                    stack[-argument_count - 1], name, argument_count, frame
+                )
+                if new_frame is not None:
+                    frame = new_frame
+                    chunk = frame.closure.function.chunk
+                    code = chunk.code
+                    constants = chunk.constants
+                    upvalues = frame.closure.upvalues
+                    base = frame.base
+                    ip = 0
+            elif op == RETURN:
+                result = pop()
+                if self.open_upvalues:
+                    self.close_upvalues(base)
+                del stack[base:]
+                self.frames.pop()
+
+                if not self.frames:
+                    return result
+
+                push(result)
+                frame = self.frames[-1]
+                chunk = frame.closure.function.chunk
+                code = chunk.code
+                constants = chunk.constants
+                upvalues = frame.closure.upvalues
+                base = frame.base
+                ip = frame.ip
+            elif op == TAIL_CALL or op == TAIL_INVOKE:
+                if op == TAIL_CALL:
+                    argument_count = code[ip]
+                    ip += 1
+                    frame.ip = ip
+                    new_frame = self.call_value(
+                        stack[-argument_count - 1], argument_count, frame
+                    )
+                else:
+                    name = constants[code[ip]]
+                    argument_count = code[ip + 1]
+                    ip += 2
+                    frame.ip = ip
+                    new_frame = self.invoke(
+                        stack[-argument_count - 1], name, argument_count, frame
+                    )
+
+                # natives are done already, the RETURN that follows returns the result
+                if new_frame is not None:
+                    self.drop_caller(frame, new_frame)
+                    frame = new_frame
+                    chunk = frame.closure.function.chunk
+                    code = chunk.code
+                    constants = chunk.constants
+                    upvalues = frame.closure.upvalues
+                    base = frame.base
+                    ip = 0
+            elif op == GET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                ip += 1
+                push(stack[upvalue.index] if upvalue.is_open else upvalue.value)
+            elif op == SET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                ip += 1
+                if upvalue.is_open:
+                    stack[upvalue.index] = stack[-1]
+                else:
+                    upvalue.value = stack[-1]
+            elif op == GET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                instance = stack[-1]
+
+                if not isinstance(instance, MyInstance):
+                    raise Exception("Only instances have properties.")
+
+                index = instance.shape.fields.get(name)
+                if index is not None:
+                    stack[-1] = instance.values[index]
+                else:
+                    method = instance.klass.methods.get(name)
+                    if method is None:
+                        raise Exception(f"Undefined property '{name}'.")
+                    stack[-1] = BoundMethod(instance, method)
+            elif op == SET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                value = pop()
+                instance = stack[-1]
+
+                if not isinstance(instance, MyInstance):
+                    raise Exception("Only instances have fields.")
+
+                instance.set_field(name, value)
+                # a set expression evaluates to nil in the tree walker as well
+                stack[-1] = None
+            elif op == MULTIPLY:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == DIVIDE:
+                right = pop()
+                stack[-1] = stack[-1] / right
+            elif op == GREATER:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif op == GREATER_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif op == EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif op == NOT_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] != right
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+            elif op == NEGATE:
+                stack[-1] = -stack[-1]
+            elif op == NIL:
+                push(None)
+            elif op == TRUE:
+                push(True)
+            elif op == FALSE:
+                push(False)
+            elif op == JUMP_IF_FALSE:
+                if stack[-1]:
+                    ip += 1
+                else:
+                    ip = code[ip]
+            elif op == JUMP_IF_TRUE:
+                if stack[-1]:
+                    ip = code[ip]
+                else:
+                    ip += 1
+            elif op == PRINT:
+                print(pop(), file=self.output)
+            elif op == SET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name not in globals_:
+                    frame.ip = ip
+                    raise self.runtime_error(frame, f"Undefined variable {name}")
+                globals_[name] = stack[-1]
+            elif op == DEFINE_GLOBAL:
+                globals_[constants[code[ip]]] = pop()
+                ip += 1
+            elif op == CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                captured = []
+
+                for _ in range(function.upvalue_count):
+                    is_local = code[ip]
+                    index = code[ip + 1]
+                    ip += 2
+
+                    if is_local:
+                        captured.append(self.capture_upvalue(base + index))
+                    else:
+                        captured.append(upvalues[index])
+
+                push(Closure(function, captured))
+            elif op == CLOSE_UPVALUE:
+                self.close_upvalues(len(stack) - 1)
+                pop()
+            elif op == CLASS:
+                push(MyClass(name=constants[code[ip]], methods={}))
+                ip += 1
+            elif op == INHERIT:
+                klass = pop()
+                super_class = pop()
+
+                if not isinstance(super_class, MyClass):
+                    raise Exception("Superclass must be a class.")
+
+                # copy down inherited methods, the class's own ones override them
+                klass.methods.update(super_class.methods)
+                klass.super_class = super_class
+                klass.set_initializer(super_class.initializer)
+            elif op == METHOD:
+                method = pop()
+                name = constants[code[ip]]
+                stack[-1].methods[name] = method
+                if name == "init":
+                    stack[-1].set_initializer(method)
+                ip += 1
+            else:
+                raise Exception(f"Unknown opcode {op}")
+
+
+def run(statements):
+    function = Compiler().compile(statements)
+    return VM().interpret(function)